@@ -0,0 +1,61 @@
+"""Compares two benchmark reports stage by stage.
+    
+    python -m benchmarks.compare base.json head.json [--threshold 10]
+
+Exits with 1 when a stage got slower than threshold percent.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+METRICS = [("seconds", "s"), ("rows_per_s", "rows/s"), ("bytes_per_s", "B/s"), ("peak_rss_mb", "MiB")]
+
+
+def _change(base, head) -> str:
+    if not base or head is None:
+        return ""
+    return f"{100 * (head - base) / base:+.1f}%"
+
+
+def compare(base:dict, head:dict, threshold:Optional[float]=None) -> bool:
+    """compare
+    Prints every metric of the stages in both reports with its change,
+    returns False when a stage got slower than threshold percent.
+    """
+    print(f"base {base.get('commit')} ({base.get('database')})  head {head.get('commit')} ({head.get('database')})")
+    if base.get("params") != head.get("params"):
+        print(f"warning: different data sets {base.get('params')} / {head.get('params')}")
+    base_stages = {stage["stage"]: stage for stage in base["stages"]}
+    ok = True
+    for stage in head["stages"]:
+        before = base_stages.get(stage["stage"])
+        if before is None:
+            continue
+        print(f"{stage['stage']} [{before['status']} -> {stage['status']}]")
+        for metric, unit in METRICS:
+            print(f"    {metric:<14} {str(before.get(metric)):>14} {str(stage.get(metric)):>14} {unit:<7}"\
+                f" {_change(before.get(metric), stage.get(metric))}")
+        if threshold is not None and before.get("seconds") and stage.get("seconds") and \
+                stage["seconds"] > before["seconds"] * (1 + threshold / 100):
+            ok = False
+    return ok
+
+
+def main(argv:Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="fail when a stage is slower by more than this percent")
+    args = parser.parse_args(argv)
+    with open(args.base) as fl:
+        base = json.load(fl)
+    with open(args.head) as fl:
+        head = json.load(fl)
+    if not compare(base, head, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
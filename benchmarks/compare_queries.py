@@ -0,0 +1,89 @@
+"""Compares the transform statement profiles of two runs.
+
+Reads two TRANSFORM_PROFILE_PATH files (JSON lines written by the
+operators with profiling on), matches the statements of both runs by
+task and fingerprint and flags the ones whose plan changed or that got
+slower than threshold percent.
+    
+    TRANSFORM_PROFILE_PATH=base.jsonl python pipeline.py
+    python -m benchmarks.compare_queries base.jsonl head.jsonl [--threshold 20]
+
+Exits with 1 when a statement was flagged.
+"""
+import argparse
+import sys
+from typing import Dict, List, Optional, Tuple
+from weather_pipeline.utils.profiling import read_profiles
+
+
+def latest(records:List[dict]) -> Dict[Tuple[str, str], dict]:
+    """latest
+    The last record of every (task, fingerprint), a file appended to by
+    several runs is compared by its latest one.
+    """
+    statements = {}
+    for record in records:
+        statements[(record.get("task") or "", record["fingerprint"])] = record
+    return statements
+
+
+def flags(before:dict, after:dict, threshold:float, min_seconds:float) -> List[str]:
+    found = []
+    if before.get("shape") != after.get("shape"):
+        found.append("plan changed")
+    if after["seconds"] >= min_seconds and after["seconds"] > before["seconds"] * (1 + threshold / 100):
+        found.append("slower")
+    if before.get("rows") != after.get("rows"):
+        found.append("rows changed")
+    return found
+
+
+def compare(base:List[dict], head:List[dict], threshold:float=20.0, min_seconds:float=0.01) -> bool:
+    """compare
+    Prints the time and rows of every statement of head next to base and
+    its flags, then the old and new plan of the statements whose plan
+    changed. Returns False when a plan changed or a statement taking at
+    least min_seconds got slower than threshold percent.
+    """
+    base, head = latest(base), latest(head)
+    ok = True
+    changed = []
+    for key, after in head.items():
+        task, fingerprint = key
+        before = base.get(key)
+        if before is None:
+            print(f"{task:<28} {fingerprint} {'':>10} {after['seconds']:>10.3f}s  new")
+            continue
+        found = flags(before, after, threshold, min_seconds)
+        change = f"{100 * (after['seconds'] - before['seconds']) / before['seconds']:+.1f}%" \
+                if before["seconds"] else ""
+        print(f"{task:<28} {fingerprint} {before['seconds']:>10.3f}s {after['seconds']:>10.3f}s {change:>8}"\
+            f"  rows {before.get('rows')} -> {after.get('rows')}{'  ' + ', '.join(found) if found else ''}")
+        if "plan changed" in found:
+            changed.append((key, before, after))
+        ok = ok and not {"plan changed", "slower"} & set(found)
+    for key in base.keys() - head.keys():
+        print(f"{key[0]:<28} {key[1]} {base[key]['seconds']:>10.3f}s {'':>10}   gone")
+    
+    for (task, fingerprint), before, after in changed:
+        print(f"\n{task} {fingerprint}: {after['sql'][:200]}")
+        print(f"    base: {before.get('shape')}")
+        print(f"    head: {after.get('shape')}")
+    return ok
+
+
+def main(argv:Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the transform statement profiles of two runs.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="flag statements slower by more than this percent")
+    parser.add_argument("--min-seconds", type=float, default=0.01,
+                        help="statements faster than this are not flagged as slower")
+    args = parser.parse_args(argv)
+    if not compare(read_profiles(args.base), read_profiles(args.head), args.threshold, args.min_seconds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import gzip
+import json
+from pathlib import Path
+from typing import List
+import numpy as np
+import pandas as pd
+
+# Germany bounding box
+LAT_RANGE = (47.3, 55.0)
+LON_RANGE = (5.9, 15.0)
+KM_PER_DEGREE = 111.2
+CITIES_COLUMNS = ["#loc_id", "ags", "ascii", "name", "lat", "lon", "amt", "plz", "vorwahl",
+                "einwohner", "flaeche", "kz", "typ", "level", "of", "invalid"]
+# country prefixes of the non German stations, with a rough lat/lon box each
+COUNTRIES = {"AE": ((22.0, 26.0), (51.0, 56.0)), "CA": ((43.0, 70.0), (-140.0, -55.0)),
+            "FR": ((42.0, 51.0), (-4.0, 8.0)), "IN": ((8.0, 34.0), (68.0, 97.0)),
+            "RSM": ((42.0, 70.0), (30.0, 180.0)), "US1": ((25.0, 49.0), (-124.0, -67.0)),
+            "USC": ((25.0, 49.0), (-124.0, -67.0))}
+US_STATES = ["AL", "AZ", "CA", "CO", "FL", "GA", "IL", "MN", "NY", "TX", "WA"]
+# element, probability a reporting station reports it on a day
+ELEMENTS = [("TMAX", 0.45), ("TMIN", 0.45), ("PRCP", 0.9), ("SNOW", 0.3), ("SNWD", 0.2), ("TAVG", 0.15)]
+
+
+def generate_cities(path, places:int, city_fraction:float=0.15, seed:int=0) -> pd.DataFrame:
+    """generate_cities
+    OpenGeoDB DE.tab like places, tab separated with a header line.
+    Population is log-normal, city_fraction of the places are of typ
+    Stadt and the rest municipalities and districts.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, places + 1)
+    typ = rng.choice(["Stadt", "Gemeinde", "Ortsteil"], places,
+                    p=[city_fraction, (1 - city_fraction) * 0.7, (1 - city_fraction) * 0.3])
+    cities = pd.DataFrame({
+        "#loc_id": ids,
+        "ags": rng.integers(1000000, 16999999, places),
+        "ascii": [f"ORT{i:06d}" for i in ids],
+        "name": [f"Ort {i:06d}" for i in ids],
+        "lat": np.round(rng.uniform(*LAT_RANGE, places), 5),
+        "lon": np.round(rng.uniform(*LON_RANGE, places), 5),
+        "amt": "",
+        "plz": rng.integers(1000, 99999, places),
+        "vorwahl": rng.integers(30, 9999, places),
+        "einwohner": np.round(rng.lognormal(8.5, 1.4, places)).astype("int64"),
+        "flaeche": np.round(rng.lognormal(3.0, 0.8, places), 2),
+        "kz": "",
+        "typ": typ,
+        "level": 6,
+        "of": rng.integers(1, 500, places),
+        "invalid": 0,
+    })
+    cities[CITIES_COLUMNS].to_csv(path, sep="\t", index=False)
+    return cities
+
+
+def generate_stations(path,
+                    stations:int,
+                    cities:pd.DataFrame,
+                    german_fraction:float=0.2,
+                    near_city_fraction:float=0.5,
+                    seed:int=0) -> pd.DataFrame:
+    """generate_stations
+    ghcnd-stations.txt like fixed width station list sorted by ID.
+    german_fraction of the stations are GM stations, of which
+    near_city_fraction lie a few km (exponentially distributed) from a
+    Stadt, the others anywhere in Germany.
+    """
+    rng = np.random.default_rng(seed + 1)
+    german = int(stations * german_fraction)
+    towns = cities[cities["typ"] == "Stadt"]
+    near = int(german * near_city_fraction) if len(towns) else 0
+    
+    anchor = towns.iloc[rng.integers(0, max(len(towns), 1), near)] if near else towns.iloc[:0]
+    distance = rng.exponential(3.0, near) / KM_PER_DEGREE
+    bearing = rng.uniform(0, 2 * np.pi, near)
+    lat = [anchor["lat"].to_numpy() + distance * np.cos(bearing),
+        rng.uniform(*LAT_RANGE, german - near)]
+    lon = [anchor["lon"].to_numpy() + distance * np.sin(bearing) / np.cos(np.radians(anchor["lat"].to_numpy())),
+        rng.uniform(*LON_RANGE, german - near)]
+    prefixes = ["GM"] * german
+    
+    others = stations - german
+    countries = rng.choice(list(COUNTRIES), others)
+    lat.append(np.array([rng.uniform(*COUNTRIES[country][0]) for country in countries]))
+    lon.append(np.array([rng.uniform(*COUNTRIES[country][1]) for country in countries]))
+    prefixes += list(countries)
+    
+    frame = pd.DataFrame({"prefix": prefixes, "LATITUDE": np.concatenate(lat), "LONGITUDE": np.concatenate(lon)})
+    frame["ID"] = [f"{prefix}{number:0{11 - len(prefix)}d}" for prefix, number in
+                    zip(frame["prefix"], rng.choice(10 ** 8, len(frame), replace=False))]
+    frame["ELEVATION"] = np.round(rng.gamma(2.0, 150.0, len(frame)), 1)
+    frame["STATE"] = np.where(frame["prefix"].str.startswith("US"), rng.choice(US_STATES, len(frame)), "")
+    frame["NAME"] = [f"STATION {number:06d}" for number in range(len(frame))]
+    frame["GSN FLAG"] = np.where(rng.random(len(frame)) < 0.05, "GSN", "")
+    frame["HCN/CRN FLAG"] = np.where(frame["prefix"].str.startswith("US") & (rng.random(len(frame)) < 0.2), "HCN", "")
+    frame["WMO ID"] = np.where(rng.random(len(frame)) < 0.3,
+                            pd.Series(rng.integers(10000, 99999, len(frame))).astype(str), "")
+    frame = frame.sort_values("ID").reset_index(drop=True)
+    
+    columns = ["ID", "LATITUDE", "LONGITUDE", "ELEVATION", "STATE", "NAME", "GSN FLAG", "HCN/CRN FLAG", "WMO ID"]
+    with open(path, "w") as fl:
+        for station, lat, lon, elevation, state, name, gsn, hcn, wmo in zip(*[frame[column] for column in columns]):
+            fl.write(f"{station:<11} {lat:8.4f} {lon:9.4f} {elevation:6.1f} "\
+                    f"{state:<2} {name:<30} {gsn:<3} {hcn:<3} {wmo:<5}\n")
+    return frame
+
+
+def generate_readings(path,
+                    year:int,
+                    stations:pd.DataFrame,
+                    coverage:float=0.6,
+                    seed:int=0) -> int:
+    """generate_readings
+    by_year/<year>.csv.gz like daily readings. coverage of the stations
+    report at all, every reporting station reports the ELEMENTS with
+    their own probability per day. Temperatures follow the season and
+    the latitude in tenths of a degree, precipitation is mostly zero.
+    Returns the number of rows written.
+    """
+    rng = np.random.default_rng(seed + year)
+    reporting = stations[rng.random(len(stations)) < coverage].reset_index(drop=True)
+    ids = reporting["ID"].to_numpy()
+    lat = reporting["LATITUDE"].to_numpy()
+    station_bias = rng.normal(0, 15, len(reporting))
+    rows = 0
+    
+    with gzip.open(path, "wt", compresslevel=6) as fl:
+        for day in pd.date_range(f"{year}-01-01", f"{year}-12-31"):
+            season = np.sin(2 * np.pi * (day.dayofyear - 110) / 365.25)
+            # tenths of a degree, colder to the poles and in winter
+            tmax = 300 - 6 * np.abs(lat) + 110 * season * np.sign(lat) + station_bias
+            for element, probability in ELEMENTS:
+                reports = rng.random(len(reporting)) < probability
+                count = int(reports.sum())
+                if element == "TMAX":
+                    values = tmax[reports] + rng.normal(0, 35, count)
+                elif element == "TMIN":
+                    values = tmax[reports] - 90 + rng.normal(0, 30, count)
+                elif element == "TAVG":
+                    values = tmax[reports] - 45 + rng.normal(0, 25, count)
+                elif element == "PRCP":
+                    values = np.where(rng.random(count) < 0.6, 0, rng.gamma(0.8, 60, count))
+                else:
+                    values = np.where(tmax[reports] < 50, rng.gamma(1.0, 30, count), 0)
+                frame = pd.DataFrame({"ID": ids[reports], "DATE": day.strftime("%Y%m%d"),
+                                    "ELEMENT": element, "DATA": np.round(values).astype("int64"),
+                                    "M-FLAG": "",
+                                    "Q-FLAG": np.where(rng.random(count) < 0.002, "I", ""),
+                                    "S-FLAG": rng.choice(["E", "7", "S", "W"], count),
+                                    "OBS-TIME": np.where(rng.random(count) < 0.3, "0700", "")})
+                frame.to_csv(fl, header=False, index=False)
+                rows += count
+    return rows
+
+
+def generate(root,
+            places:int=3000,
+            stations:int=2000,
+            years:List[int]=(2020, 2021),
+            coverage:float=0.6,
+            seed:int=0) -> dict:
+    """generate
+    Writes DE.tab, ghcnd-stations.txt and by_year/<year>.csv.gz under root
+    laid out like their source URLs, skipped when root already holds a
+    data set generated with the same parameters. Returns the manifest.
+    """
+    root = Path(root)
+    params = {"places": places, "stations": stations, "years": list(years),
+            "coverage": coverage, "seed": seed}
+    manifest_path = root / "manifest.json"
+    if manifest_path.exists():
+        with open(manifest_path) as fl:
+            manifest = json.load(fl)
+        if manifest["params"] == params:
+            return manifest
+    
+    (root / "by_year").mkdir(parents=True, exist_ok=True)
+    cities = generate_cities(root / "DE.tab", places, seed=seed)
+    station_frame = generate_stations(root / "ghcnd-stations.txt", stations, cities, seed=seed)
+    readings = {str(year): generate_readings(root / "by_year" / f"{year}.csv.gz", year,
+                                            station_frame, coverage, seed=seed) for year in years}
+    
+    manifest = {"params": params,
+                "rows": {"DE.tab": places, "ghcnd-stations.txt": stations, "by_year": readings},
+                "bytes": {str(path.relative_to(root)): path.stat().st_size for path in sorted(root.rglob("*")) \
+                        if path.is_file() and path.name != "manifest.json"}}
+    with open(manifest_path, "w") as fl:
+        json.dump(manifest, fl, indent=2)
+    return manifest
\ No newline at end of file
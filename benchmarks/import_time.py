@@ -0,0 +1,113 @@
+"""Import time of the modules the Airflow scheduler parses.
+
+Imports every target in a fresh interpreter with -X importtime and
+fails when its cumulative import time is over budget or it pulls in one
+of the HEAVY modules, which should only be imported by the drivers.
+Modules the target needs anyway (airflow for the DAG file) are imported
+first and not counted. Targets whose preload is not installed are skipped.
+    
+    python -m benchmarks.import_time [--budget-ms 100] [--repeat 5]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ["pandas", "numpy", "sqlalchemy", "requests", "tqdm", "psycopg2"]
+# target module, modules imported before it and not counted
+TARGETS = {"weather_pipeline.tasks": [],
+        "dags.weather_dag": ["airflow", "airflow.operators.python"]}
+
+
+def parse_importtime(stderr:str) -> List[Tuple[str, int, int]]:
+    """parse_importtime
+    (module, nesting level, cumulative microseconds) of every line of
+    -X importtime output, in output order (children before parents).
+    """
+    lines = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, timing = line.partition(":")
+        _, total, name = timing.split("|")
+        level = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        lines.append((name.strip(), level, int(total.strip())))
+    return lines
+
+
+def imported_by(lines:List[Tuple[str, int, int]], module:str) -> Tuple[int, Dict[str, int]]:
+    """imported_by
+    Cumulative microseconds of module and of every module first imported
+    while importing it.
+    """
+    position = [name for name, _, _ in lines].index(module)
+    children = {}
+    for name, level, total in reversed(lines[:position]):
+        if level == 0:
+            break
+        children[name] = total
+    return lines[position][2], children
+
+
+def measure_import(module:str, preload:List[str], repeat:int=5) -> dict:
+    """measure_import
+    Best of repeat fresh imports of module after preload, with the
+    slowest modules it imported and the HEAVY ones among them.
+    """
+    code = "".join([f"import {name}; " for name in preload]) + f"import {module}"
+    best = None
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1]
+            missing = any(error.startswith("ModuleNotFoundError") and f"'{name.split('.')[0]}'" in error \
+                        for name in preload)
+            return {"module": module, "status": "skipped" if missing else "failed", "error": error}
+        total, children = imported_by(parse_importtime(process.stderr), module)
+        if best is None or total < best[0]:
+            best = (total, children)
+    
+    total, children = best
+    return {"module": module,
+            "status": "ok",
+            "ms": round(total / 1000, 1),
+            "heavy": sorted({name.split(".")[0] for name in children if name.split(".")[0] in HEAVY}),
+            "slowest": [(name, round(children[name] / 1000, 1)) for name in
+                        sorted(children, key=children.get, reverse=True)[:5]]}
+
+
+def main(argv:Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Check the import time of the DAG and tasks modules.")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="cumulative import time allowed per module")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    args = parser.parse_args(argv)
+    
+    results, ok = [], True
+    for module, preload in TARGETS.items():
+        result = measure_import(module, preload, args.repeat)
+        if result["status"] == "ok":
+            over = result["ms"] > args.budget_ms
+            result["status"] = "over budget" if over else ("heavy imports" if result["heavy"] else "ok")
+            print(f"{module:<24} {result['ms']:>8.1f} ms  {result['status']}"\
+                f"{'  ' + ', '.join(result['heavy']) if result['heavy'] else ''}")
+            for name, ms in result["slowest"]:
+                print(f"    {name:<40} {ms:>8.1f} ms")
+        else:
+            print(f"{module:<24} {result['status']}: {result['error']}")
+        ok = ok and result["status"] in ("ok", "skipped")
+        results.append(result)
+    
+    if args.output:
+        with open(args.output, "w") as fl:
+            json.dump({"budget_ms": args.budget_ms, "modules": results}, fl, indent=2)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""Benchmark of the weather_pipeline tasks against synthetic data.
+
+Generates DE.tab, ghcnd-stations.txt and by_year files, serves them from
+a local HTTP server, points the pipeline at them and at a throwaway
+database and runs every stage in its own forked process, reporting wall
+time, rows/s, bytes/s and peak RSS as JSON.
+    
+    python -m benchmarks.run --stations 2000 --years 2020 2021 \\
+        --db postgresql://postgres@localhost:5432/bench --output head.json
+    python -m benchmarks.compare base.json head.json
+"""
+import argparse
+import datetime
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+from sqlalchemy import create_engine
+from benchmarks.generate import generate
+from benchmarks.server import serve
+
+STAGES = ["extract", "load_cities", "load_stations", "filter", "load_readings", "medians", "rank"]
+TABLES = ["cities", "stations", "city_stations", "readings", "germany_medians", "city_daily_medians",
+        "city_ranks", "ingest_watermarks", "ingest_touched_dates"]
+
+
+def _peak_rss_mb(who:int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_stage(stage:Callable[[], None], queue) -> None:
+    start = time.perf_counter()
+    error = None
+    try:
+        stage()
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    queue.put({"seconds": time.perf_counter() - start,
+            "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+            "children_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "error": error})
+
+
+def measure(stage:Callable[[], None]) -> dict:
+    """measure
+    Runs stage in a forked process, so its peak RSS is its own, and
+    returns wall time, peak RSS of the process and of its own workers
+    and the error it raised if any.
+    """
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_run_stage, args=(stage, queue))
+    process.start()
+    process.join()
+    if queue.empty():
+        return {"seconds": None, "peak_rss_mb": None, "children_peak_rss_mb": None,
+                "error": f"stage process exited with {process.exitcode}"}
+    return queue.get()
+
+
+def count_rows(engine, table:str) -> Optional[int]:
+    try:
+        return engine.execute(f"SELECT COUNT(*) FROM {table}").scalar()
+    except Exception:
+        return None
+
+
+def reset_database(engine) -> None:
+    cascade = " CASCADE" if engine.dialect.name == "postgresql" else ""
+    for table in TABLES:
+        engine.execute(f"DROP TABLE IF EXISTS {table}{cascade}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent,
+                                    stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run(data:Path,
+        workdir:Path,
+        db:str,
+        years:List[int],
+        stages:List[str],
+        manifest:dict,
+        rank_range:List[str]) -> List[dict]:
+    """run
+    Points the pipeline at the served data set and db, runs the stages
+    in order from a clean database and download directory and returns
+    one metrics record per stage.
+    """
+    server = serve(data)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.update({"CITIES_URL": f"{base}/DE.tab",
+                    "STATIONS_URL": f"{base}/ghcnd-stations.txt",
+                    "READINGS_URL": f"{base}/by_year/{{year}}.csv.gz",
+                    "LOADER_CONNECTION_STRING": db,
+                    "LOADER_DESTINATION": "sqlite" if db.startswith("sqlite") else "rdbms"})
+    # the pipeline downloads to tmp/ relative to the working directory
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    os.chdir(workdir)
+    tasks = importlib.import_module("weather_pipeline.tasks")
+    from weather_pipeline.ingestion.extract import Extractor
+    
+    engine = create_engine(db)
+    reset_database(engine)
+    sizes = manifest["bytes"]
+    readings_bytes = sum(sizes[f"by_year/{year}.csv.gz"] for year in years)
+    source_rows = manifest["rows"]["DE.tab"] + manifest["rows"]["ghcnd-stations.txt"] + \
+                sum(manifest["rows"]["by_year"][str(year)] for year in years)
+    
+    def extract() -> None:
+        sources = [(f"{base}/DE.tab", "tmp/cities.csv"), (f"{base}/ghcnd-stations.txt", None)] + \
+                [(f"{base}/by_year/{year}.csv.gz", None) for year in years]
+        for url, location in sources:
+            Extractor(source_type="web", source_url=url, temp_location=location).init().get(chunksize=10000)
+    
+    def load_readings() -> None:
+        for year in years:
+            tasks.ingest_load_weather_readings(year=year)
+    
+    # get_city_intervals needs Postgres, elsewhere the cities are ranked on the last date of the range
+    postgres = engine.dialect.name == "postgresql"
+    rank_table = "city_ranks" if postgres else f"city_rank_{rank_range[1].replace('-', '')}"
+    
+    def rank() -> None:
+        if postgres:
+            return tasks.get_city_intervals(*rank_range)
+        engine.execute(f"DROP TABLE IF EXISTS {rank_table}")
+        tasks.get_city_interval(city="all", date=rank_range[1])
+    
+    # stage, callable, output table or row count, input bytes
+    plan = {
+        "extract": (extract, source_rows, sizes["DE.tab"] + sizes["ghcnd-stations.txt"] + readings_bytes),
+        "load_cities": (tasks.ingest_load_cities, "cities", sizes["DE.tab"]),
+        "load_stations": (tasks.ingest_load_weather_stations, "stations", sizes["ghcnd-stations.txt"]),
+        "filter": (tasks.filter_weather_stations, "city_stations", None),
+        "load_readings": (load_readings, "readings", readings_bytes),
+        "medians": (tasks.create_germany_medians, "germany_medians", None),
+        "rank": (rank, rank_table, None),
+    }
+    results = []
+    try:
+        for name in stages:
+            stage, rows, size = plan[name]
+            result = measure(stage)
+            rows = count_rows(engine, rows) if isinstance(rows, str) else rows
+            seconds = result["seconds"]
+            results.append({"stage": name,
+                            "status": "failed" if result["error"] else "ok",
+                            "seconds": round(seconds, 3) if seconds is not None else None,
+                            "rows": rows,
+                            "rows_per_s": round(rows / seconds, 1) if rows and seconds else None,
+                            "bytes": size,
+                            "bytes_per_s": round(size / seconds, 1) if size and seconds else None,
+                            "peak_rss_mb": result["peak_rss_mb"],
+                            "children_peak_rss_mb": result["children_peak_rss_mb"],
+                            "error": result["error"]})
+            print(json.dumps(results[-1]), file=sys.stderr)
+    finally:
+        server.shutdown()
+    return results
+
+
+def main(argv:Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the weather_pipeline tasks on synthetic data.")
+    parser.add_argument("--places", type=int, default=3000, help="places in DE.tab")
+    parser.add_argument("--stations", type=int, default=2000, help="stations in ghcnd-stations.txt")
+    parser.add_argument("--years", type=int, nargs="+", default=[2020, 2021])
+    parser.add_argument("--coverage", type=float, default=0.6, help="share of stations reporting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default=None,
+                        help="database to run against, its pipeline tables are dropped first"\
+                            " (default: a fresh SQLite file in the work directory)")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--rank-range", nargs=2, default=None, metavar=("START", "END"),
+                        help="date range of the rank stage (default: the first quarter of the last year),"\
+                            " on SQLite only its end date is ranked")
+    parser.add_argument("--root", default=os.path.join(tempfile.gettempdir(), "weather_pipeline_bench"),
+                        help="directory for the generated data and the pipeline working directory")
+    parser.add_argument("--output", default=None, help="JSON file to write, stdout when not given")
+    args = parser.parse_args(argv)
+    
+    root = Path(args.root).resolve()
+    output = Path(args.output).resolve() if args.output else None
+    workdir = root / "work"
+    db = args.db or f"sqlite:///{workdir / 'bench.db'}"
+    rank_range = args.rank_range or [f"{args.years[-1]}-01-01", f"{args.years[-1]}-03-31"]
+    
+    started = time.perf_counter()
+    manifest = generate(root / "data", places=args.places, stations=args.stations,
+                        years=args.years, coverage=args.coverage, seed=args.seed)
+    generate_seconds = time.perf_counter() - started
+    stages = run(root / "data", workdir, db, args.years, args.stages, manifest, rank_range)
+    
+    report = {"commit": git_commit(),
+            "created_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": create_engine(db).dialect.name,
+            "cpus": os.cpu_count(),
+            "params": manifest["params"],
+            "source_rows": manifest["rows"],
+            "source_bytes": manifest["bytes"],
+            "generate_seconds": round(generate_seconds, 3),
+            "stages": stages}
+    text = json.dumps(report, indent=2)
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,23 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class quietHandler(SimpleHTTPRequestHandler):
+    """quietHandler
+    Static file handler without a log line per request.
+    """
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve(directory, host:str="127.0.0.1", port:int=0, handler=quietHandler) -> ThreadingHTTPServer:
+    """serve
+    Serves directory over HTTP from a daemon thread, port 0 picks a free
+    port. The base URL is http://{host}:{server.server_address[1]}/,
+    stop it with server.shutdown(). handler is a SimpleHTTPRequestHandler
+    subclass, e.g. one answering Range requests.
+    """
+    server = ThreadingHTTPServer((host, port), partial(handler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
\ No newline at end of file
@@ -1,13 +1,35 @@
+import inspect
 from airflow import DAG
 from airflow.utils.dates import days_ago
 from airflow.operators.python import PythonOperator
 from weather_pipeline.utils.app_logger import _get_logger
+from weather_pipeline.config import READINGS_POOL, READINGS_POOL_SLOTS
+from weather_pipeline.utils.metrics import add_sink, remove_sink, xcomSink
 from weather_pipeline.tasks import filter_weather_stations, get_city_interval, ingest_load_cities, \
-                ingest_load_weather_readings, ingest_load_weather_stations, \
-                create_germany_medians
+                ingest_load_weather_stations, create_germany_medians, publish_weather_readings, \
+                readings_years, stage_weather_readings
 
 logger = _get_logger(__name__)
 
+def with_metrics(task):
+    """with_metrics
+    
+    Runs task with an xcomSink registered, the metrics records of every
+    extract, load and transform operation of the task are pushed to the
+    "metrics" XCom of its task instance.
+    """
+    parameters = inspect.signature(task).parameters
+    
+    # no functools.wraps, Airflow must see **kwargs to pass the context
+    def run(ti=None, **kwargs):
+        sink = xcomSink(ti)
+        add_sink(sink)
+        try:
+            return task(**{key: value for key, value in kwargs.items() if key in parameters})
+        finally:
+            remove_sink(sink)
+    return run
+
 default_args = {
     "owner": "Prakhar Srivastava",
     "trigger_rule": "all_success"
@@ -16,31 +38,35 @@ default_args = {
 with DAG('Germany_weather', default_args=default_args,
     description='A simple tutorial DAG',
     start_date=days_ago(1),
+    concurrency=READINGS_POOL_SLOTS,
     tags=["TR TASK"]) as dag:
     
     task1 = PythonOperator(task_id='ingest_load_cities',
-                        python_callable=ingest_load_cities)
+                        python_callable=with_metrics(ingest_load_cities))
     
     task2 = PythonOperator(task_id='ingest_load_weather_stations',
-                        python_callable=ingest_load_weather_stations) 
+                        python_callable=with_metrics(ingest_load_weather_stations)) 
     
     task3 = PythonOperator(task_id = "filter_weather_stations",
-                        python_callable=filter_weather_stations)
+                        python_callable=with_metrics(filter_weather_stations))
     
-    task4 = PythonOperator(task_id = "ingest_load_weather_readings_2020",
-                        python_callable= ingest_load_weather_readings,
-                        op_kwargs={"year":2020})
+    # one task per year of READINGS_START_YEAR..READINGS_END_YEAR, each
+    # loading its own staging table, at most READINGS_POOL_SLOTS at a time
+    task4 = [PythonOperator(task_id = f"stage_weather_readings_{year}",
+                        python_callable=with_metrics(stage_weather_readings),
+                        op_kwargs={"year":year},
+                        pool=READINGS_POOL) for year in readings_years()]
     
-    task5 = PythonOperator(task_id = "ingest_load_weather_readings_2021",
-                        python_callable= ingest_load_weather_readings,
-                        op_kwargs={"year":2021})
+    task5 = PythonOperator(task_id = "publish_weather_readings",
+                        python_callable=with_metrics(publish_weather_readings))
     
     task6 = PythonOperator(task_id = "create_germany_medians",
-                        python_callable=create_germany_medians)
+                        python_callable=with_metrics(create_germany_medians),
+                        op_kwargs={"incremental":True})
     
     task7 = PythonOperator(task_id = "get_city_interval",
-                    python_callable=get_city_interval,
+                    python_callable=with_metrics(get_city_interval),
                     op_kwargs={"city":"Berlin",
                             "date":"2021-03-31"})
     
-    task1 >> task2 >> task3 >> [task4 , task5] >> task6 >> task7
\ No newline at end of file
+    task1 >> task2 >> task3 >> task4 >> task5 >> task6 >> task7
\ No newline at end of file
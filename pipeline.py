@@ -21,8 +21,7 @@ if __name__ == "__main__":
     # extracting and loading weather stations data for
     # stations present in city_stations
     # creation of third table - readings
-    ingest_load_weather_readings(year=2020)
-    ingest_load_weather_readings(year=2021)
+    ingest_load_weather_readings_range(years=[2020, 2021])
     
     # creating table which has median temprature
     # for Germany over each day.
@@ -1,7 +1,7 @@
 import os
 from setuptools import setup, find_packages
 
-packages = find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"])
+packages = find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests", "benchmarks", "benchmarks.*"])
 
 reqs = []
 with open("requirements.txt") as f:
@@ -0,0 +1,71 @@
+import gzip
+import numpy as np
+import pandas as pd
+import pytest
+from weather_pipeline.ingestion.load.destination.chunks import filter_chunk, line_blocks, line_ranges, \
+                                                            parallel_chunks
+from weather_pipeline.ingestion.load.destination.schema import reader_kwargs, used_columns
+
+NAMES_TYPES = [("ID", "VARCHAR", "category"), ("DATE", "TIMESTAMP", "%Y%m%d"), 
+            ("ELEMENT", "VARCHAR", "category"), ("DATA", "REAL", "Int16"), ("M-FLAG", "CHAR"), 
+            ("Q-FLAG", "CHAR"), ("S-FLAG", "CHAR"), ("OBS-TIME", "CHAR")]
+COL_REQUIRED = ["ID", "DATE", "DATA"]
+FILTERS = [("ELEMENT", "TMAX")]
+
+
+def readings_lines(rows:int=10000, seed:int=0) -> bytes:
+    rng = np.random.default_rng(seed)
+    stations = [f"GM{index:09d}" for index in range(50)]
+    dates = pd.date_range("2020-01-01", periods=366).strftime("%Y%m%d")
+    lines = [f"{stations[rng.integers(50)]},{dates[rng.integers(366)]},"\
+            f"{rng.choice(['TMAX', 'TMIN', 'PRCP'])},{rng.integers(-300, 400)},,,E,"
+            for _ in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.fixture(params=["csv", "csv.gz"])
+def readings_file(request, tmp_path):
+    data = readings_lines()
+    path = tmp_path / f"readings.{request.param}"
+    if request.param.endswith(".gz"):
+        with gzip.open(path, "wb") as fl:
+            fl.write(data)
+    else:
+        path.write_bytes(data)
+    return path
+
+
+def test_line_ranges_cover_the_file_on_line_boundaries(tmp_path):
+    path = tmp_path / "readings.csv"
+    path.write_bytes(b"ID,DATE\n" + readings_lines(2000))
+    data = path.read_bytes()
+    
+    ranges = list(line_ranges(str(path), block_size=1000, skip_header=True))
+    
+    assert ranges[0][0] == len(b"ID,DATE\n") and ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+
+
+def test_line_blocks_hold_whole_lines(readings_file):
+    blocks = list(line_blocks(str(readings_file), block_size=1000))
+    
+    assert len(blocks) > 1
+    assert b"".join(blocks) == readings_lines()
+
+
+def test_parallel_chunks_match_the_serial_parse(readings_file):
+    join_keys = pd.Index([f"GM{index:09d}" for index in range(0, 50, 3)])
+    kwargs = reader_kwargs(NAMES_TYPES, used_columns(NAMES_TYPES, COL_REQUIRED, ["ELEMENT"]))
+    chunk_kwargs = dict(names_types=NAMES_TYPES, filters=FILTERS, col_required=COL_REQUIRED, 
+                        join_key="ID", join_keys=join_keys)
+    serial = filter_chunk(pd.read_csv(readings_file, header=None, **kwargs), **chunk_kwargs)
+    
+    chunks = list(parallel_chunks(str(readings_file), "csv", kwargs, workers=4, 
+                                block_size=16 * 1024, **chunk_kwargs))
+    
+    assert len(chunks) > 4
+    parallel = pd.concat(chunks, ignore_index=True)
+    assert len(parallel) > 0
+    pd.testing.assert_frame_equal(parallel.astype({"ID": str}), 
+                                serial.reset_index(drop=True).astype({"ID": str}))
\ No newline at end of file
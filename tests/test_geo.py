@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from weather_pipeline.transform.operator.geo import KM_PER_DEGREE, haversine_km, nearest_within
+
+
+def brute_force(points:pd.DataFrame, centers:pd.DataFrame, radius_km:float) -> dict:
+    """brute_force
+    ID -> (name, distance) of the nearest center within radius_km of
+    every point, comparing every pair, ties to the smaller name.
+    """
+    nearest = {}
+    for point in points.itertuples():
+        distances = haversine_km(point.LATITUDE, point.LONGITUDE, centers["lat"], centers["lon"])
+        within = sorted((distance, name) for distance, name in zip(distances, centers["name"]) 
+                        if distance <= radius_km)
+        if within:
+            nearest[point.ID] = (within[0][1], within[0][0])
+    return nearest
+
+
+def matched(points:pd.DataFrame, centers:pd.DataFrame, radius_km:float) -> dict:
+    pairs = nearest_within(points, centers, radius_km)
+    return {row.ID: (row.name, row.distance_km) for row in pairs.itertuples()}
+
+
+def assert_matches_brute_force(points:pd.DataFrame, centers:pd.DataFrame, radius_km:float) -> None:
+    expected = brute_force(points, centers, radius_km)
+    found = matched(points, centers, radius_km)
+    assert found.keys() == expected.keys()
+    for key, (name, distance) in expected.items():
+        assert found[key][0] == name
+        assert np.isclose(found[key][1], distance)
+
+
+def scattered(rng, count:int, lat:tuple, lon:tuple, prefix:str) -> pd.DataFrame:
+    return pd.DataFrame({"lat": rng.uniform(*lat, count), "lon": rng.uniform(*lon, count),
+                        "name": [f"{prefix}{index:04d}" for index in range(count)]})
+
+
+def test_nearest_within_matches_brute_force():
+    rng = np.random.default_rng(0)
+    centers = scattered(rng, 300, (47, 55), (6, 15), "c")
+    stations = scattered(rng, 2000, (47, 55), (6, 15), "s")
+    points = stations.rename(columns={"lat": "LATITUDE", "lon": "LONGITUDE", "name": "ID"})
+    
+    assert_matches_brute_force(points, centers, 5.0)
+
+
+def test_points_on_cell_edges():
+    radius_km = 5.0
+    cell = radius_km / KM_PER_DEGREE
+    # centers on grid lines, points just across them and one radius away
+    centers = pd.DataFrame({"lat": [50 * cell, 1100 * cell], "lon": [200 * cell, 210 * cell], 
+                            "name": ["a", "b"]})
+    points = pd.DataFrame({"ID": ["p1", "p2", "p3", "p4", "p5"],
+                        "LATITUDE": [50 * cell - 1e-9, 51 * cell - 1e-9, 49 * cell + 1e-9, 
+                                    1100 * cell, 1100 * cell],
+                        "LONGITUDE": [200 * cell, 200 * cell, 201 * cell, 211 * cell - 1e-9, 
+                                    209 * cell + 1e-9]})
+    
+    assert_matches_brute_force(points, centers, radius_km)
+    assert set(matched(points, centers, radius_km)) >= {"p1", "p4", "p5"}
+
+
+def test_longitude_span_at_high_latitude():
+    # one degree of longitude is about 23 km at 78N, a radius spans several cells
+    rng = np.random.default_rng(1)
+    centers = scattered(rng, 40, (77.5, 78.5), (10, 20), "c")
+    stations = scattered(rng, 1000, (77.5, 78.5), (10, 20), "s")
+    points = stations.rename(columns={"lat": "LATITUDE", "lon": "LONGITUDE", "name": "ID"})
+    # stations due east and west of a center, just within the radius
+    center = centers.iloc[0]
+    offset = 4.99 / (KM_PER_DEGREE * np.cos(np.radians(center["lat"])))
+    edge = pd.DataFrame({"ID": ["east", "west"], "LATITUDE": [center["lat"]] * 2,
+                        "LONGITUDE": [center["lon"] + offset, center["lon"] - offset]})
+    points = pd.concat([points, edge], ignore_index=True)
+    
+    assert_matches_brute_force(points, centers, 5.0)
+    assert {"east", "west"} <= set(matched(points, centers, 5.0))
+
+
+def test_ties_go_to_the_smaller_center_key():
+    centers = pd.DataFrame({"lat": [50.0, 50.0, 50.01], "lon": [10.0, 10.0, 10.0], 
+                            "name": ["b", "a", "c"]})
+    points = pd.DataFrame({"ID": ["p"], "LATITUDE": [50.02], "LONGITUDE": [10.0]})
+    
+    assert matched(points, centers, 5.0)["p"][0] == "c"
+    assert matched(points.assign(LATITUDE=[49.99]), centers, 5.0)["p"][0] == "a"
\ No newline at end of file
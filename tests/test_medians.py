@@ -0,0 +1,56 @@
+import statistics
+import numpy as np
+import pandas as pd
+from weather_pipeline.ingestion.load.destination.medians import dailyMedians, exact_medians, medianAccumulator
+
+
+def expected_medians(groups, values):
+    by_group = {}
+    for group, value in zip(groups, values):
+        if value is not None and not np.isnan(value):
+            by_group.setdefault(group, []).append(value)
+    return {group: statistics.median(group_values) for group, group_values in by_group.items()}
+
+
+def test_exact_medians_odd_and_even_groups():
+    rng = np.random.default_rng(0)
+    # group 0 has an odd count, group 1 an even count, group 2 a single value
+    groups = np.array([0] * 7 + [1] * 8 + [2])
+    values = rng.integers(-300, 400, size=len(groups)).astype("float64")
+    order = rng.permutation(len(groups))
+    codes, medians = exact_medians(groups[order], values[order])
+    
+    assert codes.tolist() == [0, 1, 2]
+    assert dict(zip(codes.tolist(), medians.tolist())) == expected_medians(groups, values)
+
+
+def test_exact_medians_interpolates_even_groups():
+    codes, medians = exact_medians(np.array([5, 5, 5, 5]), np.array([4, 1, 3, 10], dtype="int16"))
+    
+    assert codes.tolist() == [5]
+    assert medians.tolist() == [3.5]
+
+
+def test_accumulator_ignores_nulls_across_chunks():
+    groups = [1, 1, 1, 2, 2, 2, 2, 3]
+    values = [10.0, np.nan, 30.0, 5.0, 7.0, np.nan, 1.0, np.nan]
+    accumulator = medianAccumulator(capacity=2)
+    accumulator.add(np.array(groups[:3]), np.array(values[:3]))
+    accumulator.add(np.array(groups[3:]), np.array(values[3:]))
+    codes, medians = accumulator.medians()
+    
+    # a group with only NULL values has no median, its SQL aggregate is NULL
+    assert codes.tolist() == [1, 2]
+    assert dict(zip(codes.tolist(), medians.tolist())) == expected_medians(groups, values)
+
+
+def test_daily_medians_with_nullable_values_and_groups():
+    chunk = pd.DataFrame({"ID": ["A", "B", "C", "A", "B"],
+                        "DATE": pd.to_datetime(["2020-01-01"] * 3 + ["2020-01-02"] * 2),
+                        "DATA": pd.array([10, 20, None, 7, 8], dtype="Int16")})
+    medians = dailyMedians("DATE", "DATA", "ID", pd.Series({"A": "x", "B": "x", "C": "y"}, name="name"))
+    medians.add(chunk)
+    total, by_group = medians.frames()
+    
+    assert total["median_data"].tolist() == [15.0, 7.5]
+    assert by_group[["name", "median_data"]].values.tolist() == [["x", 15.0], ["x", 7.5]]
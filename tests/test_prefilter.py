@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+from weather_pipeline.ingestion.load.destination.chunks import filter_chunk
+from weather_pipeline.ingestion.load.destination.prefilter import filtered_stream, line_predicate
+from weather_pipeline.ingestion.load.destination.schema import column_names, reader_kwargs, used_columns
+
+NAMES_TYPES = [("ID", "VARCHAR"), ("DATE", "TIMESTAMP", "%Y%m%d"), ("ELEMENT", "VARCHAR"), 
+            ("DATA", "REAL", "Int16"), ("M-FLAG", "CHAR"), ("Q-FLAG", "CHAR"), ("S-FLAG", "CHAR"), 
+            ("OBS-TIME", "CHAR")]
+NAMES = column_names(NAMES_TYPES)
+COL_REQUIRED = ["ID", "DATE", "DATA"]
+FILTERS = [("ELEMENT", "TMAX")]
+KEYS = pd.Index(["GM000000001", "GM000000003"])
+LINES = [
+    "GM000000001,20200101,TMAX,100,,,E,",
+    "GM000000001,20200101,TMIN,-20,,,E,",
+    "GM000000002,20200101,TMAX,110,,,E,",
+    "GM000000003,20200102,TMAX,-5,,,E,0700",
+    "GM000000003,20200102,PRCP,0,,,E,",
+    # TMAX as the value of another column
+    "GM000000003,20200103,PRCP,0,TMAX,,E,",
+    # quoted fields
+    '"GM000000001",20200104,"TMAX",120,,,E,',
+    'GM000000003,"20200105",TMAX,"130",,,E,',
+    '"GM000000002",20200105,"TMAX",140,,,E,',
+    '"GM000000003",20200106,"TMIN",150,,,E,',
+    # short lines
+    "GM000000003,20200107",
+    "GM000000003,20200108,TMAX",
+    "GM000000001,20200109,TMAX,160",
+    "",
+    "GM000000001,20200110,TMAX,170,,,E,",
+]
+
+
+def parse(source, kwargs:dict, after=None) -> pd.DataFrame:
+    chunk = pd.read_csv(source, header=None, **kwargs)
+    return filter_chunk(chunk, NAMES_TYPES, FILTERS, COL_REQUIRED, "ID", KEYS, after).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("after", [None, ("DATE", pd.Timestamp("2020-01-04"))])
+def test_filtered_stream_keeps_the_rows_the_parser_keeps(tmp_path, after):
+    path = tmp_path / "readings.csv"
+    path.write_text("\n".join(LINES) + "\n")
+    kwargs = reader_kwargs(NAMES_TYPES, used_columns(NAMES_TYPES, COL_REQUIRED, ["ELEMENT"]))
+    greater = [(after[0], after[1].strftime("%Y%m%d"))] if after else None
+    
+    expected = parse(path, kwargs, after)
+    stream = filtered_stream(path, NAMES, filters=FILTERS, key_column="ID", keys=KEYS, 
+                            block_size=64, greater=greater)
+    
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(parse(stream, kwargs, after), expected)
+
+
+def test_line_predicate_rejects_before_parsing():
+    keep = line_predicate(NAMES, FILTERS, "ID", KEYS)
+    
+    kept = [line for line in LINES if keep(line.encode())]
+    
+    assert kept == [LINES[0], LINES[3]] + LINES[6:10] + [LINES[11], LINES[12], LINES[14]]
\ No newline at end of file
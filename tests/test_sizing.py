@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from weather_pipeline.ingestion.load.destination import sizing
+from weather_pipeline.ingestion.load.destination.sizing import COPIES_IN_MEMORY, chunkSizer, summarize
+
+
+class fakeReader:
+    """fakeReader
+    get_chunk of a TextFileReader over rows rows of one int64 column
+    with an int64 index, 16 bytes per row.
+    """
+    def __init__(self, rows:int) -> None:
+        self.left = rows
+    
+    def get_chunk(self, size:int) -> pd.DataFrame:
+        if not self.left:
+            raise StopIteration
+        size = min(size, self.left)
+        self.left -= size
+        return pd.DataFrame({"DATA": np.zeros(size, dtype="int64")}, index=np.arange(size))
+
+
+class fakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+    
+    def perf_counter(self) -> float:
+        return self.now
+
+
+def consume(monkeypatch, sizer:chunkSizer, rows:int, seconds) -> list:
+    """consume
+    Runs the chunks of a fakeReader through sizer, every chunk taking
+    seconds(rows of the chunk) of the fake clock. Returns the chunk sizes.
+    """
+    clock = fakeClock()
+    monkeypatch.setattr(sizing, "time", clock)
+    for chunk in sizer.chunks(fakeReader(rows)):
+        clock.now += seconds(len(chunk))
+    return sizer.sizes
+
+
+def test_grows_while_faster_and_settles_on_the_fastest_size(monkeypatch):
+    sizer = chunkSizer(memory_budget=1024 ** 3, initial_rows=10000)
+    # a fixed cost per chunk, larger chunks are faster until it is amortized
+    sizes = consume(monkeypatch, sizer, 6000000, lambda rows: 0.05 + rows * 1e-6)
+    
+    assert sizer.settled and sizer.best_rows == 640000
+    assert summarize(sizes).startswith("10000 x3, 20000 x2, 40000 x2, 80000 x2")
+    # 1280000 was timed, not faster enough, the rest is read at the best size
+    assert sizes[-2] == 640000 and 1280000 in sizes
+
+
+def test_respects_the_memory_ceiling(monkeypatch):
+    budget = 16 * COPIES_IN_MEMORY * 50000
+    sizer = chunkSizer(memory_budget=budget, initial_rows=10000)
+    # always faster with larger chunks, only the budget stops the growth
+    sizes = consume(monkeypatch, sizer, 1000000, lambda rows: 0.1)
+    
+    assert sizer.ceiling == 50000
+    assert max(sizes) == 50000 and sizer.settled
+    assert sizes[-2] == 50000
+
+
+def test_caps_an_initial_size_over_the_budget(monkeypatch):
+    budget = 16 * COPIES_IN_MEMORY * 50000
+    sizer = chunkSizer(memory_budget=budget, initial_rows=200000)
+    sizes = consume(monkeypatch, sizer, 1000000, lambda rows: 0.1)
+    
+    assert sizes[0] == 200000
+    assert max(sizes[1:]) == 50000 and sizer.settled
\ No newline at end of file
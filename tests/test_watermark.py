@@ -0,0 +1,72 @@
+import pandas as pd
+from sqlalchemy import create_engine
+from weather_pipeline.ingestion.load import Loader
+from weather_pipeline.ingestion.load.destination.watermark import get_watermark
+
+NAMES_TYPES = [("ID", "VARCHAR", "category"), ("DATE", "TIMESTAMP", "%Y%m%d"), 
+            ("ELEMENT", "VARCHAR", "category"), ("DATA", "REAL", "Int16"), ("M-FLAG", "CHAR"), 
+            ("Q-FLAG", "CHAR"), ("S-FLAG", "CHAR"), ("OBS-TIME", "CHAR")]
+KEY = "ghcn_by_year/2020"
+
+
+def write_readings(path, values:dict) -> None:
+    """write_readings
+    One TMAX line per (station, YYYYMMDD) -> value and a TMIN line that
+    is filtered out.
+    """
+    lines = []
+    for (station, date), value in sorted(values.items()):
+        lines.append(f"{station},{date},TMAX,{value},,,E,")
+        lines.append(f"{station},{date},TMIN,{value - 100},,,E,")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def load(db:str, path) -> None:
+    loader = Loader(destination_type="sqlite", connection_string=db, file=path, table_name="readings")
+    loader.init().load_and_merge_on(chunksize=7,
+                                    names_types=NAMES_TYPES,
+                                    filters=[("ELEMENT", "TMAX")],
+                                    col_required=["ID", "DATE", "DATA"],
+                                    join_with="city_stations",
+                                    join_key="ID",
+                                    join_mode="memory",
+                                    watermark_key=KEY,
+                                    late_window_days=3,
+                                    header=None)
+
+
+def readings(engine) -> pd.DataFrame:
+    return pd.read_sql('SELECT "ID", "DATE", "DATA" FROM readings ORDER BY "ID", "DATE"', con=engine, 
+                    parse_dates=["DATE"])
+
+
+def test_incremental_reload_replaces_the_late_window_only(tmp_path):
+    db = f"sqlite:///{tmp_path / 'weather.db'}"
+    engine = create_engine(db)
+    pd.DataFrame({"ID": ["GM1", "GM2"]}).to_sql("city_stations", con=engine, index=False)
+    days = [f"202001{day:02d}" for day in range(1, 11)]
+    values = {(station, day): 100 + index for index, day in enumerate(days) for station in ("GM1", "GM2", "XX9")}
+    path = tmp_path / "2020.csv"
+    write_readings(path, values)
+    
+    load(db, path)
+    assert len(readings(engine)) == 20
+    assert get_watermark(engine, KEY) == pd.Timestamp("2020-01-10")
+    
+    # a late correction inside the window (after 01-07), one before it, two new days
+    values[("GM1", "20200108")] = 500
+    values[("GM1", "20200102")] = 600
+    values.update({(station, day): 200 for day in ("20200111", "20200112") for station in ("GM1", "GM2")})
+    write_readings(path, values)
+    load(db, path)
+    load(db, path)
+    
+    rows = readings(engine)
+    assert len(rows) == 24
+    assert not rows.duplicated(["ID", "DATE"]).any()
+    assert get_watermark(engine, KEY) == pd.Timestamp("2020-01-12")
+    data = rows.set_index(["ID", "DATE"])["DATA"]
+    assert data[("GM1", pd.Timestamp("2020-01-08"))] == 500
+    # before the late window, not reloaded
+    assert data[("GM1", pd.Timestamp("2020-01-02"))] == 101
+    assert data[("GM2", pd.Timestamp("2020-01-12"))] == 200
\ No newline at end of file
@@ -0,0 +1,122 @@
+import os
+from pathlib import Path
+import pytest
+import requests
+from benchmarks.server import quietHandler, serve
+from weather_pipeline.ingestion.extract.source.cache import downloadCache
+from weather_pipeline.ingestion.extract.source.web import webSource
+
+
+class rangeHandler(quietHandler):
+    """rangeHandler
+    Static file handler with a strong ETag, If-None-Match, Range and
+    If-Range, recording the headers of every request. The first response
+    is cut after server.cut_after bytes when set.
+    """
+    def do_GET(self) -> None:
+        path = Path(self.translate_path(self.path))
+        data = path.read_bytes()
+        etag = f'"{len(data)}-{path.stat().st_mtime_ns}"'
+        self.server.seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == etag:
+            start = int(self.headers["Range"][len("bytes="):].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        body = data[start:]
+        if self.server.cut_after is not None:
+            body, self.server.cut_after = body[:self.server.cut_after], None
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / "www"
+    root.mkdir()
+    server = serve(root, handler=rangeHandler)
+    server.seen, server.cut_after = [], None
+    server.root = root
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+
+
+def source(server, tmp_path, name:str, **kwargs) -> webSource:
+    return webSource(source_url=f"{server.url}/{name}", temp_location=tmp_path / "tmp" / name,
+                    cache_root=tmp_path / "tmp", **kwargs)
+
+
+def test_not_modified_reuses_the_download(server, tmp_path):
+    (server.root / "a.csv").write_bytes(b"a" * 1000)
+    source(server, tmp_path, "a.csv").get()
+    
+    again = source(server, tmp_path, "a.csv")
+    again.get()
+    
+    assert again.metrics.counters["not_modified"] == 1
+    assert "If-None-Match" in server.seen[1]
+    assert again.filepath.read_bytes() == b"a" * 1000
+
+
+def test_interrupted_download_resumes_with_range(server, tmp_path):
+    data = os.urandom(300000)
+    (server.root / "b.csv").write_bytes(data)
+    server.cut_after = 100000
+    
+    driver = source(server, tmp_path, "b.csv")
+    driver.get(chunksize=8192)
+    
+    assert driver.metrics.counters["retries"] == 1
+    # resumed from the chunks written before the cut
+    offset = int(server.seen[1]["Range"][len("bytes="):].rstrip("-"))
+    assert 0 < offset <= 100000 and offset % 8192 == 0
+    assert server.seen[1]["If-Range"].startswith('"300000-')
+    assert driver.filepath.read_bytes() == data
+    assert not driver.partial_filepath.exists() and not driver.validator_filepath.exists()
+
+
+def test_changed_source_restarts_the_partial_download(server, tmp_path):
+    (server.root / "c.csv").write_bytes(b"old" * 1000)
+    server.cut_after = 1500
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        source(server, tmp_path, "c.csv", retries=0).get()
+    (server.root / "c.csv").write_bytes(b"new" * 2000)
+    
+    driver = source(server, tmp_path, "c.csv")
+    driver.get()
+    
+    assert "Range" in server.seen[1]
+    assert driver.filepath.read_bytes() == b"new" * 2000
+
+
+def test_least_recently_used_files_are_evicted_beyond_the_budget(server, tmp_path):
+    for name in "abcd":
+        (server.root / f"{name}.csv").write_bytes(name.encode() * 1000)
+    get = lambda name: source(server, tmp_path, f"{name}.csv", cache_budget=2500).get() or \
+                        source(server, tmp_path, f"{name}.csv")
+    cache = downloadCache(root=tmp_path / "tmp")
+    
+    get("a").release()
+    get("b").release()
+    get("a").release()
+    get("c")
+    
+    assert cache.lookup(f"{server.url}/a.csv") and cache.lookup(f"{server.url}/c.csv")
+    assert cache.lookup(f"{server.url}/b.csv") is None
+    assert not (tmp_path / "tmp" / "b.csv").exists()
+    
+    # c is pinned until it is released, a goes instead
+    get("d")
+    assert cache.lookup(f"{server.url}/c.csv") and cache.lookup(f"{server.url}/d.csv")
+    assert cache.lookup(f"{server.url}/a.csv") is None
\ No newline at end of file
@@ -1,11 +1,18 @@
 from weather_pipeline.utils.app_logger import _get_logger
-from weather_pipeline.ingestion.extract.source.web import webSource
+from weather_pipeline.utils.drivers import import_driver
+
+# source_type -> driver class, imported on init()
+SOURCES = {
+    "web": "weather_pipeline.ingestion.extract.source.web:webSource",
+    "web_batch": "weather_pipeline.ingestion.extract.source.web:webBatchSource",
+}
 
 class Extractor:
     """Extractor
     
     Extractor driver Factory class that provides the drivers at runtime
-    based on which type of driver is requested.
+    based on which type of driver is requested. Drivers are looked up in
+    SOURCES and their module is only imported by init().
     
     Method:
     ------
@@ -14,10 +21,13 @@ class Extractor:
     """
     def __init__(self, source_type, **kwargs):
         self.logger = _get_logger(name=__name__)
-        if source_type == "web":
-            self.driver = webSource(**kwargs)
-        else:
+        if source_type not in SOURCES:
             raise NotImplementedError
+        self.source_type = source_type
+        self.kwargs = kwargs
+        self.driver = None
     
     def init(self):
+        if self.driver is None:
+            self.driver = import_driver(SOURCES[self.source_type])(**self.kwargs)
         return self.driver
\ No newline at end of file
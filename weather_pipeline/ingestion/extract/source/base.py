@@ -1,5 +1,6 @@
 import abc
 from weather_pipeline.utils.app_logger import _get_logger
+from weather_pipeline.utils.metrics import stageMetrics
 
 class BaseSource(metaclass=abc.ABCMeta):
     """BaseSource
@@ -11,9 +12,13 @@ class BaseSource(metaclass=abc.ABCMeta):
     1. get():
         Abstract method beared by all the sources of extraction
         to define a single point of fetching content.
+    
+    self.metrics times the download spans and counts the bytes and
+    retries of every operation decorated with metrics.traced.
     """
     def __init__(self, _name:str=__name__):
         self.logger= _get_logger(name=_name)
+        self.metrics = stageMetrics(component=_name, logger=self.logger)
     
     @abc.abstractmethod
     def get(self):
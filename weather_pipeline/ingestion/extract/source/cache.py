@@ -0,0 +1,144 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+from weather_pipeline.utils.app_logger import _get_logger
+
+_lock = threading.Lock()
+
+
+def _alive(pid:int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class downloadCache:
+    """downloadCache
+    
+    Index of downloaded files keyed by source URL, stored as a JSON file
+    next to the downloads. Each entry keeps the local path, the validators
+    (ETag / Last-Modified) the server sent and when it was last used, so
+    sources can revalidate instead of downloading again and the least
+    recently used files are evicted beyond the disk budget.
+    
+    The index is shared by the processes of parallel tasks, it is read 
+    and rewritten under an exclusive lock on a .lock file next to it. A
+    stored or reused file is pinned by the process until it releases it
+    or exits, it may not be loaded yet and is never evicted meanwhile.
+    
+    Methods:
+    -------
+    lookup(url):
+        Entry for url if its file is still complete on disk.
+    store(url, path, etag, last_modified):
+        Records a completed download.
+    touch(url):
+        Marks the entry as used.
+    release(url):
+        Unpins the entry once this process is done with its file.
+    evict(keep):
+        Deletes least recently used files until under budget, except
+        keep and the files pinned by live processes.
+    """
+    def __init__(self, root:str="tmp", budget_bytes:Optional[int]=None) -> None:
+        self.logger = _get_logger(name=__name__)
+        self.root = Path(root)
+        self.index_path = self.root / ".download_cache.json"
+        self.budget_bytes = budget_bytes
+    
+    def _read(self) -> dict:
+        try:
+            with open(self.index_path) as fl:
+                return json.load(fl)
+        except (OSError, ValueError):
+            return {}
+    
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """_locked
+        Holds the index against the threads of this process and against
+        other processes.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with _lock, open(f"{self.index_path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+    
+    @staticmethod
+    def _pin(entry:dict) -> None:
+        pids = [pid for pid in entry.get("pinned_by", []) if _alive(pid)]
+        entry["pinned_by"] = sorted(set(pids + [os.getpid()]))
+    
+    def _write(self, index:dict) -> None:
+        temp = self.index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}")
+        with open(temp, "w") as fl:
+            json.dump(index, fl, indent=1)
+        os.replace(temp, self.index_path)
+    
+    def lookup(self, url:str) -> Optional[dict]:
+        with self._locked():
+            entry = self._read().get(url)
+        if entry is None:
+            return None
+        path = Path(entry["path"])
+        if not path.exists() or path.stat().st_size != entry["size"]:
+            return None
+        return entry
+    
+    def store(self, url:str, path:Path, etag:Optional[str]=None,
+            last_modified:Optional[str]=None) -> None:
+        with self._locked():
+            index = self._read()
+            entry = {"path": str(path),
+                    "size": Path(path).stat().st_size,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "last_used": time.time(),
+                    "pinned_by": index.get(url, {}).get("pinned_by", [])}
+            self._pin(entry)
+            index[url] = entry
+            self._write(index)
+    
+    def touch(self, url:str) -> None:
+        with self._locked():
+            index = self._read()
+            if url in index:
+                index[url]["last_used"] = time.time()
+                self._pin(index[url])
+                self._write(index)
+    
+    def release(self, url:str) -> None:
+        with self._locked():
+            index = self._read()
+            if url in index and os.getpid() in index[url].get("pinned_by", []):
+                index[url]["pinned_by"].remove(os.getpid())
+                self._write(index)
+    
+    def evict(self, keep:Optional[str]=None) -> None:
+        if self.budget_bytes is None:
+            return
+        with self._locked():
+            index = self._read()
+            total = sum(entry["size"] for entry in index.values())
+            for url, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.budget_bytes:
+                    break
+                if url == keep or any(_alive(pid) for pid in entry.get("pinned_by", [])):
+                    continue
+                self.logger.info(f"Evicting {entry['path']} from download cache")
+                try:
+                    os.remove(entry["path"])
+                except FileNotFoundError:
+                    pass
+                total -= entry["size"]
+                del index[url]
+            self._write(index)
\ No newline at end of file
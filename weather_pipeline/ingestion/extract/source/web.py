@@ -1,32 +1,104 @@
+import io
+import os
+import gzip
+import json
+import threading
 import requests
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+from urllib.parse import urlparse
 from tqdm import tqdm
 from pathlib import Path
 from .base import BaseSource
+from .cache import downloadCache
+from weather_pipeline.config import DOWNLOAD_CACHE_BUDGET_BYTES
+from weather_pipeline.utils.metrics import traced
+
+
+class teeStream(io.RawIOBase):
+    """teeStream
+    
+    Read-only raw stream that copies every byte read from the wrapped
+    stream into a file, calling on_complete once the end is reached.
+    """
+    def __init__(self, raw, path:Path, on_complete=None) -> None:
+        self.raw = raw
+        self.file = open(path, "wb")
+        self.on_complete = on_complete
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        if not data:
+            if not self.file.closed:
+                self.file.close()
+                if self.on_complete:
+                    self.on_complete()
+            return 0
+        self.file.write(data)
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+        self.raw.close()
+        super().close()
 
 
 class webSource(BaseSource):
     """webSource
     
-    Deriver from BaseSource, implements extraction from web as 
+    Deriver from BaseSource, implements extraction from web as
     source.
     
+    Downloads are cached by URL: the stored ETag / Last-Modified are sent
+    as If-None-Match / If-Modified-Since and a 304 reuses the local file.
+    Transfers land in a .part file first, with the validators of the
+    transfer in a .part.json file next to it. An interrupted transfer is
+    resumed with an HTTP Range request guarded by If-Range, a source that
+    changed since answers with the whole file and the transfer restarts.
+    
     Methods:
     -------
     get(chunksize)
-    Responsible to fetch data from web as chunk.
+    Responsible to fetch data from web as chunk, traced with the
+    download span and the bytes and retries counters.
+        Params:
+        1. chunksize (INT): Default 1024. chunksize to read and write.
+    
+    release()
+    Unpins the downloaded file in the cache once it is loaded, later
+    downloads may evict it from then on. Files are released when the
+    process exits too.
+    
+    stream(land)
+    Returns a file-like, decompressed byte stream of the source to be
+    consumed directly by a loader, without landing the file first.
         Params:
-        1. chunksize (INT): Default 1024. chunksize to read and write. 
+        1. land (BOOL): Default False. Also write the bytes to the temp
+            location while they are read, to serve later runs from cache.
     """
     def __init__(self, **kwargs) -> None:
         super().__init__(_name = __name__)
         self.source = kwargs.get("source_url", None)
         self.temp_destination = kwargs.get("temp_location", None)
+        self.use_cache = kwargs.get("use_cache", True)
+        self.retries = kwargs.get("retries", 3)
+        self.timeout = kwargs.get("timeout", 60)
+        self.session = kwargs.get("session", None) or requests
         
         if self.temp_destination is None:
             filename = self.source.rsplit('/')[-1]
             self.temp_destination = f"tmp/{filename}"
         
         self.temp_destination= Path(self.temp_destination)
+        self.metrics.labels["target"] = self.source
+        self.cache = downloadCache(root=kwargs.get("cache_root", "tmp"),
+                                budget_bytes=kwargs.get("cache_budget", DOWNLOAD_CACHE_BUDGET_BYTES))
         self.__validator()
     
     def __validator(self):
@@ -36,17 +108,240 @@ class webSource(BaseSource):
     def filepath(self):
         return self.temp_destination
     
-    def get(self, chunksize:int=1024) -> None:
+    @property
+    def partial_filepath(self):
+        return self.temp_destination.with_name(self.temp_destination.name + ".part")
+    
+    @property
+    def validator_filepath(self):
+        return self.temp_destination.with_name(self.temp_destination.name + ".part.json")
+    
+    def _partial_validators(self) -> dict:
         try:
-            self.logger.info(f"Beginning to download, file at {self.source}"
-                f" :: {self.temp_destination}")
-            
-            response = requests.get(self.source, stream=True)
+            with open(self.validator_filepath) as fl:
+                return json.load(fl)
+        except (OSError, ValueError):
+            return {}
+    
+    def _start_partial(self, response) -> None:
+        """_start_partial
+        Records the validators of a transfer written to the .part file from
+        its first byte, for a later Range request to resume it.
+        """
+        with open(self.validator_filepath, "w") as fl:
+            json.dump({"etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified")}, fl)
+    
+    def _discard_partial(self) -> None:
+        for path in (self.partial_filepath, self.validator_filepath):
+            if path.exists():
+                path.unlink()
+    
+    def _headers(self) -> dict:
+        headers = {}
+        partial = self.partial_filepath
+        if partial.exists() and partial.stat().st_size > 0:
+            validators = self._partial_validators()
+            etag = validators.get("etag")
+            # If-Range needs a strong ETag or a date
+            if_range = etag if etag and not etag.startswith("W/") else validators.get("last_modified")
+            if if_range:
+                headers["Range"] = f"bytes={partial.stat().st_size}-"
+                headers["If-Range"] = if_range
+                headers["Accept-Encoding"] = "identity"
+                return headers
+            self.logger.info(f"No validator for {partial}, downloading {self.source} again")
+            self._discard_partial()
+        
+        entry = self.cache.lookup(self.source) if self.use_cache else None
+        if entry and Path(entry["path"]) == self.temp_destination:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+    
+    def _fetch(self, chunksize:int) -> None:
+        headers = self._headers()
+        response = self.session.get(self.source, stream=True, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304:
+            self.logger.info(f"Not modified, reusing {self.temp_destination}")
+            self.cache.touch(self.source)
+            self.metrics.count("not_modified")
+            return
+        
+        if response.status_code == 416:
+            # nothing left to send when the partial file is already complete
+            size = self.partial_filepath.stat().st_size if self.partial_filepath.exists() else None
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if size is not None and total.isdigit() and int(total) == size:
+                self.logger.info(f"{self.partial_filepath} is already complete")
+                return self._complete(**self._partial_validators())
+            self.logger.info(f"Range not satisfiable, downloading {self.source} again")
+            self._discard_partial()
+            return self._fetch(chunksize)
+        
+        response.raise_for_status()
+        if response.status_code == 206:
+            offset = self.partial_filepath.stat().st_size if "Range" in headers else None
+            if offset is None or \
+                    not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                self.logger.info(f"Unexpected range from {self.source}, downloading it again")
+                self._discard_partial()
+                return self._fetch(chunksize)
+            self.logger.info(f"Resuming download of {self.source} from {headers['Range']}")
+            mode = "ab"
+        else:
+            if "Range" in headers:
+                # If-Range did not match, the source changed since the partial transfer
+                self.logger.info(f"{self.source} changed since the partial download, restarting it")
+            self._start_partial(response)
+            mode = "wb"
+        
+        total = response.headers.get("Content-Length")
+        received = 0
+        with open(self.partial_filepath, mode) as fl, self.metrics.span("download"):
+            # iter_content raises a dropped connection as a requests exception, get retries it
+            for chunk in tqdm(response.iter_content(chunksize),
+                            total=int(total) // chunksize + 1 if total else None):
+                fl.write(chunk)
+                received += len(chunk)
+                self.metrics.count("bytes", len(chunk))
+        if total and not response.headers.get("Content-Encoding") and received < int(total):
+            raise requests.exceptions.ChunkedEncodingError(
+                f"Connection closed after {received} of {total} bytes of {self.source}")
+        
+        self._complete(etag=response.headers.get("ETag"), 
+                    last_modified=response.headers.get("Last-Modified"))
+    
+    def _complete(self, etag:Optional[str]=None, last_modified:Optional[str]=None) -> None:
+        os.replace(self.partial_filepath, self.temp_destination)
+        if self.validator_filepath.exists():
+            self.validator_filepath.unlink()
+        if self.use_cache:
+            self.cache.store(self.source, self.temp_destination,
+                            etag=etag,
+                            last_modified=last_modified)
+            self.cache.evict(keep=self.source)
+    
+    def release(self) -> None:
+        if self.use_cache:
+            self.cache.release(self.source)
+    
+    def stream(self, land:bool=False) -> io.BufferedReader:
+        self.logger.info(f"Streaming {self.source}")
+        headers = {}
+        if land:
             self.temp_destination.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.temp_destination, "wb") as fl:
-                for chunk in tqdm(response.raw.stream(chunksize, decode_content=True)):
-                    fl.write(chunk)
+            headers = {key: value for key, value in self._headers().items() \
+                        if key.startswith("If-")}
+        
+        response = self.session.get(self.source, stream=True, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            self.logger.info(f"Not modified, streaming cached {self.temp_destination}")
+            self.cache.touch(self.source)
+            raw = open(self.temp_destination, "rb")
+        else:
+            response.raise_for_status()
+            raw = response.raw
+            raw.decode_content = True
+            if land:
+                self._start_partial(response)
+                raw = teeStream(raw, self.partial_filepath, 
+                                on_complete=lambda: self._complete(response.headers.get("ETag"), 
+                                                                response.headers.get("Last-Modified")))
+        
+        if self.temp_destination.suffix == ".gz":
+            return io.BufferedReader(gzip.GzipFile(fileobj=raw, mode="rb"))
+        return io.BufferedReader(raw) if isinstance(raw, io.RawIOBase) else raw
+    
+    @traced
+    def get(self, chunksize:int=1024) -> None:
+        self.logger.info(f"Beginning to download, file at {self.source}"
+            f" :: {self.temp_destination}")
+        self.temp_destination.parent.mkdir(parents=True, exist_ok=True)
+        
+        for attempt in range(self.retries + 1):
+            try:
+                return self._fetch(chunksize)
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == self.retries:
+                    self.logger.error(f"Failed to download file: {self.source} => {e}")
+                    raise
+                self.logger.warning(f"Download of {self.source} interrupted, retrying => {e}")
+                self.metrics.count("retries")
+            except Exception as e:
+                self.logger.error(f"Failed to download file: {self.source} => {e}")
+                raise
+
+
+class webBatchSource(BaseSource):
+    """webBatchSource
+    
+    Deriver from BaseSource, downloads a list of URLs concurrently through
+    one shared keep-alive session, each URL with the caching and resuming
+    of webSource.
+    
+    Methods:
+    -------
+    get(chunksize)
+    Generator yielding the local path of every file as soon as its 
+    download finishes, so loading can start while the rest still download.
+    A file is released in the cache when the next one is asked for.
+        Params:
+        1. chunksize (INT): Default 1024. chunksize to read and write.
+    
+    Params:
+    -------
+        source_urls: list of URLs to download.
+        temp_locations: optional local paths, one per URL.
+        max_workers: global limit of concurrent downloads.
+        per_host: limit of concurrent downloads against a single host.
+    """
+    def __init__(self, **kwargs) -> None:
+        super().__init__(_name = __name__)
+        self.sources = kwargs.pop("source_urls", None)
+        self.temp_destinations = kwargs.pop("temp_locations", None)
+        self.max_workers = kwargs.pop("max_workers", 4)
+        self.per_host = kwargs.pop("per_host", 2)
+        self.source_kwargs = kwargs
+        self.__validator()
+        
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_workers,
+                                                pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.host_limits = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
         
-        except Exception as e:
-            self.logger.error(f"Failed to download file: {self.source} => {e}")
\ No newline at end of file
+        temp_destinations = self.temp_destinations or [None] * len(self.sources)
+        self.drivers = [webSource(source_url=url, temp_location=location, 
+                                session=self.session, **self.source_kwargs)
+                        for url, location in zip(self.sources, temp_destinations)]
+    
+    def __validator(self):
+        assert self.sources, "No sources given to start extraction from"
+        assert self.temp_destinations is None or \
+            len(self.temp_destinations) == len(self.sources), "One temp location per source needed"
+    
+    @property
+    def filepaths(self) -> List[Path]:
+        return [driver.filepath for driver in self.drivers]
+    
+    def _get_one(self, driver:webSource, chunksize:int) -> Path:
+        with self.host_limits[urlparse(driver.source).netloc]:
+            driver.get(chunksize=chunksize)
+        return driver.filepath
+    
+    def get(self, chunksize:int=1024) -> Iterator[Path]:
+        self.logger.info(f"Downloading {len(self.drivers)} files, {self.max_workers} at a time")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(self._get_one, driver, chunksize): driver for driver in self.drivers}
+                for future in as_completed(futures):
+                    yield future.result()
+                    futures[future].release()
+        finally:
+            self.session.close()
\ No newline at end of file
@@ -1,11 +1,18 @@
 from weather_pipeline.utils.app_logger import _get_logger
-from weather_pipeline.ingestion.load.destination.rdbms import rdbmsLoader
+from weather_pipeline.utils.drivers import import_driver
+
+# destination_type -> driver class, imported on init()
+DESTINATIONS = {
+    "rdbms": "weather_pipeline.ingestion.load.destination.rdbms:rdbmsLoader",
+    "sqlite": "weather_pipeline.ingestion.load.destination.sqlite:sqliteLoader",
+}
 
 class Loader:
     """Loader
     
     Loader Driver Factory class that provides the drivers at runtime
-    based on which type of driver is requested.
+    based on which type of driver is requested. Drivers are looked up in
+    DESTINATIONS and their module is only imported by init().
     
     Method:
     ------
@@ -14,10 +21,13 @@ class Loader:
     """
     def __init__(self, destination_type, **kwargs):
         self.logger = _get_logger(name=__name__)
-        if destination_type == "rdbms":
-            self.driver = rdbmsLoader(**kwargs)
-        else:
+        if destination_type not in DESTINATIONS:
             raise NotImplementedError
+        self.destination_type = destination_type
+        self.kwargs = kwargs
+        self.driver = None
     
     def init(self):
+        if self.driver is None:
+            self.driver = import_driver(DESTINATIONS[self.destination_type])(**self.kwargs)
         return self.driver
\ No newline at end of file
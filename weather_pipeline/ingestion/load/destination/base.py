@@ -1,5 +1,6 @@
 import abc
 from weather_pipeline.utils.app_logger import _get_logger
+from weather_pipeline.utils.metrics import stageMetrics
 
 class BaseDestination(metaclass=abc.ABCMeta):
     """BaseDestination
@@ -15,9 +16,14 @@ class BaseDestination(metaclass=abc.ABCMeta):
     2. load_data_as_chunk():
         Abstract method beared by all the destinations to
         define a point for loading the data to destination as chunks.
+    
+    self.metrics times the parse, filter and write spans and counts the
+    bytes, rows and chunks of every operation decorated with
+    metrics.traced.
     """
     def __init__(self, _name:str=__name__):
         self.logger = _get_logger(name=_name)
+        self.metrics = stageMetrics(component=_name, logger=self.logger)
     
     @abc.abstractmethod
     def load_data(self):
@@ -0,0 +1,139 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import pandas as pd
+from .fixedwidth import read_fixed_width
+from .prefilter import iter_lines, line_predicate, open_binary
+from .schema import parse_dates
+
+BLOCK_SIZE = 32 * 1024 * 1024
+READERS = {"csv": pd.read_csv, "fixed_width": pd.read_fwf, "fixed_bytes": read_fixed_width}
+
+
+def filter_chunk(chunk:pd.DataFrame,
+                names_types:Optional[List[Tuple]]=None,
+                filters:Optional[List[Tuple[str, object]]]=None,
+                col_required:Optional[List[str]]=None,
+                join_key:Optional[str]=None,
+                join_keys:Optional[pd.Index]=None,
+                after:Optional[Tuple[str, object]]=None) -> pd.DataFrame:
+    """filter_chunk
+    Applies the equality filters, the column selection, the in-memory
+    semi-join and the date parsing to one parsed chunk. after keeps
+    only the rows whose column is past the value (a watermark).
+    """
+    for key, value in filters or []:
+        chunk = chunk[chunk[key] == value]
+    if col_required:
+        chunk = chunk[col_required]
+    if join_keys is not None:
+        chunk = chunk[chunk[join_key].isin(join_keys)]
+    if names_types:
+        chunk = parse_dates(chunk, names_types)
+    if after is not None:
+        chunk = chunk[chunk[after[0]] > after[1]]
+    return chunk
+
+
+def line_ranges(path:str, block_size:int=BLOCK_SIZE, skip_header:bool=False) -> Iterator[Tuple[int, int]]:
+    """line_ranges
+    Splits an uncompressed file into byte ranges of about block_size
+    that start and end on line boundaries.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as fl:
+        start = len(fl.readline()) if skip_header else 0
+        while start < size:
+            fl.seek(min(start + block_size, size))
+            fl.readline()
+            end = min(fl.tell(), size)
+            yield start, end
+            start = end
+
+
+def line_blocks(source, block_size:int=BLOCK_SIZE, skip_header:bool=False) -> Iterator[bytes]:
+    """line_blocks
+    Decompressed, line aligned blocks of a compressed file or stream,
+    for inputs that can not be split by byte offset.
+    """
+    stream = open_binary(source)
+    try:
+        first = skip_header
+        for lines in iter_lines(stream, block_size):
+            if first:
+                lines = lines[1:]
+                first = False
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def parse_block(block, reader_type:str, reader_kwargs:dict, prefilter:Optional[dict]=None,
+                **chunk_kwargs) -> Tuple[int, pd.DataFrame]:
+    """parse_block
+    Runs in a worker process: reads one block, either raw bytes or a
+    (path, start, end) byte range, optionally pre-filters its lines, then
+    parses and filters it. Returns the number of parsed rows with the
+    filtered chunk.
+    """
+    if isinstance(block, tuple):
+        path, start, end = block
+        with open(path, "rb") as fl:
+            fl.seek(start)
+            block = fl.read(end - start)
+    if prefilter:
+        keep = line_predicate(**prefilter)
+        block = b"\n".join([line for line in block.split(b"\n") if line and keep(line)]) + b"\n"
+    try:
+        chunk = READERS[reader_type](io.BytesIO(block), **reader_kwargs)
+    except pd.errors.EmptyDataError:
+        chunk = pd.DataFrame(columns=reader_kwargs.get("usecols") or reader_kwargs["names"])
+    return len(chunk), filter_chunk(chunk, **chunk_kwargs)
+
+
+def parallel_chunks(source,
+                    reader_type:str,
+                    reader_kwargs:dict,
+                    workers:int,
+                    max_in_flight:Optional[int]=None,
+                    block_size:int=BLOCK_SIZE,
+                    skip_header:bool=False,
+                    prefilter:Optional[dict]=None,
+                    metrics=None,
+                    **chunk_kwargs) -> Iterator[pd.DataFrame]:
+    """parallel_chunks
+    Parses and filters the blocks of source in a pool of worker processes
+    and yields the filtered chunks in file order. At most max_in_flight
+    blocks are queued, which bounds memory while keeping the consumer
+    (the database writer) fed. The parsed rows of every block are
+    counted as rows_in of metrics.
+    """
+    max_in_flight = max_in_flight or 2 * workers
+    reader_kwargs = dict(reader_kwargs, header=None)
+    reader_kwargs.pop("compression", None)
+
+    if not hasattr(source, "read") and Path(source).suffix != ".gz":
+        blocks = ((str(source), start, end) for start, end in line_ranges(source, block_size, skip_header))
+    else:
+        blocks = line_blocks(source, block_size, skip_header)
+
+    def result(future) -> pd.DataFrame:
+        rows, chunk = future.result()
+        if metrics is not None:
+            metrics.count("rows_in", rows)
+        return chunk
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for block in blocks:
+            if len(in_flight) >= max_in_flight:
+                yield result(in_flight.popleft())
+            in_flight.append(pool.submit(parse_block, block, reader_type, reader_kwargs,
+                                        prefilter, **chunk_kwargs))
+        while in_flight:
+            yield result(in_flight.popleft())
@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .schema import DATE_TYPES, SQL_DTYPES, column_option, reader_kwargs, to_dates
+
+HEADER = "header.json"
+VERSION = 1
+# sentinels of missing values in the integer arrays
+MISSING = {"int8": -128, "int16": -32768, "int32": -2 ** 31}
+
+
+def columnar_path(source) -> Path:
+    """columnar_path
+    Directory of the columnar staging copy of a source file.
+    """
+    return Path(f"{source}.cols")
+
+
+def _fingerprint(source) -> Dict[str, int]:
+    stat = os.stat(source)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_fresh(source, path=None) -> bool:
+    """is_fresh
+    Whether the columnar copy exists and was written from the current
+    version of source.
+    """
+    header = Path(path or columnar_path(source)) / HEADER
+    if not header.exists():
+        return False
+    with open(header) as fl:
+        meta = json.load(fl)
+    return meta.get("version") == VERSION and meta.get("source") == _fingerprint(source)
+
+
+def _code_dtype(size:int) -> str:
+    for dtype in ("int8", "int16"):
+        if size < np.iinfo(dtype).max:
+            return dtype
+    return "int32"
+
+
+def build_columnar(source,
+                names_types:List[Tuple],
+                path=None,
+                storage:Optional[Dict[str, str]]=None,
+                chunksize:int=1000000,
+                **kwargs) -> Path:
+    """build_columnar
+    Parses the delimited source once and writes every column of the
+    schema as a raw array: dates as int32 days since epoch, numeric
+    columns as their SQL dtype or the integer dtype given in storage
+    (e.g. {"DATA": "int16"} for tenths of a degree), everything else as
+    dictionary codes with the dictionary kept in the header. The header
+    is written last, a directory without one is incomplete.
+    """
+    path = Path(path or columnar_path(source))
+    storage = storage or {}
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+    
+    columns = []
+    for column in names_types:
+        name, sql_type = column[0], column[1].upper()
+        if sql_type in DATE_TYPES:
+            kind, dtype = "date", "int32"
+        elif name in storage or sql_type in SQL_DTYPES:
+            kind, dtype = "number", storage.get(name, SQL_DTYPES.get(sql_type))
+        else:
+            kind, dtype = "dictionary", "int32"
+        columns.append({"name": name, "sql_type": sql_type, "kind": kind, "dtype": dtype,
+                        "file": f"{len(columns)}.bin", "option": column_option(column)})
+    dictionaries = {column["name"]: {} for column in columns if column["kind"] == "dictionary"}
+    
+    parse_kwargs = reader_kwargs(names_types)
+    parse_kwargs["dtype"] = {name: dtype for name, dtype in parse_kwargs["dtype"].items() \
+                            if name not in storage}
+    for name in dictionaries:
+        # keep codes like "0700" verbatim instead of inferring numbers
+        parse_kwargs["dtype"].setdefault(name, "str")
+    parse_kwargs.update(kwargs)
+    rows = 0
+    files = {column["name"]: open(path / column["file"], "wb") for column in columns}
+    try:
+        for chunk in pd.read_csv(source, chunksize=chunksize, **parse_kwargs):
+            for column in columns:
+                files[column["name"]].write(_encode(chunk[column["name"]], column,
+                                                    dictionaries.get(column["name"])).tobytes())
+            rows += len(chunk)
+    finally:
+        for fl in files.values():
+            fl.close()
+    
+    for column in columns:
+        if column["kind"] == "dictionary":
+            column["dictionary"] = list(dictionaries[column["name"]])
+            _compact_codes(path / column["file"], column)
+    
+    meta = {"version": VERSION, "rows": rows, "source": _fingerprint(source), "columns": columns}
+    with open(path / f"{HEADER}.part", "w") as fl:
+        json.dump(meta, fl)
+    os.replace(path / f"{HEADER}.part", path / HEADER)
+    return path
+
+
+def _encode(values:pd.Series, column:dict, dictionary:Optional[dict]) -> np.ndarray:
+    if column["kind"] == "date":
+        days = to_dates(values, column["option"])
+        encoded = days.to_numpy().astype("datetime64[D]").astype("int64")
+        encoded[days.isna().to_numpy()] = MISSING["int32"]
+        return encoded.astype("int32")
+    if column["kind"] == "number":
+        dtype = np.dtype(column["dtype"])
+        if dtype.kind == "f":
+            return values.to_numpy(dtype=dtype, na_value=np.nan)
+        numbers = values.to_numpy(dtype="float64", na_value=np.nan)
+        present = ~np.isnan(numbers)
+        info = np.iinfo(dtype)
+        if (numbers[present] != np.round(numbers[present])).any() or \
+                (numbers[present] <= info.min).any() or (numbers[present] > info.max).any():
+            raise ValueError(f"{column['name']} does not fit {dtype}")
+        numbers[~present] = MISSING[dtype.name]
+        return numbers.astype(dtype)
+    # dictionary codes, new values are appended to the dictionary
+    categories = values.astype("category")
+    # the last slot maps the missing code -1 to itself
+    codes = np.full(len(categories.cat.categories) + 1, -1, dtype="int32")
+    for position, value in enumerate(categories.cat.categories):
+        codes[position] = dictionary.setdefault(str(value), len(dictionary))
+    return codes[categories.cat.codes.to_numpy()]
+
+
+def _compact_codes(file:Path, column:dict) -> None:
+    dtype = _code_dtype(len(column["dictionary"]))
+    if dtype != column["dtype"]:
+        codes = np.fromfile(file, dtype=column["dtype"])
+        codes.astype(dtype).tofile(file)
+        column["dtype"] = dtype
+
+
+class columnarStore:
+    """columnarStore
+    
+    Read side of the columnar staging copy, every column is opened with
+    numpy.memmap so a scan only pages in the columns it touches. Filters
+    are evaluated on the raw arrays (dictionary codes, day numbers)
+    before any frame is built.
+    
+    Methods:
+    --------
+    mask(start, stop, filters, key_column, keys, after):
+        Boolean mask of the rows in [start, stop) passing the equality
+        filters, the key set and the (column, value) lower bound.
+    frame(rows, columns):
+        DataFrame of the selected rows, dictionary columns as category,
+        dates as datetime64 and numbers as their SQL dtype.
+    iter_frames(chunksize, columns, filters, key_column, keys, after):
+        Filtered frames of at most chunksize scanned rows, in file order.
+    """
+    def __init__(self, path) -> None:
+        self.path = Path(path)
+        with open(self.path / HEADER) as fl:
+            meta = json.load(fl)
+        self.rows = meta["rows"]
+        self.columns = {column["name"]: column for column in meta["columns"]}
+        self.names = [column["name"] for column in meta["columns"]]
+        self._arrays = {}
+        self._categories = {}
+    
+    def array(self, name:str) -> np.ndarray:
+        if name not in self._arrays:
+            column = self.columns[name]
+            if self.rows == 0:
+                self._arrays[name] = np.empty(0, dtype=column["dtype"])
+            else:
+                self._arrays[name] = np.memmap(self.path / column["file"], dtype=column["dtype"],
+                                            mode="r", shape=(self.rows,))
+        return self._arrays[name]
+    
+    def categories(self, name:str) -> pd.Index:
+        if name not in self._categories:
+            self._categories[name] = pd.Index(self.columns[name]["dictionary"])
+        return self._categories[name]
+    
+    def _codes(self, name:str, values) -> np.ndarray:
+        codes = self.categories(name).get_indexer([str(value) for value in values])
+        return codes[codes >= 0]
+    
+    def _conditions(self,
+                    filters:Optional[List[Tuple[str, object]]]=None,
+                    key_column:Optional[str]=None,
+                    keys=None) -> Tuple[List[Tuple[str, np.ndarray]], List[Tuple[str, object]]]:
+        """_conditions
+        Splits the equality filters and the key set into code sets of the
+        dictionary columns and plain filters on the other columns.
+        """
+        coded, plain = [], []
+        for name, value in filters or []:
+            if self.columns[name]["kind"] == "dictionary":
+                coded.append((name, self._codes(name, [value])))
+            else:
+                plain.append((name, value))
+        if keys is not None:
+            coded.append((key_column, self._codes(key_column, keys)))
+        return coded, plain
+    
+    def mask(self,
+            start:int,
+            stop:int,
+            filters:Optional[List[Tuple[str, object]]]=None,
+            key_column:Optional[str]=None,
+            keys=None,
+            after:Optional[Tuple[str, object]]=None,
+            conditions=None) -> np.ndarray:
+        coded, plain = conditions or self._conditions(filters, key_column, keys)
+        keep = np.ones(stop - start, dtype=bool)
+        for name, codes in coded:
+            keep &= np.isin(self.array(name)[start:stop], codes)
+        for name, value in plain:
+            keep &= self.frame(slice(start, stop), [name])[name].to_numpy() == value
+        if after is not None and after[1] is not None:
+            name, value = after
+            if self.columns[name]["kind"] == "date":
+                bound = np.floor(pd.Timestamp(value).value / pd.Timedelta(days=1).value)
+                days = self.array(name)[start:stop]
+                keep &= (days > bound) & (days != MISSING["int32"])
+            else:
+                keep &= self.frame(slice(start, stop), [name])[name].to_numpy() > value
+        return keep
+    
+    def frame(self, rows, columns:Optional[List[str]]=None) -> pd.DataFrame:
+        data = {}
+        for name in columns or self.names:
+            column, raw = self.columns[name], self.array(name)[rows]
+            if column["kind"] == "dictionary":
+                data[name] = pd.Categorical.from_codes(raw.astype("int32"), categories=self.categories(name))
+            elif column["kind"] == "date":
+                days = raw.astype("int64").astype("datetime64[D]").astype("datetime64[ns]")
+                days[raw == MISSING["int32"]] = np.datetime64("NaT")
+                data[name] = days
+            else:
+                target = SQL_DTYPES.get(column["sql_type"], "float64")
+                if np.dtype(column["dtype"]).kind == "i":
+                    values = raw.astype("float64")
+                    values[raw == MISSING[column["dtype"]]] = np.nan
+                    data[name] = pd.Series(values).astype(target)
+                else:
+                    data[name] = pd.Series(raw).astype(target)
+        return pd.DataFrame(data)
+    
+    def iter_frames(self,
+                    chunksize:int,
+                    columns:Optional[List[str]]=None,
+                    filters:Optional[List[Tuple[str, object]]]=None,
+                    key_column:Optional[str]=None,
+                    keys=None,
+                    after:Optional[Tuple[str, object]]=None) -> Iterator[pd.DataFrame]:
+        conditions = self._conditions(filters, key_column, keys)
+        for start in range(0, self.rows, chunksize):
+            stop = min(start + chunksize, self.rows)
+            selected = np.flatnonzero(self.mask(start, stop, after=after, conditions=conditions)) + start
+            if len(selected):
+                yield self.frame(selected, columns)
+
+
+def read_columnar(path, chunksize:Optional[int]=None, usecols:Optional[List[str]]=None, **kwargs):
+    """read_columnar
+    pandas reader like access to a columnar copy, the whole frame or
+    an iterator of frames of chunksize rows.
+    """
+    store = columnarStore(path)
+    if chunksize:
+        return store.iter_frames(chunksize, usecols)
+    return store.frame(slice(0, store.rows), usecols)
\ No newline at end of file
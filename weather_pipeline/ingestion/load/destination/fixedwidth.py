@@ -0,0 +1,146 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from .prefilter import iter_lines, open_binary
+
+
+def line_matrix(lines:List[bytes], width:int) -> np.ndarray:
+    """line_matrix
+    (lines, width) uint8 matrix of the lines, cut or padded with zero
+    bytes to width, one copy done by numpy.
+    """
+    if not lines:
+        return np.zeros((0, width), dtype="uint8")
+    return np.array(lines, dtype=f"S{width}").view("uint8").reshape(len(lines), width)
+
+
+def field_bytes(matrix:np.ndarray, start:int, end:int) -> np.ndarray:
+    """field_bytes
+    The [start, end) bytes of every line as one fixed width bytes array
+    with the surrounding whitespace stripped.
+    """
+    field = np.ascontiguousarray(matrix[:, start:end]).view(f"S{end - start}").ravel()
+    return np.char.strip(field)
+
+
+def convert_field(values:np.ndarray, dtype=None, encoding:str="utf-8"):
+    """convert_field
+    Converts stripped field bytes to a column, blank fields are missing.
+    Numbers are parsed by numpy, "category" decodes every distinct value
+    once, anything else is decoded to Python strings.
+    """
+    blank = values == b""
+    if dtype is not None and dtype != "category" and is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+        numbers = np.where(blank, b"nan", values).astype("float64")
+        return pd.Series(numbers).astype(dtype).array
+    if dtype == "category":
+        uniques, codes = np.unique(values, return_inverse=True)
+        categories = [value.decode(encoding) for value in uniques]
+        if len(uniques) and uniques[0] == b"":
+            # the blank value sorts first, make it the missing code
+            categories, codes = categories[1:], codes - 1
+        return pd.Categorical.from_codes(codes, categories=categories)
+    strings = np.char.decode(values, encoding).astype(object)
+    strings[blank] = None
+    return strings
+
+
+def parse_lines(lines:List[bytes],
+                colspecs:List[Tuple[int, int]],
+                names:List[str],
+                usecols:Optional[List[str]]=None,
+                dtype:Optional[Dict[str, object]]=None,
+                encoding:str="utf-8") -> pd.DataFrame:
+    """parse_lines
+    Frame of the usecols columns of fixed width lines, only the requested
+    fields are sliced out of the line matrix and converted.
+    """
+    specs = dict(zip(names, colspecs))
+    columns = [name for name in names if usecols is None or name in usecols]
+    width = max(specs[name][1] for name in columns)
+    matrix = line_matrix(lines, width)
+    return pd.DataFrame({name: convert_field(field_bytes(matrix, *specs[name]), (dtype or {}).get(name),
+                                            encoding) for name in columns}, columns=columns)
+
+
+class fixedWidthReader:
+    """fixedWidthReader
+    
+    Chunked reader of read_fixed_width, iterates frames of chunksize
+    lines like a pandas TextFileReader and get_chunk(size) reads the
+    next size lines.
+    """
+    def __init__(self, source, chunksize:Optional[int]=None, header_lines:int=0, **options) -> None:
+        self.chunksize = chunksize
+        self.options = options
+        self._stream = open_binary(source)
+        self._owned = self._stream is not source
+        self._blocks = iter_lines(self._stream)
+        self._pending = []
+        self._skip = header_lines
+    
+    def _lines(self, size:Optional[int]) -> List[bytes]:
+        while size is None or len(self._pending) < size:
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            if self._skip:
+                skipped = min(self._skip, len(block))
+                block, self._skip = block[skipped:], self._skip - skipped
+            self._pending.extend([line for line in block if line.strip()])
+        if size is None:
+            lines, self._pending = self._pending, []
+        else:
+            lines, self._pending = self._pending[:size], self._pending[size:]
+        return lines
+    
+    def get_chunk(self, size:Optional[int]=None) -> pd.DataFrame:
+        lines = self._lines(size or self.chunksize)
+        if not lines:
+            self.close()
+            raise StopIteration
+        return parse_lines(lines, **self.options)
+    
+    def read(self) -> pd.DataFrame:
+        lines = self._lines(None)
+        self.close()
+        return parse_lines(lines, **self.options)
+    
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        while True:
+            try:
+                yield self.get_chunk()
+            except StopIteration:
+                return
+    
+    def close(self) -> None:
+        if self._owned:
+            self._stream.close()
+
+
+def read_fixed_width(source,
+                    colspecs:List[Tuple[int, int]],
+                    names:List[str],
+                    usecols:Optional[List[str]]=None,
+                    dtype:Optional[Dict[str, object]]=None,
+                    header=None,
+                    encoding:Optional[str]="utf-8",
+                    chunksize:Optional[int]=None,
+                    **kwargs):
+    """read_fixed_width
+    
+    Reader of fixed width files (or streams, .gz decompressed) with
+    explicit byte colspecs [start, end) for every one of names, see
+    layouts for the GHCN files. The lines are laid out as a numpy byte
+    matrix and only the usecols fields are sliced from it and converted
+    to dtype, instead of pandas inferring and parsing every field in
+    Python. header is the number of lines to skip (0 for one header
+    line, as pandas), other pandas reader arguments are ignored.
+    Returns a frame, or with chunksize a fixedWidthReader.
+    """
+    assert len(colspecs) == len(names), "one colspec per name is needed"
+    header_lines = header + 1 if isinstance(header, int) else 0
+    options = dict(colspecs=colspecs, names=names, usecols=usecols, dtype=dtype, encoding=encoding or "utf-8")
+    reader = fixedWidthReader(source, chunksize, header_lines=header_lines, **options)
+    return reader if chunksize else reader.read()
\ No newline at end of file
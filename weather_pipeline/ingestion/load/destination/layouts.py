@@ -0,0 +1,15 @@
+"""Byte column specs [start, end) of the GHCN-Daily fixed width files,
+from the GHCN-Daily readme, for reader_type "fixed_bytes".
+"""
+
+GHCND_STATIONS_NAMES = ["ID", "LATITUDE", "LONGITUDE", "ELEVATION", "STATE", "NAME", 
+                        "GSN FLAG", "HCN/CRN FLAG", "WMO ID"]
+GHCND_STATIONS_COLSPECS = [(0, 11), (12, 20), (21, 30), (31, 37), (38, 40), (41, 71), 
+                        (72, 75), (76, 79), (80, 85)]
+
+# ID, YEAR, MONTH, ELEMENT, then VALUE, MFLAG, QFLAG and SFLAG of every day of the month
+GHCND_DLY_NAMES = ["ID", "YEAR", "MONTH", "ELEMENT"] + \
+                [f"{field}{day}" for day in range(1, 32) for field in ("VALUE", "MFLAG", "QFLAG", "SFLAG")]
+GHCND_DLY_COLSPECS = [(0, 11), (11, 15), (15, 17), (17, 21)] + \
+                [(start + offset, start + offset + width) for start in range(21, 269, 8) \
+                for offset, width in ((0, 5), (5, 1), (6, 1), (7, 1))]
\ No newline at end of file
@@ -0,0 +1,136 @@
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+def exact_medians(groups:np.ndarray, values:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """exact_medians
+    Median of the values of every group code, interpolated like
+    PERCENTILE_CONT(0.5): lo + 0.5 * (hi - lo) in float64.
+    Returns the sorted unique group codes and their medians.
+    """
+    if len(groups) == 0:
+        return np.empty(0, dtype="int64"), np.empty(0, dtype="float64")
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order].astype("float64")
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[starts, len(groups)])
+    lo = values[starts + (counts - 1) // 2]
+    hi = values[starts + counts // 2]
+    return groups[starts], lo + 0.5 * (hi - lo)
+
+
+class medianAccumulator:
+    """medianAccumulator
+    
+    Collects (group code, value) pairs chunk by chunk in growable typed
+    numpy buffers, the exact medians are computed once at the end.
+    
+    Methods:
+    --------
+    add(groups, values):
+        Appends int64 group codes with their values, missing values are
+        dropped like SQL aggregates ignore NULL.
+    medians():
+        Sorted unique group codes with their median.
+    """
+    def __init__(self, capacity:int=1 << 16) -> None:
+        self.groups = np.empty(capacity, dtype="int64")
+        self.values = None
+        self.size = 0
+    
+    def _reserve(self, extra:int, dtype) -> None:
+        if self.values is None:
+            self.values = np.empty(len(self.groups), dtype=dtype)
+        needed = self.size + extra
+        if needed <= len(self.groups):
+            return
+        capacity = max(needed, 2 * len(self.groups))
+        for name in ("groups", "values"):
+            grown = np.empty(capacity, dtype=getattr(self, name).dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+    
+    def add(self, groups:np.ndarray, values:np.ndarray) -> None:
+        values = np.asarray(values)
+        if values.dtype.kind != "f":
+            values = values.astype("float64")
+        keep = ~np.isnan(values)
+        groups, values = np.asarray(groups, dtype="int64")[keep], values[keep]
+        self._reserve(len(values), values.dtype)
+        self.groups[self.size:self.size + len(values)] = groups
+        self.values[self.size:self.size + len(values)] = values
+        self.size += len(values)
+    
+    def medians(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.values is None:
+            return exact_medians(np.empty(0, dtype="int64"), np.empty(0))
+        return exact_medians(self.groups[:self.size], self.values[:self.size])
+
+
+class dailyMedians:
+    """dailyMedians
+    
+    Aggregation stage of the loader, accumulates the value_column of the
+    loaded chunks per day of date_column, overall and per group of the
+    station to group map (e.g. station ID to city name).
+    
+    Methods:
+    --------
+    add(chunk):
+        Accumulates the rows of a filtered chunk.
+    frames():
+        The daily medians ("DATE", median_data) and with a group map the
+        daily medians per group ("DATE", group, median_data).
+    """
+    def __init__(self,
+                date_column:str,
+                value_column:str,
+                key_column:Optional[str]=None,
+                key_groups:Optional[pd.Series]=None) -> None:
+        self.date_column = date_column
+        self.value_column = value_column
+        self.key_column = key_column
+        self.total = medianAccumulator()
+        self.by_group = None
+        if key_groups is not None:
+            key_groups = key_groups[~key_groups.index.duplicated(keep="first")]
+            self.keys = pd.Index(key_groups.index)
+            self.group_names = pd.Index(key_groups.dropna().unique()).sort_values()
+            self.key_codes = self.group_names.get_indexer(key_groups.to_numpy())
+            self.group_column = key_groups.name
+            self.by_group = medianAccumulator()
+    
+    def _group_codes(self, keys:pd.Series) -> np.ndarray:
+        if hasattr(keys, "cat"):
+            positions = self.keys.get_indexer(keys.cat.categories)
+            positions = np.where(keys.cat.codes.to_numpy() >= 0, positions[keys.cat.codes.to_numpy()], -1)
+        else:
+            positions = self.keys.get_indexer(keys.to_numpy())
+        return np.where(positions >= 0, self.key_codes[positions], -1)
+    
+    def add(self, chunk:pd.DataFrame) -> None:
+        days = chunk[self.date_column].to_numpy().astype("datetime64[D]").astype("int64")
+        values = chunk[self.value_column]
+        # nullable integers (e.g. Int16 readings) as floats, NA as NaN
+        values = values.to_numpy(dtype="float64", na_value=np.nan) \
+                    if pd.api.types.is_extension_array_dtype(values) else values.to_numpy()
+        self.total.add(days, values)
+        if self.by_group is None:
+            return
+        codes = self._group_codes(chunk[self.key_column])
+        mapped = codes >= 0
+        self.by_group.add(days[mapped] * len(self.group_names) + codes[mapped], values[mapped])
+    
+    def frames(self) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+        days, medians = self.total.medians()
+        total = pd.DataFrame({self.date_column: days.astype("datetime64[D]").astype("datetime64[ns]"),
+                            "median_data": medians})
+        if self.by_group is None:
+            return total, None
+        groups, medians = self.by_group.medians()
+        days, codes = np.divmod(groups, len(self.group_names))
+        by_group = pd.DataFrame({self.date_column: days.astype("datetime64[D]").astype("datetime64[ns]"),
+                                self.group_column: self.group_names[codes],
+                                "median_data": medians})
+        return total, by_group
\ No newline at end of file
@@ -0,0 +1,95 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+import pandas as pd
+
+GRANULARITIES = ("year", "month")
+
+
+def partition_key(values:pd.Series, granularity:str) -> pd.Series:
+    """partition_key
+    Start of the partition every date value belongs to.
+    """
+    values = pd.to_datetime(values)
+    if granularity == "year":
+        return values.dt.to_period("Y").dt.start_time
+    return values.dt.to_period("M").dt.start_time
+
+
+def partition_bounds(start:pd.Timestamp, granularity:str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """partition_bounds
+    [start, end) range covered by the partition starting at start.
+    """
+    offset = pd.DateOffset(years=1) if granularity == "year" else pd.DateOffset(months=1)
+    return start, start + offset
+
+
+def partition_name(table:str, start:pd.Timestamp, granularity:str) -> str:
+    return f"{table}_y{start:%Y}" if granularity == "year" else f"{table}_m{start:%Y%m}"
+
+
+def is_partitioned(connection, table:str) -> Optional[bool]:
+    """is_partitioned
+    Whether the Postgres table is range partitioned, None when there is
+    no such table.
+    """
+    if not connection.execute(f"""SELECT to_regclass('{table}') IS NOT NULL""").scalar():
+        return None
+    return connection.execute(f"""SELECT EXISTS (SELECT 1 FROM pg_partitioned_table 
+                            WHERE partrelid = '{table}'::regclass)""").scalar()
+
+
+def migrate_to_partitioned(connection, table:str, column:str, granularity:str) -> List[str]:
+    """migrate_to_partitioned
+    Rebuilds the unpartitioned table as range partitioned on column with
+    a partition per granularity of its rows, meant to run inside one
+    transaction. Indexes are not carried over. Returns the partitions.
+    """
+    connection.execute(f"""ALTER TABLE {table} RENAME TO {table}_unpartitioned""")
+    connection.execute(f"""CREATE TABLE {table} (LIKE {table}_unpartitioned) 
+                        PARTITION BY RANGE ("{column}")""")
+    starts = connection.execute(f"""SELECT DISTINCT date_trunc('{granularity}', "{column}") 
+                                FROM {table}_unpartitioned WHERE "{column}" IS NOT NULL""").fetchall()
+    names = []
+    for (start,) in sorted(starts):
+        start = pd.Timestamp(start)
+        name = partition_name(table, start, granularity)
+        create_partition(connection, table, name, *partition_bounds(start, granularity))
+        names.append(name)
+    connection.execute(f"""INSERT INTO {table} SELECT * FROM {table}_unpartitioned""")
+    connection.execute(f"""DROP TABLE {table}_unpartitioned""")
+    return names
+
+
+def create_partition(connection, table:str, name:str, start:pd.Timestamp, end:pd.Timestamp) -> None:
+    connection.execute(f"""CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+                        FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')""")
+
+
+def swap_partition(connection, table:str, name:str, staging:str,
+                start:pd.Timestamp, end:pd.Timestamp) -> None:
+    """swap_partition
+    Replaces partition name of table with the standalone staging table,
+    meant to run inside one transaction.
+    """
+    exists = connection.execute(f"""SELECT to_regclass('{name}') IS NOT NULL""").scalar()
+    if exists:
+        connection.execute(f"""ALTER TABLE {table} DETACH PARTITION {name}""")
+        connection.execute(f"""DROP TABLE {name}""")
+    connection.execute(f"""ALTER TABLE {staging} RENAME TO {name}""")
+    connection.execute(f"""ALTER TABLE {table} ATTACH PARTITION {name}
+                        FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')""")
+
+
+def index_name(table:str, columns:Sequence[str]) -> str:
+    return re.sub(r"[^0-9a-zA-Z_]", "_", f"{table}_{'_'.join(columns)}_idx").lower()
+
+
+def create_indexes(connection, table:str, indexes:List[Sequence[str]]) -> None:
+    """create_indexes
+    Builds the indexes once the bulk load is done, on a partitioned
+    Postgres table they cascade to every partition.
+    """
+    for columns in indexes:
+        column_list = ", ".join([f'"{column}"' for column in columns])
+        connection.execute(f"""CREATE INDEX IF NOT EXISTS {index_name(table, columns)}
+                            ON {table} ({column_list})""")
\ No newline at end of file
@@ -0,0 +1,157 @@
+import io
+import gzip
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+BLOCK_SIZE = 16 * 1024 * 1024
+
+
+class iterStream(io.RawIOBase):
+    """iterStream
+
+    Read-only binary file object over an iterator of byte blocks, so
+    the filtered output can be handed to the pandas readers as a buffer.
+    """
+    def __init__(self, blocks:Iterable[bytes]) -> None:
+        self._blocks = iter(blocks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._blocks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def open_binary(source) -> io.IOBase:
+    """open_binary
+
+    Opens a path (decompressing .gz) or passes through an already open
+    binary stream.
+    """
+    if hasattr(source, "read"):
+        return source
+    if Path(source).suffix == ".gz":
+        return gzip.open(source, "rb")
+    return open(source, "rb")
+
+
+def iter_lines(stream, block_size:int=BLOCK_SIZE) -> Iterator[List[bytes]]:
+    """iter_lines
+
+    Reads the stream in large blocks and yields the complete lines of
+    each block, carrying the partial last line over to the next block.
+    """
+    tail = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        block = tail + block
+        end = block.rfind(b"\n")
+        if end == -1:
+            tail = block
+            continue
+        tail = block[end + 1:]
+        yield block[:end].split(b"\n")
+    if tail:
+        yield [tail]
+
+
+def line_predicate(names:List[str],
+                filters:Optional[List[Tuple[str, object]]]=None,
+                key_column:Optional[str]=None,
+                keys:Optional[Iterable[object]]=None,
+                delimiter:bytes=b",",
+                encoding:str="utf-8",
+                greater:Optional[List[Tuple[str, object]]]=None) -> Callable[[bytes], bool]:
+    """line_predicate
+
+    Builds a predicate over raw delimited lines that keeps only lines 
+    whose fields equal the filter values and whose key_column is in keys.
+    A cheap substring check rejects most lines before a split. A line
+    with a quote is kept, its fields only compare once parsed and the 
+    parsed chunk is filtered again (filter_chunk).
+    greater keeps only lines whose field sorts after the value, meant for
+    fixed width, zero padded fields such as YYYYMMDD dates.
+    """
+    equals = [(names.index(key), str(value).encode(encoding)) for key, value in (filters or [])]
+    greater = [(names.index(key), str(value).encode(encoding)) for key, value in (greater or [])]
+    key_set = None
+    if key_column is not None and keys is not None:
+        key_set = frozenset(str(key).encode(encoding) for key in keys)
+
+    key_index = names.index(key_column) if key_set is not None else None
+    indices = [index for index, _ in equals + greater]
+    if key_index is not None:
+        indices.append(key_index)
+    max_split = max(indices) + 1 if indices else 0
+    needles = [value + delimiter if index == 0 else delimiter + value
+                for index, value in equals]
+    quote = '"'.encode(encoding)
+
+    def keep(line:bytes) -> bool:
+        for needle in needles:
+            if needle not in line:
+                return quote in line
+        fields = line.split(delimiter, max_split)
+        if len(fields) < max_split:
+            return quote in line
+        for index, value in equals:
+            if fields[index] != value:
+                return quote in line
+        for index, value in greater:
+            if fields[index] <= value:
+                return quote in line
+        if key_index is not None and fields[key_index] not in key_set:
+            return quote in line
+        return True
+
+    return keep
+
+
+def filtered_stream(source,
+                    names:List[str],
+                    filters:Optional[List[Tuple[str, object]]]=None,
+                    key_column:Optional[str]=None,
+                    keys:Optional[Iterable[object]]=None,
+                    has_header:bool=False,
+                    delimiter:str=",",
+                    encoding:str="utf-8",
+                    block_size:int=BLOCK_SIZE,
+                    greater:Optional[List[Tuple[str, object]]]=None) -> io.BufferedReader:
+    """filtered_stream
+
+    Predicate pushdown ahead of the pandas parser: scans the decompressed
+    byte stream of source block wise and returns a buffer holding only
+    the matching lines (and the header line when has_header), so parsing
+    cost scales with the kept rows instead of the file.
+    """
+    keep = line_predicate(names, filters, key_column, keys, delimiter.encode(encoding), 
+                        encoding, greater)
+
+    def blocks() -> Iterator[bytes]:
+        stream = open_binary(source)
+        try:
+            first = has_header
+            for lines in iter_lines(stream, block_size):
+                if first:
+                    yield lines[0] + b"\n"
+                    lines = lines[1:]
+                    first = False
+                kept = [line for line in lines if keep(line)]
+                if kept:
+                    yield b"\n".join(kept) + b"\n"
+        finally:
+            if stream is not source:
+                stream.close()
+
+    return io.BufferedReader(iterStream(blocks()), buffer_size=block_size)
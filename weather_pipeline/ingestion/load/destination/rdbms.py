@@ -1,9 +1,27 @@
+import os
+import re
+import time
+from pathlib import Path
 from logging import exception
 from typing import List, Optional, Tuple
 import pandas as pd
 from pandas.io.parsers import read_fwf
 from .base import BaseDestination
-from sqlalchemy import create_engine, exc
+from .writers import WRITE_METHODS
+from .prefilter import filtered_stream, open_binary
+from .schema import date_formats, reader_kwargs, sql_types, used_columns
+from .watermark import get_watermark, set_watermark
+from .medians import dailyMedians
+from .columnar import HEADER, build_columnar, columnar_path, columnarStore, is_fresh, read_columnar
+from .partitions import GRANULARITIES, create_indexes, create_partition, is_partitioned, \
+                migrate_to_partitioned, partition_bounds, partition_key, partition_name, swap_partition
+from .chunks import BLOCK_SIZE, filter_chunk, parallel_chunks
+from .sizing import chunkSizer
+from .fixedwidth import read_fixed_width
+from weather_pipeline.utils.engines import get_engine
+from weather_pipeline.utils.metrics import traced
+from weather_pipeline.utils.touched import ensure_touched_table, record_touched, record_touched_from
+from sqlalchemy import bindparam, exc, inspect, text
 
 
 class rdbmsLoader(BaseDestination):
@@ -18,26 +36,58 @@ class rdbmsLoader(BaseDestination):
                 col_required= None, **kwargs)
             Method to load data to a database as a whole.
             Params:
-                1. names_types: A list of name of columes with its type.
+                1. names_types: A list of name of columes with its type, 
+                        optionally a pandas dtype or date format as third item.
                 2. filters: filters to apply over the read data
                 3. col_required: list of only columns to be including while
                             sending data to rdbms.
                 4. kwargs: passed to the underlying pandas engine.
+    
+    file may be a local path or an open binary stream (e.g. webSource.stream()),
+    a stream is consumed once while it downloads.
+    
+    Params:
+    -------
+        reader_type: "csv", "fixed_width", "fixed_bytes" or "columnar".
+            fixed_bytes parses fixed width lines with explicit colspecs
+            as a numpy byte matrix, only converting the usecols fields.
+            columnar reads a memory-mapped columnar copy of the delimited
+            file, written on first use next to it (file.cols/), filters
+            and the join key set are evaluated on the raw column arrays.
+        storage: for columnar, integer dtypes to store numeric columns in,
+            e.g. {"DATA": "int16"}.
+        write_method: How rows are pushed to the database, one of
+            "to_sql" (default, pandas inserts), "multi" (multi-row INSERT),
+            "executemany" (batched DBAPI executemany) or "copy"
+            (COPY ... FROM STDIN, falls back to executemany without COPY).
+    
+    Every load emits one metrics record: spans parse (waiting for the
+    parsed chunks), filter, write, join, medians, publish, index and stage
+    (columnar copy), counters bytes, rows_in (parsed), rows_out (after
+    filters and join), rows_written, chunks and failed_chunks.
     """
-    def __init__(self, **kwargs) -> None:
-        super().__init__(_name=__name__)
+    def __init__(self, _name:str=__name__, **kwargs) -> None:
+        super().__init__(_name=_name)
         self.connection = kwargs.get("connection_string")
         self.filename = kwargs.get("file")
         self.reader = kwargs.get("reader_type", "csv")
+        self.reader_type = self.reader
         self.table_name = kwargs.get("table_name")
         self.schema = kwargs.get("schema", None)
-        self.engine = create_engine(self.connection)
+        self.write_method = kwargs.get("write_method", "to_sql")
+        self.storage = kwargs.get("storage", None)
+        self.engine = get_engine(self.connection)
+        self.metrics.labels.update(target=self.table_name, reader=self.reader_type)
         
         if self.reader:
             if self.reader == "csv":
                 self.reader = pd.read_csv
             elif self.reader == "fixed_width":
                 self.reader = pd.read_fwf
+            elif self.reader == "fixed_bytes":
+                self.reader = read_fixed_width
+            elif self.reader == "columnar":
+                self.reader = read_columnar
             else:
                 raise NotImplementedError
         self.__validator()
@@ -50,15 +100,224 @@ class rdbmsLoader(BaseDestination):
         self.connection is not None, "No rdbms credential given"
         self.filename is not None, "local filename not given to load data from"
         self.table_name is not None, "Table name not given to be created on rdbms"
+        assert self.write_method in WRITE_METHODS, \
+            f"Unknown write method {self.write_method}, use one of {list(WRITE_METHODS)}"
+    
+    def _write(self, df:pd.DataFrame, table_name:str, if_exists:str="append", con=None) -> None:
+        """_write
+        Single point of writing a frame to the database with the
+        configured write method, logs the achieved rows per second.
+        """
+        start = time.perf_counter()
+        df.to_sql(table_name, 
+                con=con if con is not None else self.engine, 
+                schema=self.schema, 
+                if_exists=if_exists, 
+                index=False,
+                method=WRITE_METHODS[self.write_method])
+        elapsed = time.perf_counter() - start
+        self.metrics.add_time("write", elapsed)
+        self.metrics.count("rows_written", len(df))
+        rate = len(df) / elapsed if elapsed > 0 else float("inf")
+        self.logger.info(f"Wrote {len(df)} rows to {table_name} in {elapsed:.2f}s"\
+                        f" ({rate:.0f} rows/s, {self.write_method})")
+    
+    def _load_join_keys(self, join_with:str, join_key:str) -> pd.Index:
+        """_load_join_keys
+        Fetches the distinct join_key values of join_with once, to be 
+        used as an in-memory hash set for semi-joining chunks.
+        """
+        keys = pd.read_sql(f'SELECT DISTINCT "{join_key}" FROM {join_with}', con=self.engine)
+        keys = pd.Index(keys[join_key].dropna().unique())
+        self.logger.info(f"Loaded {len(keys)} {join_key} keys from {join_with} for in-memory join")
+        return keys
+    
+    def _apply_schema(self, 
+                    names_types:Optional[List[Tuple]], 
+                    kwargs:dict, 
+                    *required:Optional[List[str]]) -> None:
+        """_apply_schema
+        Turns the typed schema into reader names, usecols and dtype, 
+        only the columns needed by required are materialized. dtype
+        given by the caller takes precedence.
+        """
+        if not names_types:
+            return
+        schema_kwargs = reader_kwargs(names_types, used_columns(names_types, *required))
+        schema_kwargs["dtype"].update(kwargs.get("dtype") or {})
+        kwargs.update(schema_kwargs)
+    
+    def _prefilter_spec(self, 
+                        filters: Optional[List[Tuple[str, object]]]= None, 
+                        key_column:Optional[str]=None, 
+                        keys:Optional[pd.Index]=None, 
+                        kwargs:Optional[dict]=None, 
+                        greater:Optional[List[Tuple[str, object]]]=None) -> Tuple[dict, bool]:
+        """_prefilter_spec
+        Arguments of the raw line predicate for the equality filters, 
+        the key set and the raw lower bounds, and whether the file starts
+        with a header line.
+        """
+        delimiter = kwargs.get("delimiter", kwargs.get("sep", ","))
+        encoding = kwargs.get("encoding", None) or "utf-8"
+        names = kwargs.get("names")
+        header = kwargs.get("header", "infer")
+        has_header = header is not None and not (header == "infer" and names)
+        if not names and hasattr(self.filename, "read"):
+            # a stream can not be rewound, consume its header line here
+            names = self.filename.readline().decode(encoding).rstrip("\r\n").split(delimiter)
+            has_header = False
+        elif not names:
+            with open_binary(self.filename) as stream:
+                names = stream.readline().decode(encoding).rstrip("\r\n").split(delimiter)
+        
+        spec = dict(names=list(names), filters=filters, key_column=key_column, 
+                    keys=keys, delimiter=delimiter.encode(encoding), encoding=encoding, 
+                    greater=greater)
+        return spec, has_header
+    
+    def _source(self, 
+                prefilter:bool=False, 
+                filters: Optional[List[Tuple[str, object]]]= None, 
+                key_column:Optional[str]=None, 
+                keys:Optional[pd.Index]=None, 
+                kwargs:Optional[dict]=None, 
+                greater:Optional[List[Tuple[str, object]]]=None):
+        """_source
+        Returns what the reader should parse, the file itself or with
+        prefilter a byte stream of only the lines matching the equality
+        filters and the key set, scanned before pandas sees them.
+        """
+        if not prefilter:
+            return self.filename
+        
+        assert self.reader_type == "csv", "prefilter is only supported for delimited files"
+        spec, has_header = self._prefilter_spec(filters, key_column, keys, kwargs, greater)
+        self.logger.info(f"Prefiltering {self.filename} on {filters} {greater or ''}"\
+                        f" and {len(keys) if keys is not None else 'no'} {key_column} keys")
+        # the stream is already decompressed
+        kwargs["compression"] = None
+        return filtered_stream(self.filename, spec["names"], filters=filters, 
+                            key_column=key_column, keys=keys, 
+                            has_header=has_header, delimiter=spec["delimiter"].decode(spec["encoding"]), 
+                            encoding=spec["encoding"], greater=greater)
+    
+    def _chunks(self, 
+                chunksize:int, 
+                names_types:Optional[List[Tuple]] = None, 
+                filters: Optional[List[Tuple[str, object]]] = None, 
+                col_required:Optional[List[str]] = None, 
+                join_key:Optional[str]=None, 
+                join_keys:Optional[pd.Index]=None, 
+                prefilter:bool=False, 
+                workers:Optional[int]=None, 
+                max_in_flight:Optional[int]=None, 
+                kwargs:Optional[dict]=None, 
+                after:Optional[Tuple[str, object]]=None, 
+                memory_budget:Optional[int]=None):
+        """_chunks
+        Iterator of parsed and filtered chunks. With more than one worker,
+        line aligned blocks of the file are parsed and filtered in a process
+        pool with at most max_in_flight blocks queued, chunks still come out
+        in file order so the result equals the serial path.
+        
+        after = (column, value) keeps only the rows past value, pushed down
+        to the raw lines when the column is a date with a format.
+        
+        memory_budget (bytes) sizes the chunks with a chunkSizer starting
+        from chunksize rows, or the blocks of the workers. The columnar
+        reader scans memory-mapped arrays and keeps chunksize.
+        """
+        chunk_kwargs = dict(names_types=names_types, filters=filters, 
+                            col_required=col_required, join_key=join_key, 
+                            join_keys=join_keys, after=after)
+        greater = None
+        if after is not None:
+            date_format = date_formats(names_types or []).get(after[0])
+            if date_format:
+                greater = [(after[0], pd.Timestamp(after[1]).strftime(date_format))]
+        if filters:
+            self.logger.info(f"Filtering on {filters}")
+        if col_required:
+            self.logger.info(f"Only loading {col_required}")
+        if not hasattr(self.filename, "read") and os.path.isfile(self.filename):
+            self.metrics.count("bytes", os.path.getsize(self.filename))
+        
+        if self.reader_type == "columnar":
+            with self.metrics.span("stage"):
+                store = self._columnar_store(names_types, kwargs)
+            self.logger.info(f"Scanning {store.rows} rows of {store.path}")
+            self.metrics.count("rows_in", store.rows)
+            frames = store.iter_frames(chunksize, kwargs.get("usecols"), filters, 
+                                    join_key, join_keys, after)
+            return (frame[col_required] if col_required else frame \
+                    for frame in self.metrics.timed(frames, "parse"))
+        
+        if workers and workers > 1:
+            assert self.reader_type == "csv" or "colspecs" in kwargs or "widths" in kwargs, \
+                "parallel fixed width parsing needs explicit colspecs or widths"
+            spec, has_header = self._prefilter_spec(filters, join_key, join_keys, kwargs, greater)
+            kwargs["names"] = spec["names"]
+            self.logger.info(f"Parsing {self.filename} with {workers} workers")
+            if chunksize:
+                # the workers parse whole blocks, their chunks are the blocks
+                self.logger.info(f"chunksize {chunksize} is ignored with {workers} workers,"\
+                                f" chunks are blocks of the file")
+            max_in_flight = max_in_flight or 2 * workers
+            block_size = chunkSizer(memory_budget, logger=self.logger).block_size(workers, max_in_flight) \
+                        if memory_budget else BLOCK_SIZE
+            chunks = parallel_chunks(self.filename, self.reader_type, kwargs, 
+                                    workers=workers, 
+                                    max_in_flight=max_in_flight, 
+                                    block_size=block_size, 
+                                    skip_header=has_header, 
+                                    prefilter=spec if prefilter else None, 
+                                    metrics=self.metrics, 
+                                    **chunk_kwargs)
+            # parsing and filtering run in the workers, parse is the wait for them
+            return self.metrics.timed(chunks, "parse")
+        
+        source = self._source(prefilter, filters, join_key, join_keys, kwargs, greater)
+        if memory_budget:
+            sizer = chunkSizer(memory_budget, initial_rows=chunksize, logger=self.logger)
+            chunks = sizer.chunks(self.reader(source, chunksize=sizer.rows, **kwargs))
+        else:
+            chunks = self.reader(source, chunksize=chunksize, **kwargs)
+        return (self._filter_chunk(chunk, chunk_kwargs) for chunk in self.metrics.timed(chunks, "parse"))
+    
+    def _filter_chunk(self, chunk:pd.DataFrame, chunk_kwargs:dict) -> pd.DataFrame:
+        self.metrics.count("rows_in", len(chunk))
+        with self.metrics.span("filter"):
+            return filter_chunk(chunk, **chunk_kwargs)
+    
+    def _columnar_store(self, names_types:Optional[List[Tuple]], kwargs:dict) -> columnarStore:
+        """_columnar_store
+        Opens the columnar copy of the file, parsing the file once into it
+        when there is none or the file changed since.
+        """
+        assert not hasattr(self.filename, "read"), "columnar staging needs a file, not a stream"
+        if (Path(self.filename) / HEADER).exists():
+            return columnarStore(self.filename)
+        path = columnar_path(self.filename)
+        if not is_fresh(self.filename, path):
+            assert names_types, "names_types is needed to write the columnar copy"
+            self.logger.info(f"Writing columnar copy of {self.filename} to {path}")
+            csv_kwargs = {key: value for key, value in kwargs.items() \
+                        if key not in ("names", "usecols", "dtype")}
+            build_columnar(self.filename, names_types, path, storage=self.storage, **csv_kwargs)
+        return columnarStore(path)
     
+    @traced
     def load_data(self, 
-                names_types: Optional[List[Tuple[str, str]]]= None, 
+                names_types: Optional[List[Tuple]]= None, 
                 filters: Optional[List[Tuple[str, object]]]= None, 
                 col_required:Optional[List[str]] = None,
                 **kwargs) -> None:
         
         self.logger.info("Loading data as a whole.")
-        df = self.reader(self.filename, **kwargs)
+        with self.metrics.span("parse"):
+            df = self.reader(self.filename, **kwargs)
+        self.metrics.count("rows_in", len(df))
         
         if filters:
             for key, value in filters:
@@ -67,112 +326,487 @@ class rdbmsLoader(BaseDestination):
                 df = df[df[key] == value]
                 if col_required:
                     df = df[col_required]
+        self.metrics.count("rows_out", len(df))
         try:
-            df.to_sql(self.table_name, 
-                    con=self.engine, 
-                    schema=self.schema, 
-                    if_exists='replace',
-                    index=False)
+            self._write(df, self.table_name, if_exists='replace')
         except Exception as e:
             self.logger.error("Failed to load data to db, retry", exc_info=True)
     
+    @traced
     def load_data_as_chunk(self, 
                         chunksize:int, 
-                        names_types:Optional[List[Tuple[str, str]]] = None, 
+                        names_types:Optional[List[Tuple]] = None, 
                         filters: Optional[List[Tuple[str, object]]] = None, 
                         col_required:Optional[List[str]] = None,
+                        prefilter:bool = False,
+                        workers:Optional[int] = None,
+                        max_in_flight:Optional[int] = None,
+                        memory_budget:Optional[int] = None,
                         **kwargs) -> None:
-        
-        self.logger.info(f"Loading data as a chunk:: size {chunksize}")
-        if names_types:
-            names = [name[0] for name in names_types]
-            kwargs["names"] = names
-        chunks = self.reader(self.filename, chunksize=chunksize, **kwargs)
+        """load_data_as_chunk
+        Appends the file to the table chunk by chunk. memory_budget (bytes)
+        adapts the chunk size, starting from chunksize rows, to the fastest
+        one that keeps a chunk within the budget.
+        """
+        self.logger.info(f"Loading data as a chunk:: size {chunksize}"\
+                        f"{f', adaptive within {memory_budget} bytes' if memory_budget else ''}")
+        filter_keys = [key for key, _ in filters or []]
+        self._apply_schema(names_types, kwargs, col_required, filter_keys)
+        chunks = self._chunks(chunksize, names_types, filters, col_required, 
+                            prefilter=prefilter, workers=workers, 
+                            max_in_flight=max_in_flight, kwargs=kwargs, 
+                            memory_budget=memory_budget)
         for chunk in chunks:
+            self.metrics.count("chunks")
+            self.metrics.count("rows_out", len(chunk))
             try:
                 self.logger.info("Loading chunk...")
-                if filters:
-                    for key, value in filters:
-                        self.logger.info(f"Filtering {key} for {value}")
-                        chunk = chunk[chunk[key] == value]
-                
-                if col_required:
-                    self.logger.info(f"Only loading {col_required}")
-                    chunk = chunk[col_required]
-                
-                chunk.to_sql(self.table_name, 
-                            con=self.engine, 
-                            schema=self.schema, 
-                            if_exists='append', 
-                            index=False)
+                self._write(chunk, self.table_name)
             except Exception as e:
+                self.metrics.count("failed_chunks")
                 self.logger.error(f"Falied to upload chunk data to sql, skipping to next chunk",
                                 exc_info=True)
     
+    @traced
     def load_and_merge_on(self, 
                         chunksize:int, 
-                        names_types:Optional[List[Tuple[str, str]]] = None, 
+                        names_types:Optional[List[Tuple]] = None, 
                         filters: Optional[List[Tuple[str, object]]] = None, 
                         col_required:Optional[List[str]] = None, 
                         join_with:Optional[str]=None, 
                         join_key:Optional[str]=None,
                         chunk_suffix:Optional[str]=None,
+                        join_mode:str="sql",
+                        prefilter:bool=False,
+                        workers:Optional[int]=None,
+                        max_in_flight:Optional[int]=None,
+                        watermark_key:Optional[str]=None,
+                        watermark_column:str="DATE",
+                        late_window_days:int=0,
+                        partition_by:Optional[Tuple[str, str]]=None,
+                        replace_partitions:bool=False,
+                        migrate_partitions:bool=False,
+                        stage_only:bool=False,
+                        indexes:Optional[List[Tuple[str, ...]]]=None,
+                        track_dates:Optional[str]=None,
+                        median_of:Optional[str]=None,
+                        median_by:str="DATE",
+                        median_groups:Optional[Tuple[str, str]]=None,
+                        median_tables:Tuple[str, str]=("germany_medians", "city_daily_medians"),
+                        memory_budget:Optional[int]=None,
                         **kwargs) -> None:
         """load_and_merge_on
         To use for merging multiple chunks of data over a 
         single table by using SQL join funtion.
+        
+        join_mode "sql" stages every chunk in its own table and joins it 
+        against join_with in the database. join_mode "memory" loads the 
+        join_key values of join_with once and semi-joins every chunk in
+        memory, only the matching rows are sent to the database. Keep "sql"
+        for key sets too large to hold in memory.
+        
+        prefilter scans the raw lines for the equality filters (and the
+        in-memory join keys) before parsing, so pandas only parses the
+        lines that are kept.
+        
+        workers > 1 parses and filters the file in a process pool, with 
+        at most max_in_flight blocks queued ahead of the database writer.
+        chunksize does not apply then, every parsed block is a chunk.
+        
+        memory_budget (bytes) replaces the fixed chunksize (then the size
+        of the first chunk) by chunks sized to the fastest rows/s that
+        stays within the budget, measured on the first chunks, see
+        chunkSizer. With workers it sizes the blocks of the pool.
+        
+        watermark_key makes the load incremental: only rows with 
+        watermark_column past the recorded high-water mark of the key, 
+        minus late_window_days, are parsed and loaded. They are staged and
+        replace the same range of the table in one transaction that also
+        moves the mark, so re-running a load is idempotent. A failing
+        chunk fails the load, the mark is left where it was.
+        
+        partition_by = (column, "year" | "month") creates the table range
+        partitioned on column (Postgres), partitions are created on demand
+        for the rows of every chunk. replace_partitions loads every touched
+        partition into a standalone table and swaps it in at the end, so a
+        whole year is reloaded without delete-and-append, a failing chunk
+        fails the load instead of swapping in an incomplete partition. An
+        existing unpartitioned table fails the load, unless
+        migrate_partitions rebuilds it partitioned first. indexes are built
+        once after the load, e.g. [("ID", "DATE")].
+        
+        stage_only writes the rows of every partition to its standalone
+        {partition}_load table like replace_partitions but leaves the table
+        itself alone (on any database), for loads of disjoint partitions to
+        run in parallel and be published together by publish_partitions.
+        A failing chunk fails the load instead of being skipped.
+        
+        track_dates records the distinct values of that date column that
+        were inserted, replaced or deleted by this load in the touched
+        dates table, for aggregates to be refreshed only on those dates.
+        
+        median_of aggregates that column of the loaded rows per day of
+        median_by while the chunks stream by, median_groups = (table, column)
+        maps join_key to a group (e.g. ("city_stations", "name")). The exact
+        medians replace the loaded days in median_tables (overall, per group)
+        at the end, without another pass over the table.
         """
-        if col_required:
-            col_names = " ,".join([f'"{name[0]}"' for name in names_types \
-                            if name[0] in col_required])
-            type_string = [f'"{name}" {value}' for name, value in names_types \
-                if name in col_required]
-        else:
-            col_names = " ,".join([f'"{name[0]}"' for name in names_types])
-            type_string = [f'"{name}" {value}' for name, value in names_types]
+        assert join_mode in ("sql", "memory"), f"Unknown join mode {join_mode}"
+        assert not replace_partitions or (join_mode == "memory" and not watermark_key), \
+            "replace_partitions needs join_mode memory and no watermark"
+        assert not stage_only or (partition_by and join_mode == "memory" and not watermark_key \
+                                and not median_of), \
+            "stage_only needs partition_by, join_mode memory, no watermark and no medians"
+        partitioned = self._partitioned(partition_by, stage_only, migrate_partitions)
+        col_names = " ,".join([f'"{name[0]}"' for name in names_types \
+                        if not col_required or name[0] in col_required])
+        type_string = sql_types(names_types, col_required)
         
+        filter_keys = [key for key, _ in filters or []]
+        self._apply_schema(names_types, kwargs, col_required, filter_keys, [join_key])
         
-        if names_types:
-            names = [name[0] for name in names_types]
-            kwargs["names"] = names
+        join_keys = self._load_join_keys(join_with, join_key) if join_mode == "memory" else None
         
-        type_string = ", ".join(type_string)
+        target, after = self.table_name, None
+        if watermark_key:
+            mark = get_watermark(self.engine, watermark_key)
+            cutoff = mark - pd.Timedelta(days=late_window_days) if mark is not None else None
+            after = (watermark_column, cutoff) if cutoff is not None else None
+            self.logger.info(f"Incremental load of {watermark_key} after {cutoff}")
+            target = f"{self.table_name}_incr" if not chunk_suffix else \
+                        f"{self.table_name}_incr_{chunk_suffix}"
+            self.engine.execute(f"""DROP TABLE IF EXISTS {target}""")
+            self.engine.execute(f"""CREATE TABLE {target} ({type_string})""")
         
-        chunks = self.reader(self.filename, chunksize=chunksize, **kwargs)
-        self.engine.execute(f"""CREATE TABLE IF NOT EXISTS {self.table_name} ({type_string})""")
+        chunks = self._chunks(chunksize, names_types, filters, col_required, 
+                            join_key, join_keys, prefilter=prefilter, 
+                            workers=workers, max_in_flight=max_in_flight, 
+                            kwargs=kwargs, after=after, memory_budget=memory_budget)
+        partition_clause = f' PARTITION BY RANGE ("{partition_by[0]}")' if partitioned else ""
+        if not stage_only:
+            self.engine.execute(f"""CREATE TABLE IF NOT EXISTS {self.table_name} ({type_string}){partition_clause}""")
+        track_dates = None if stage_only else track_dates
+        touched = set()
+        if track_dates:
+            ensure_touched_table(self.engine)
+        medians = self._median_stage(median_of, median_by, median_groups, join_with, join_key, join_keys)
         
         for chunk_no, chunk in enumerate(chunks):
+            self.metrics.count("chunks")
+            self.metrics.count("rows_out", len(chunk))
             try:
                 self.logger.info("Loading chunk...")
-                if filters:
-                    for key, value in filters:
-                        self.logger.info(f"Filtering {key} for {value}")
-                        chunk = chunk[chunk[key] == value]
-                
-                if col_required:
-                    self.logger.info(f"Only loading {col_required}")
-                    chunk = chunk[col_required]
-                
-                chunk_table = f"{self.table_name}_{chunk_no}" if not chunk_suffix else \
-                                f"{self.table_name}_{chunk_no}_{chunk_suffix}"
-                
-                chunk.to_sql(chunk_table, 
-                            con=self.engine, 
-                            schema=self.schema, 
-                            if_exists='append', 
-                            index=False)
-                
-                chunk_col_names = " ,".join([f'{chunk_table}."{name[0]}"' for name in names_types \
-                                        if name[0] in col_required])
-                self.logger.info("Inserting chunk into table.")
-                self.engine.execute(f"""
-                                    INSERT INTO {self.table_name} ({col_names})
-                                    SELECT {chunk_col_names} FROM {chunk_table}
-                                    JOIN {join_with} 
-                                    ON {chunk_table}."{join_key}" = city_stations."{join_key}"
-                                    """)
-                
-                self.engine.execute(f"""DROP TABLE IF EXISTS {chunk_table}""")
+                if stage_only or (partitioned and replace_partitions):
+                    self._write_partition_staging(chunk, partition_by, type_string, 
+                                                suffix="_staging" if stage_only else "_swap")
+                elif join_keys is not None:
+                    if partitioned:
+                        self._ensure_partitions(chunk[partition_by[0]], partition_by)
+                    self.logger.info(f"Inserting {len(chunk)} rows matching {join_with}.")
+                    self._write(chunk, target)
+                else:
+                    if partitioned:
+                        self._ensure_partitions(chunk[partition_by[0]], partition_by)
+                    chunk_table = f"{self.table_name}_{chunk_no}" if not chunk_suffix else \
+                                    f"{self.table_name}_{chunk_no}_{chunk_suffix}"
+                    
+                    self._write(chunk, chunk_table)
+                    
+                    chunk_col_names = " ,".join([f'{chunk_table}."{name[0]}"' for name in names_types \
+                                            if name[0] in col_required])
+                    self.logger.info("Inserting chunk into table.")
+                    with self.metrics.span("join"):
+                        self.engine.execute(f"""
+                                            INSERT INTO {target} ({col_names})
+                                            SELECT {chunk_col_names} FROM {chunk_table}
+                                            JOIN {join_with} 
+                                            ON {chunk_table}."{join_key}" = {join_with}."{join_key}"
+                                            """)
+                        
+                        self.engine.execute(f"""DROP TABLE IF EXISTS {chunk_table}""")
             except Exception as e:
+                self.metrics.count("failed_chunks")
+                # a skipped chunk would be lost for good once the watermark moves past it,
+                # or once its partition is swapped in
+                if stage_only or watermark_key or replace_partitions:
+                    raise
                 self.logger.error(f"Falied to upload chunk data to sql, skipping to next chunk",
-                                exc_info=True)
\ No newline at end of file
+                                exc_info=True)
+                continue
+            # only the chunks that were written count as touched and in the medians
+            if track_dates:
+                touched.update(chunk[track_dates].dropna().unique())
+            if medians is not None:
+                with self.metrics.span("medians"):
+                    medians.add(chunk if self._median_keys is None else \
+                                chunk[chunk[join_key].isin(self._median_keys)])
+        
+        if stage_only:
+            self._complete_staging()
+            return
+        
+        with self.metrics.span("publish"):
+            if watermark_key:
+                self._publish_increment(target, col_names, watermark_key, watermark_column, after, 
+                                        track_dates, touched)
+            elif partitioned and replace_partitions:
+                self._swap_partitions(track_dates, touched)
+            elif track_dates:
+                with self.engine.begin() as connection:
+                    record_touched(connection, self.table_name, touched)
+        if track_dates:
+            self.logger.info(f"Recorded {len(touched)} touched {track_dates} values of {self.table_name}")
+        if medians is not None:
+            self._write_medians(medians, median_tables)
+        if indexes:
+            self.logger.info(f"Building indexes {indexes} on {self.table_name}")
+            with self.metrics.span("index"), self.engine.begin() as connection:
+                create_indexes(connection, self.table_name, indexes)
+    
+    def _median_stage(self, 
+                    median_of:Optional[str], 
+                    median_by:str, 
+                    median_groups:Optional[Tuple[str, str]], 
+                    join_with:Optional[str], 
+                    join_key:Optional[str], 
+                    join_keys:Optional[pd.Index]) -> Optional[dailyMedians]:
+        """_median_stage
+        Builds the in-process median aggregation, chunks joined in the
+        database are semi-joined on the keys of join_with first.
+        """
+        self._median_keys = None
+        if not median_of:
+            return None
+        if join_keys is None and join_with:
+            self._median_keys = self._load_join_keys(join_with, join_key)
+        key_groups = None
+        if median_groups:
+            group_table, group_column = median_groups
+            key_groups = pd.read_sql(f'SELECT "{join_key}", "{group_column}" FROM {group_table}', 
+                                    con=self.engine).set_index(join_key)[group_column]
+        self.logger.info(f"Aggregating {median_of} medians per {median_by}"\
+                        f"{' and ' + median_groups[1] if median_groups else ''} while loading")
+        return dailyMedians(median_by, median_of, join_key, key_groups)
+    
+    def _write_medians(self, medians:dailyMedians, median_tables:Tuple[str, str]) -> None:
+        """_write_medians
+        Replaces the aggregated days in the median tables, in one transaction.
+        """
+        with self.metrics.span("medians"):
+            frames = [frame for frame in zip(median_tables, medians.frames()) if frame[1] is not None]
+        with self.metrics.span("publish"), self.engine.begin() as connection:
+            for table, frame in frames:
+                date_column = medians.date_column
+                columns = ", ".join([f'"{column}" VARCHAR' for column in frame.columns[1:-1]])
+                connection.execute(f"""CREATE TABLE IF NOT EXISTS {table} 
+                                    ("{date_column}" TIMESTAMP, {columns + ', ' if columns else ''}"median_data" DOUBLE PRECISION)""")
+                days = frame[date_column].drop_duplicates()
+                for start in range(0, len(days), 1000):
+                    connection.execute(text(f"""DELETE FROM {table} WHERE "{date_column}" IN :days""")
+                                    .bindparams(bindparam("days", expanding=True)), 
+                                    days=[day.to_pydatetime() for day in days.iloc[start:start + 1000]])
+                self._write(frame, table, con=connection)
+    
+    def _partitioned(self, 
+                    partition_by:Optional[Tuple[str, str]], 
+                    stage_only:bool=False, 
+                    migrate:bool=False) -> bool:
+        """_partitioned
+        Whether the table can be range partitioned, only on Postgres. An
+        existing table that is not partitioned is migrated with migrate,
+        otherwise it is an error: CREATE TABLE IF NOT EXISTS would keep it
+        and creating every partition of it would fail.
+        """
+        self._partitions = set()
+        self._staged_partitions = {}
+        if not partition_by:
+            return False
+        assert partition_by[1] in GRANULARITIES, f"Partition by one of {GRANULARITIES}"
+        if stage_only:
+            return False
+        if self.engine.dialect.name != "postgresql":
+            self.logger.warning(f"Range partitioning not supported on {self.engine.dialect.name},"\
+                                f" loading {self.table_name} unpartitioned")
+            return False
+        if is_partitioned(self.engine, self.table_name) is False:
+            if not migrate:
+                raise RuntimeError(f"{self.table_name} exists and is not partitioned, rebuild it"\
+                                f" partitioned with migrate_partitions=True or drop it")
+            self.logger.info(f"Migrating {self.table_name} to partitions by {partition_by[1]}"\
+                            f" of {partition_by[0]}")
+            with self.engine.begin() as connection:
+                migrate_to_partitioned(connection, self.table_name, *partition_by)
+        return True
+    
+    def _ensure_partitions(self, values:pd.Series, partition_by:Tuple[str, str]) -> None:
+        """_ensure_partitions
+        Creates the partitions the values fall in that were not seen yet.
+        """
+        granularity = partition_by[1]
+        for start in partition_key(values, granularity).dropna().unique():
+            start = pd.Timestamp(start)
+            name = partition_name(self.table_name, start, granularity)
+            if name in self._partitions:
+                continue
+            self.logger.info(f"Creating partition {name}")
+            create_partition(self.engine, self.table_name, name, *partition_bounds(start, granularity))
+            self._partitions.add(name)
+    
+    def _write_partition_staging(self, 
+                                chunk:pd.DataFrame, 
+                                partition_by:Tuple[str, str], 
+                                type_string:str, 
+                                suffix:str="_swap") -> None:
+        """_write_partition_staging
+        Routes the rows of a chunk to a standalone table per partition,
+        to be swapped in by _swap_partitions (suffix _swap) or renamed to
+        {partition}_load by _complete_staging (suffix _staging).
+        """
+        column, granularity = partition_by
+        for start, rows in chunk.groupby(partition_key(chunk[column], granularity)):
+            start = pd.Timestamp(start)
+            name = partition_name(self.table_name, start, granularity)
+            if name not in self._staged_partitions:
+                staging = f"{name}{suffix}"
+                self.engine.execute(f"""DROP TABLE IF EXISTS {staging}""")
+                self.engine.execute(f"""CREATE TABLE {staging} ({type_string})""")
+                self._staged_partitions[name] = (staging,) + partition_bounds(start, granularity)
+            self._write(rows, self._staged_partitions[name][0])
+    
+    def _complete_staging(self) -> None:
+        """_complete_staging
+        Renames the tables of a finished stage_only load to {partition}_load,
+        a load that died half way never leaves a table publish_partitions
+        would pick up.
+        """
+        with self.engine.begin() as connection:
+            for name, (staging, start, end) in self._staged_partitions.items():
+                connection.execute(f"""DROP TABLE IF EXISTS {name}_load""")
+                connection.execute(f"""ALTER TABLE {staging} RENAME TO {name}_load""")
+                self._staged_partitions[name] = (f"{name}_load", start, end)
+        self.logger.info(f"Staged {', '.join(self._staged_partitions)} of {self.table_name} for publishing")
+    
+    def _staged_tables(self) -> List[Tuple[str, str, pd.Timestamp, pd.Timestamp]]:
+        """_staged_tables
+        (partition, staging table, start, end) of every {partition}_load 
+        table of a stage_only load of the table.
+        """
+        pattern = re.compile(rf"^{re.escape(self.table_name)}_(y\d{{4}}|m\d{{6}})_load$")
+        staged = []
+        for table in sorted(inspect(self.engine).get_table_names(schema=self.schema)):
+            match = pattern.match(table)
+            if not match:
+                continue
+            key = match.group(1)
+            granularity = "year" if key[0] == "y" else "month"
+            start = pd.Timestamp(f"{key[1:5]}-{key[5:7] or '01'}-01")
+            staged.append((table[:-len("_load")], table) + partition_bounds(start, granularity))
+        return staged
+    
+    @traced
+    def publish_partitions(self, 
+                        partition_column:str, 
+                        indexes:Optional[List[Tuple[str, ...]]]=None, 
+                        track_dates:Optional[str]=None, 
+                        partitions:Optional[List[str]]=None) -> List[str]:
+        """publish_partitions
+        Publishes the {partition}_load tables left by stage_only loads in
+        one transaction, only those of partitions (e.g. readings_y2020)
+        when given, leftovers of other runs stay staged. On Postgres each
+        one replaces its partition of the table, range partitioned on 
+        partition_column and created by the first publish, an existing 
+        unpartitioned table is an error. Elsewhere its range of the table 
+        is deleted and the staged rows inserted. track_dates records the 
+        dates of the replaced and the published rows as touched. Returns 
+        the published partitions.
+        """
+        staged = self._staged_tables()
+        if partitions is not None:
+            skipped = [name for name, _, _, _ in staged if name not in partitions]
+            if skipped:
+                self.logger.warning(f"Not publishing {', '.join(skipped)}, not in {partitions}")
+            staged = [table for table in staged if table[0] in partitions]
+        if not staged:
+            self.logger.info(f"No staged partitions of {self.table_name} to publish")
+            return []
+        
+        postgres = self.engine.dialect.name == "postgresql"
+        where = f"""WHERE "{partition_column}" >= :lower AND "{partition_column}" < :upper"""
+        with self.metrics.span("publish"), self.engine.begin() as connection:
+            if postgres:
+                if is_partitioned(connection, self.table_name) is False:
+                    raise RuntimeError(f"{self.table_name} exists and is not partitioned, rebuild it"\
+                                    f" partitioned with migrate_partitions=True or drop it")
+                connection.execute(f"""CREATE TABLE IF NOT EXISTS {self.table_name} (LIKE {staged[0][1]}) 
+                                    PARTITION BY RANGE ("{partition_column}")""")
+            else:
+                connection.execute(f"""CREATE TABLE IF NOT EXISTS {self.table_name} AS 
+                                    SELECT * FROM {staged[0][1]} WHERE 1 = 0""")
+            if track_dates:
+                ensure_touched_table(connection)
+            for name, staging, start, end in staged:
+                self.logger.info(f"Publishing {staging} as {name}")
+                bounds = dict(lower=start.to_pydatetime(), upper=end.to_pydatetime())
+                if track_dates:
+                    record_touched_from(connection, self.table_name, self.table_name, track_dates, 
+                                        where, **bounds)
+                    record_touched_from(connection, self.table_name, staging, track_dates)
+                if postgres:
+                    swap_partition(connection, self.table_name, name, staging, start, end)
+                else:
+                    connection.execute(text(f"""DELETE FROM {self.table_name} {where}"""), **bounds)
+                    connection.execute(f"""INSERT INTO {self.table_name} SELECT * FROM {staging}""")
+                    connection.execute(f"""DROP TABLE {staging}""")
+                self.metrics.count("partitions")
+            if indexes:
+                with self.metrics.span("index"):
+                    create_indexes(connection, self.table_name, indexes)
+        return [name for name, _, _, _ in staged]
+    
+    def _swap_partitions(self, track_dates:Optional[str]=None, touched:Optional[set]=None) -> None:
+        with self.engine.begin() as connection:
+            for name, (staging, start, end) in self._staged_partitions.items():
+                self.logger.info(f"Swapping {staging} in as partition {name}")
+                if track_dates and connection.execute(f"""SELECT to_regclass('{name}') IS NOT NULL""").scalar():
+                    record_touched_from(connection, self.table_name, name, track_dates)
+                swap_partition(connection, self.table_name, name, staging, start, end)
+            if track_dates:
+                record_touched(connection, self.table_name, touched or ())
+    
+    def _publish_increment(self, 
+                        staging:str, 
+                        col_names:str, 
+                        watermark_key:str, 
+                        watermark_column:str, 
+                        after:Optional[Tuple[str, object]], 
+                        track_dates:Optional[str]=None, 
+                        touched:Optional[set]=None) -> None:
+        """_publish_increment
+        Replaces the range of the staged rows in the table and moves the
+        high-water mark, all in one transaction. The dates of the replaced
+        range are recorded as touched in the same transaction.
+        """
+        with self.engine.begin() as connection:
+            lower, upper = connection.execute(f"""SELECT MIN("{watermark_column}"), 
+                                                MAX("{watermark_column}") FROM {staging}""").fetchone()
+            if upper is None:
+                self.logger.info(f"No new rows for {watermark_key}")
+                connection.execute(f"""DROP TABLE IF EXISTS {staging}""")
+                return
+            
+            if after is not None:
+                where = f"""WHERE "{watermark_column}" > :lower AND "{watermark_column}" <= :upper"""
+                lower = pd.Timestamp(after[1]).to_pydatetime()
+            else:
+                where = f"""WHERE "{watermark_column}" >= :lower AND "{watermark_column}" <= :upper"""
+            if track_dates:
+                record_touched_from(connection, self.table_name, self.table_name, track_dates, 
+                                    where, lower=lower, upper=upper)
+                record_touched(connection, self.table_name, touched or ())
+            connection.execute(text(f"""DELETE FROM {self.table_name} {where}"""), 
+                            lower=lower, upper=upper)
+            connection.execute(f"""INSERT INTO {self.table_name} ({col_names}) 
+                                SELECT {col_names} FROM {staging}""")
+            connection.execute(f"""DROP TABLE IF EXISTS {staging}""")
+            set_watermark(connection, watermark_key, upper)
+        self.logger.info(f"Published {watermark_key} up to {upper}")
\ No newline at end of file
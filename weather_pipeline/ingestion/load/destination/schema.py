@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# pandas dtype each SQL type is parsed as, when the schema gives no dtype.
+SQL_DTYPES = {
+    "REAL": "float32",
+    "FLOAT": "float64",
+    "DOUBLE PRECISION": "float64",
+    "SMALLINT": "Int16",
+    "INTEGER": "Int32",
+    "INT": "Int32",
+    "BIGINT": "Int64",
+}
+DATE_TYPES = ("TIMESTAMP", "DATE")
+# fixed width code columns, read as category (single byte codes)
+CODE_TYPES = ("CHAR",)
+
+
+def column_names(names_types:List[Tuple]) -> List[str]:
+    """column_names
+    Names of all the columns of a schema, in file order.
+    """
+    return [column[0] for column in names_types]
+
+
+def column_option(column:Tuple) -> Optional[str]:
+    """column_option
+    The optional third element of a schema column, a pandas dtype
+    (e.g. "category") or for date columns the strftime format.
+    """
+    return column[2] if len(column) > 2 else None
+
+
+def used_columns(names_types:List[Tuple], *required:Optional[List[str]]) -> Optional[List[str]]:
+    """used_columns
+    Columns of the schema that have to be materialized to serve all the
+    given requirements, None when any requirement needs every column.
+    """
+    if any(columns is None for columns in required):
+        return None
+    wanted = set()
+    for columns in required:
+        wanted.update(columns)
+    return [name for name in column_names(names_types) if name in wanted]
+
+
+def reader_kwargs(names_types:List[Tuple], usecols:Optional[List[str]]=None) -> Dict[str, object]:
+    """reader_kwargs
+    Turns a schema of (name, sql type[, dtype or date format]) tuples
+    into names, usecols and dtype for the pandas readers. Date columns
+    are read as category and converted by parse_dates, CHAR code
+    columns as category, so a chunk holds small integer codes instead
+    of one Python string per row until it is filtered.
+    """
+    kwargs = {"names": column_names(names_types)}
+    if usecols is not None:
+        kwargs["usecols"] = usecols
+    dtype = {}
+    for column in names_types:
+        name, sql_type, option = column[0], column[1].upper(), column_option(column)
+        if usecols is not None and name not in usecols:
+            continue
+        if sql_type in DATE_TYPES:
+            dtype[name] = "category"
+        elif option is not None:
+            dtype[name] = option
+        elif sql_type in SQL_DTYPES:
+            dtype[name] = SQL_DTYPES[sql_type]
+        elif sql_type in CODE_TYPES:
+            dtype[name] = "category"
+    kwargs["dtype"] = dtype
+    return kwargs
+
+
+def date_formats(names_types:List[Tuple]) -> Dict[str, Optional[str]]:
+    """date_formats
+    Date columns of the schema with their strftime format.
+    """
+    return {column[0]: column_option(column) for column in names_types \
+            if column[1].upper() in DATE_TYPES}
+
+
+def to_dates(values:pd.Series, date_format:Optional[str]=None) -> pd.Series:
+    """to_dates
+    Parses a string or categorical column to datetime64, every distinct
+    value only once, categorical columns by converting their categories.
+    """
+    if not hasattr(values, "cat"):
+        return pd.to_datetime(values, format=date_format, cache=True)
+    dates = pd.to_datetime(values.cat.categories, format=date_format).to_numpy()
+    # the last slot maps the missing code -1 to NaT
+    dates = np.append(dates, np.datetime64("NaT", "ns"))
+    return pd.Series(dates[values.cat.codes.to_numpy()], index=values.index, name=values.name)
+
+
+def parse_dates(df:pd.DataFrame, names_types:List[Tuple]) -> pd.DataFrame:
+    """parse_dates
+    Vectorized, format based conversion of the date columns of a chunk.
+    """
+    for column in names_types:
+        name, sql_type = column[0], column[1].upper()
+        if sql_type in DATE_TYPES and name in df.columns:
+            df[name] = to_dates(df[name], column_option(column))
+    return df
+
+
+def sql_types(names_types:List[Tuple], columns:Optional[List[str]]=None) -> str:
+    """sql_types
+    Column definition string for CREATE TABLE out of the schema.
+    """
+    return ", ".join([f'"{column[0]}" {column[1]}' for column in names_types \
+                    if columns is None or column[0] in columns])
@@ -0,0 +1,161 @@
+import time
+from typing import Iterator, List, Optional
+import pandas as pd
+
+# a parsed chunk is held next to its filtered copy and the rows being
+# serialized for the database, budget for three copies of it
+COPIES_IN_MEMORY = 3
+# in-memory size of a parsed block relative to its raw text, for sizing
+# the blocks of the worker processes before any is parsed
+PARSED_BYTES_PER_RAW_BYTE = 4
+# chunks whose in-memory size is measured (memory_usage(deep=True))
+PROBE_CHUNKS = 3
+# full chunk cycles timed per size, after one warm-up cycle of the load
+CYCLES_PER_SIZE = 2
+# a larger chunk is kept when it is at least this much faster
+MIN_GAIN = 1.05
+
+
+class chunkSizer:
+    """chunkSizer
+    
+    Sizes the chunks of a load by a memory budget instead of a row count.
+    The first PROBE_CHUNKS chunks measure the bytes per parsed row, which
+    caps the chunk at memory_budget / (bytes per row * COPIES_IN_MEMORY)
+    rows. Within that cap the chunk size doubles while the rows/s of
+    CYCLES_PER_SIZE whole chunk cycles (parse, filter and write) keeps
+    improving by MIN_GAIN and settles on the fastest size once it does
+    not.
+    
+    Methods:
+    --------
+    chunks(reader):
+        Chunks of a pandas TextFileReader, every one read with the
+        current size, resizing after each.
+    block_size(workers, max_in_flight):
+        Raw bytes per block of the parallel parser, so that the blocks
+        parsed by the workers and queued for the writer fit the budget.
+    """
+    def __init__(self,
+                memory_budget:int,
+                initial_rows:int=10000,
+                min_rows:int=1000,
+                max_rows:int=10000000,
+                logger=None) -> None:
+        self.memory_budget = memory_budget
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.rows = max(min_rows, min(initial_rows, max_rows))
+        self.logger = logger
+        self.bytes_per_row = None
+        self.best_rows, self.best_rate = None, 0.0
+        self.settled = False
+        self.sizes = []
+        self._probed = 0
+        self._warm = False
+        self._cycles = []
+    
+    @property
+    def ceiling(self) -> int:
+        if not self.bytes_per_row:
+            return self.max_rows
+        rows = int(self.memory_budget / (self.bytes_per_row * COPIES_IN_MEMORY))
+        return max(self.min_rows, min(rows, self.max_rows))
+    
+    def _log(self, message:str) -> None:
+        if self.logger is not None:
+            self.logger.info(message)
+    
+    def _measure(self, chunk:pd.DataFrame) -> None:
+        if self._probed >= PROBE_CHUNKS or not len(chunk):
+            return
+        self._probed += 1
+        bytes_per_row = chunk.memory_usage(deep=True, index=True).sum() / len(chunk)
+        self.bytes_per_row = max(self.bytes_per_row or 0, bytes_per_row)
+    
+    def _resize(self, rows:int, seconds:float) -> None:
+        """_resize
+        Picks the size of the next chunk after a full chunk of rows took
+        seconds from being requested to the next request.
+        """
+        ceiling = self.ceiling
+        previous = self.rows
+        if self.rows > ceiling:
+            # over the budget at the measured bytes per row, time the capped size
+            self.rows, self._cycles = ceiling, []
+            self.settled = self.settled or self.best_rows is None
+            self.best_rows = min(self.best_rows or ceiling, ceiling)
+            return self._log_resize(previous, ceiling)
+        if self.settled:
+            self.rows = min(self.best_rows, ceiling)
+            return self._log_resize(previous, ceiling)
+        if not self._warm:
+            # the first cycle also creates the table and warms up the connection
+            self._warm = True
+            return
+        self._cycles.append(seconds)
+        if len(self._cycles) < CYCLES_PER_SIZE:
+            return
+        rate = rows * len(self._cycles) / sum(self._cycles) if sum(self._cycles) > 0 else float("inf")
+        self._cycles = []
+        if rate >= self.best_rate * MIN_GAIN:
+            self.best_rows, self.best_rate = rows, rate
+            grown = min(rows * 2, ceiling)
+            # no room left under the cap for a size worth timing
+            self.settled = grown < rows * 1.25
+            self.rows = rows if self.settled else grown
+        else:
+            self.settled = True
+            self.rows = min(self.best_rows, ceiling)
+        self._log_resize(previous, ceiling, rate)
+    
+    def _log_resize(self, previous:int, ceiling:int, rate:Optional[float]=None) -> None:
+        if self.rows != previous:
+            at = f" {rate:.0f} rows/s at {previous}," if rate is not None else ""
+            self._log(f"Chunk size {previous} -> {self.rows} rows ({self.bytes_per_row or 0:.0f} B/row,"\
+                    f"{at} cap {ceiling} rows for {self.memory_budget / 1024 ** 2:.0f} MiB)")
+    
+    def chunks(self, reader) -> Iterator[pd.DataFrame]:
+        self._log(f"Adaptive chunks from {self.rows} rows within {self.memory_budget / 1024 ** 2:.0f} MiB")
+        requested, started = None, None
+        while True:
+            if requested is not None:
+                # the consumer is done with the previous chunk, a full cycle
+                self._resize(requested, time.perf_counter() - started)
+            started = time.perf_counter()
+            try:
+                chunk = reader.get_chunk(self.rows)
+            except StopIteration:
+                break
+            self._measure(chunk)
+            self.sizes.append(len(chunk))
+            # a short chunk is the end of the file, not a measurement
+            requested = self.rows if len(chunk) == self.rows else None
+            yield chunk
+        if self.best_rows is None:
+            self._log(f"Chunk sizes used: {summarize(self.sizes)}, too few full chunks to tune")
+            return
+        self._log(f"Chunk sizes used: {summarize(self.sizes)}, best {self.best_rows} rows"\
+                f" ({self.best_rows * (self.bytes_per_row or 0) / 1024 ** 2:.1f} MiB parsed,"\
+                f" {self.best_rate:.0f} rows/s)")
+    
+    def block_size(self, workers:int, max_in_flight:int) -> int:
+        blocks = workers + max_in_flight
+        size = int(self.memory_budget / (blocks * PARSED_BYTES_PER_RAW_BYTE * COPIES_IN_MEMORY))
+        size = max(1024 * 1024, size)
+        self._log(f"Blocks of {size / 1024 ** 2:.1f} MiB for {workers} workers and {max_in_flight}"\
+                f" blocks in flight within {self.memory_budget / 1024 ** 2:.0f} MiB")
+        return size
+
+
+def summarize(sizes:List[int]) -> str:
+    """summarize
+    Run length summary of chunk sizes, e.g. "10000, 20000 x3, 5321".
+    """
+    runs = []
+    for size in sizes:
+        if runs and runs[-1][0] == size:
+            runs[-1][1] += 1
+        else:
+            runs.append([size, 1])
+    return ", ".join([f"{size}" if count == 1 else f"{size} x{count}" for size, count in runs])
\ No newline at end of file
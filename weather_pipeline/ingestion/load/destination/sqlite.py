@@ -0,0 +1,32 @@
+import pandas as pd
+from sqlalchemy.engine.url import make_url
+from .rdbms import rdbmsLoader
+from weather_pipeline.utils.sqlite import bulk_load
+
+
+class sqliteLoader(rdbmsLoader):
+    """sqliteLoader
+    
+    Deriver from rdbmsLoader for single node runs on a SQLite file
+    (connection_string sqlite:///path), with every load method of
+    rdbmsLoader. Each chunk is inserted by batched executemany inside one
+    transaction with syncing off, the connections of the engine are in
+    WAL mode with median() registered (utils.sqlite.configure_connection),
+    indexes are built once after the load. Partitioning is not supported,
+    partition_by loads the table unpartitioned.
+    
+    Params:
+    -------
+        write_method: as rdbmsLoader, "executemany" by default.
+    """
+    def __init__(self, **kwargs) -> None:
+        kwargs.setdefault("write_method", "executemany")
+        super().__init__(_name=__name__, **kwargs)
+        assert make_url(self.connection).drivername.split("+")[0] == "sqlite", \
+            f"sqliteLoader needs a sqlite connection string, got {self.connection}"
+    
+    def _write(self, df:pd.DataFrame, table_name:str, if_exists:str="append", con=None) -> None:
+        if con is not None:
+            return super()._write(df, table_name, if_exists, con=con)
+        with self.engine.connect() as connection, bulk_load(connection), connection.begin():
+            super()._write(df, table_name, if_exists, con=connection)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import datetime
+from typing import Optional
+import pandas as pd
+from sqlalchemy import text
+
+WATERMARK_TABLE = "ingest_watermarks"
+
+
+def ensure_watermark_table(engine) -> None:
+    engine.execute(f"""CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE}
+                    ("source" VARCHAR, "high_water" TIMESTAMP, "updated_at" TIMESTAMP)""")
+
+
+def get_watermark(engine, key:str) -> Optional[pd.Timestamp]:
+    """get_watermark
+    High-water mark recorded for key, None before the first load.
+    """
+    ensure_watermark_table(engine)
+    row = engine.execute(text(f"""SELECT MAX("high_water") FROM {WATERMARK_TABLE}
+                                WHERE "source" = :key"""), key=key).fetchone()
+    return pd.Timestamp(row[0]) if row and row[0] is not None else None
+
+
+def set_watermark(connection, key:str, high_water:pd.Timestamp) -> None:
+    """set_watermark
+    Replaces the high-water mark of key, meant to run inside the
+    transaction that publishes the rows up to it.
+    """
+    connection.execute(text(f"""DELETE FROM {WATERMARK_TABLE} WHERE "source" = :key"""), key=key)
+    connection.execute(text(f"""INSERT INTO {WATERMARK_TABLE} ("source", "high_water", "updated_at")
+                                VALUES (:key, :high_water, :updated_at)"""),
+                    key=key,
+                    high_water=pd.Timestamp(high_water).to_pydatetime(),
+                    updated_at=datetime.datetime.utcnow())
\ No newline at end of file
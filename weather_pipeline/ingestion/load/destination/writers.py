@@ -0,0 +1,61 @@
+import csv
+from io import StringIO
+
+
+def _qualified_name(table) -> str:
+    if table.schema:
+        return f'"{table.schema}"."{table.name}"'
+    return f'"{table.name}"'
+
+
+def executemany_insert(table, conn, keys, data_iter, batch_size:int=50000) -> None:
+    """executemany_insert
+
+    pandas.to_sql insertion method that sends the rows as batches of
+    parameter sets through DBAPI executemany, used where COPY is
+    not available (e.g. SQLite).
+    """
+    columns = ", ".join([f'"{key}"' for key in keys])
+    params = ", ".join(["?" if conn.dialect.paramstyle == "qmark" else "%s"] * len(keys))
+    sql = f"INSERT INTO {_qualified_name(table)} ({columns}) VALUES ({params})"
+
+    cursor = conn.connection.cursor()
+    try:
+        batch = []
+        for row in data_iter:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+    finally:
+        cursor.close()
+
+
+def copy_insert(table, conn, keys, data_iter) -> None:
+    """copy_insert
+
+    pandas.to_sql insertion method that streams the rows into Postgres
+    with COPY ... FROM STDIN through an in-memory CSV buffer. Falls back
+    to batched executemany on engines without COPY.
+    """
+    if conn.dialect.name != "postgresql":
+        return executemany_insert(table, conn, keys, data_iter)
+
+    buffer = StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+
+    columns = ", ".join([f'"{key}"' for key in keys])
+    sql = f"COPY {_qualified_name(table)} ({columns}) FROM STDIN WITH CSV"
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(sql=sql, file=buffer)
+
+
+WRITE_METHODS = {
+    "to_sql": None,
+    "multi": "multi",
+    "executemany": executemany_insert,
+    "copy": copy_insert,
+}
@@ -1,9 +1,13 @@
-import datetime
+from typing import List, Optional
 from weather_pipeline.ingestion.load import Loader
 from weather_pipeline.transform import Transformer
 from weather_pipeline.ingestion.extract import Extractor
 from weather_pipeline.utils.app_logger import _get_logger
-from weather_pipeline.config import LOADER_DESTINATION, LOADER_CONNECTION_STRING
+from weather_pipeline.config import LOADER_DESTINATION, LOADER_CONNECTION_STRING, \
+                LOADER_WRITE_METHOD, LOADER_WORKERS, LOADER_MAX_IN_FLIGHT, LOADER_MEMORY_BUDGET, \
+                CITIES_URL, STATIONS_URL, READINGS_URL, READINGS_START_YEAR, READINGS_END_YEAR, \
+                READINGS_MIGRATE_PARTITIONS
+from weather_pipeline.ingestion.load.destination.layouts import GHCND_STATIONS_COLSPECS
 
 logger = _get_logger(name=__name__)
 
@@ -14,7 +18,7 @@ def ingest_load_cities() -> None:
     all german cities and load it to the final db.
     """
     logger.info("Extracting and loading cities..")
-    url = "http://www.fa-technik.adfc.de/code/opengeodb/DE.tab"
+    url = CITIES_URL
     
     # define extractor
     extractor = Extractor(source_type="web", source_url=url, temp_location="tmp/cities.csv")
@@ -27,6 +31,7 @@ def ingest_load_cities() -> None:
     loader = Loader(destination_type=LOADER_DESTINATION,
                     reader_type="csv",
                     connection_string = LOADER_CONNECTION_STRING,
+                    write_method = LOADER_WRITE_METHOD,
                     file = file,
                     table_name = "cities")
     # init loader
@@ -36,6 +41,7 @@ def ingest_load_cities() -> None:
     db_loader.load_data_as_chunk(chunksize=10000,
                                 filters=[("typ", "Stadt")],
                                 col_required = ["name", "lat", "lon"],
+                                memory_budget=LOADER_MEMORY_BUDGET,
                                 error_bad_lines=False, 
                                 encoding="utf-8", 
                                 delimiter="\t")
@@ -48,7 +54,7 @@ def ingest_load_weather_stations() -> None:
     all weather stations and load it to the final db.
     """
     logger.info("Extracting and loading weather stations")
-    url = "https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/ghcnd-stations.txt"
+    url = STATIONS_URL
     
     # define extractor
     extractor = Extractor(source_type="web", source_url=url)
@@ -59,8 +65,9 @@ def ingest_load_weather_stations() -> None:
     
     # define loader
     loader = Loader(destination_type=LOADER_DESTINATION,
-                    reader_type="fixed_width",
+                    reader_type="fixed_bytes",
                     connection_string = LOADER_CONNECTION_STRING,
+                    write_method = LOADER_WRITE_METHOD,
                     file = file,
                     table_name = "stations")
     
@@ -76,25 +83,41 @@ def ingest_load_weather_stations() -> None:
     db_loader.load_data_as_chunk(chunksize=10000,
                                 names_types= names_types,
                                 col_required = ["ID", "LATITUDE", "LONGITUDE", "STATE"],
-                                header=None,
-                                error_bad_lines=False)
+                                memory_budget=LOADER_MEMORY_BUDGET,
+                                colspecs=GHCND_STATIONS_COLSPECS,
+                                header=None)
     logger.info("Weather Stations loaded.")
 
-def filter_weather_stations() -> None:
+def filter_weather_stations(method:str="grid", radius_km:float=5.0) -> None:
     """filter_weather_stations
     
     This function is responsible to take the loaded city
     and weather station tables, apply a cross join to 
     exactly find how many weather station are under the 
     permissiable range of 5 km to any German city.
+    
+    method "grid" matches every station to its nearest city within
+    radius_km by haversine distance over a lat/lon grid index, method
+    "sql" keeps the lat/lon box cross join in the database.
     """
     logger.info("Joining weather stations and cities")
     connection_string = LOADER_CONNECTION_STRING
-    transform = Transformer(destination_type="rdbms", connection_string=connection_string)
+    transform = Transformer(destination_type=LOADER_DESTINATION, connection_string=connection_string)
     rdms_trasform = transform.init()
     
-    rdms_trasform.run_transform(
-        """CREATE TEMP TABLE IF NOT EXISTS city_join_stations AS (
+    if method == "grid":
+        geo_transform = Transformer(destination_type="geo", connection_string=connection_string).init()
+        geo_transform.run_transform(points_table="stations", 
+                                    centers_table="cities", 
+                                    target_table="city_stations", 
+                                    radius_km=radius_km)
+        rdms_trasform.run_transforms(["""DROP table cities;""", """DROP table stations;"""])
+        logger.info("Join complete")
+        return
+    
+    # one connection and transaction, the temp table is seen by the next statements
+    rdms_trasform.run_transforms([
+        """CREATE TEMP TABLE IF NOT EXISTS city_join_stations AS 
             SELECT *, ROW_NUMBER() OVER (
                     PARTITION BY
                     "ID"
@@ -102,85 +125,202 @@ def filter_weather_stations() -> None:
                 FROM 
                 stations CROSS JOIN cities
                 WHERE "LATITUDE" BETWEEN (lat - 0.05) and (lat + 0.05)
-		        and "LONGITUDE" BETWEEN (lon - 0.1) and (lon + 0.1)
-	            );
-        """)
+		        and "LONGITUDE" BETWEEN (lon - 0.1) and (lon + 0.1);
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS city_stations AS SELECT * FROM city_join_stations WHERE row_num = 1;
+        """,
+        """DROP table city_join_stations;""",
+        """DROP table cities;""",
+        """DROP table stations;"""])
+    logger.info("Join complete")
+
+def _readings_url(year:int) -> str:
+    return READINGS_URL.format(year=year)
+
+def _load_weather_readings(file, year:int, incremental:bool=False, 
+                        late_window_days:int=7, medians:bool=False, 
+                        columnar:bool=False, stage_only:bool=False) -> None:
+    """_load_weather_readings
     
-    rdms_trasform.run_transform("""
-                                CREATE TABLE IF NOT EXISTS city_stations AS (SELECT * FROM city_join_stations WHERE row_num = 1 );
-                                """)
+    Loads the TMAX readings of one downloaded by_year file for the
+    stations in city_stations into readings. incremental only loads the
+    readings past the year's high-water mark (minus late_window_days).
+    medians computes germany_medians and city_daily_medians of the
+    loaded days while loading. columnar parses the file once into a
+    memory-mapped columnar copy next to it and loads from that.
+    stage_only writes the year to its own readings_y<year>_load table
+    for publish_weather_readings and leaves readings untouched.
+    """
+    # define loader
+    loader = Loader(destination_type=LOADER_DESTINATION,
+                    reader_type="columnar" if columnar else "csv",
+                    connection_string = LOADER_CONNECTION_STRING,
+                    write_method = LOADER_WRITE_METHOD,
+                    file = file,
+                    table_name = "readings",
+                    storage = {"DATA": "int16"})
     
-    rdms_trasform.run_transform("""DROP table city_join_stations;""")
-    rdms_trasform.run_transform("""DROP table cities;""")
-    rdms_trasform.run_transform("""DROP table stations;""")
-    logger.info("Join complete")
+    # init loader
+    db_loader = loader.init()
+    
+    names_types = [("ID", "VARCHAR", "category"), ("DATE", "TIMESTAMP", "%Y%m%d"), 
+            ("ELEMENT", "VARCHAR", "category"), ("DATA", "REAL", "Int16"), ("M-FLAG", "CHAR"), 
+            ("Q-FLAG", "CHAR"), ("S-FLAG", "CHAR"), ("OBS-TIME", "CHAR")]
+    
+    db_loader.load_and_merge_on(chunksize=1000000,
+                                names_types = names_types,
+                                filters=[("ELEMENT", "TMAX")],
+                                col_required = ["ID", "DATE", "DATA"],
+                                join_with="city_stations",
+                                join_key= "ID",
+                                join_mode="memory",
+                                prefilter=True,
+                                workers=LOADER_WORKERS,
+                                max_in_flight=LOADER_MAX_IN_FLIGHT,
+                                memory_budget=LOADER_MEMORY_BUDGET,
+                                chunk_suffix=year,
+                                watermark_key=f"ghcn_by_year/{year}" if incremental else None,
+                                late_window_days=late_window_days,
+                                partition_by=("DATE", "year"),
+                                migrate_partitions=READINGS_MIGRATE_PARTITIONS,
+                                stage_only=stage_only,
+                                indexes=None if stage_only else [("ID", "DATE")],
+                                track_dates=None if stage_only else "DATE",
+                                median_of="DATA" if medians and not stage_only else None,
+                                median_groups=("city_stations", "name"),
+                                header=None,
+                                error_bad_lines=False,
+                                encoding="utf-8")
+    logger.info(f"Data for {year} loaded")
 
-def ingest_load_weather_readings(year:int=2020) -> None:
+def ingest_load_weather_readings(year:int=2020, stream:bool=False, land:bool=True, 
+                                incremental:bool=False, late_window_days:int=7, 
+                                medians:bool=False, columnar:bool=False) -> None:
     """ingest_load_weather_readings
     
     This function is responsible to fetch the weather reading for all the 
     weather stations and filter the TMAX element, and then chunk wise 
     ingest tables to db and only insert all the reading which are from
     the stations we get in filter_weather_stations() table.
+    
+    With stream the download is decompressed and loaded as it arrives,
+    land additionally keeps a copy in tmp/ for the download cache.
+    incremental only loads what is new since the last run of the year,
+    re-loading the last late_window_days idempotently. medians 
+    aggregates the daily medians in the same pass. columnar loads the
+    downloaded file through its columnar copy (not with stream).
     """
     logger.info(f"Extracting and loading weather stations data for {year}")
-    url = f"https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/by_year/{year}.csv.gz"
+    url = _readings_url(year)
     
     # define extractor
     extractor = Extractor(source_type="web", source_url=url)
     # init extractor
     web_extractor = extractor.init()
+    if stream:
+        with web_extractor.stream(land=land) as file:
+            _load_weather_readings(file, year, incremental, late_window_days, medians)
+        return
+    
     web_extractor.get(chunksize=10000)
     file = web_extractor.filepath
     
+    _load_weather_readings(file, year, incremental, late_window_days, medians, columnar)
+    web_extractor.release()
+
+def ingest_load_weather_readings_range(years:List[int], max_workers:int=4, 
+                                    medians:bool=False) -> None:
+    """ingest_load_weather_readings_range
+    
+    Downloads the readings of several years concurrently and loads
+    every year as soon as its file has arrived.
+    """
+    logger.info(f"Extracting and loading weather stations data for {years}")
+    urls = [_readings_url(year) for year in years]
+    
+    # define extractor
+    extractor = Extractor(source_type="web_batch", source_urls=urls, 
+                        max_workers=max_workers, per_host=max_workers)
+    # init extractor
+    web_extractor = extractor.init()
+    year_of = dict(zip(web_extractor.filepaths, years))
+    
+    for file in web_extractor.get(chunksize=10000):
+        _load_weather_readings(file, year_of[file], medians=medians)
+
+def readings_years() -> List[int]:
+    return list(range(READINGS_START_YEAR, READINGS_END_YEAR + 1))
+
+def stage_weather_readings(year:int) -> None:
+    """stage_weather_readings
+    
+    Downloads and loads the readings of one year into its own staging
+    table, so the years of a backfill can run in parallel and a failed
+    year can be re-run alone. publish_weather_readings makes them visible.
+    """
+    logger.info(f"Extracting and staging weather readings for {year}")
+    
+    # define extractor
+    extractor = Extractor(source_type="web", source_url=_readings_url(year))
+    # init extractor
+    web_extractor = extractor.init()
+    web_extractor.get(chunksize=10000)
+    
+    _load_weather_readings(web_extractor.filepath, year, stage_only=True)
+    web_extractor.release()
+
+def publish_weather_readings() -> None:
+    """publish_weather_readings
+    
+    Swaps the years of readings_years() staged by stage_weather_readings
+    into readings in one transaction and records the replaced days as 
+    touched for the incremental medians.
+    """
     # define loader
     loader = Loader(destination_type=LOADER_DESTINATION,
-                    reader_type="csv",
                     connection_string = LOADER_CONNECTION_STRING,
-                    file = file,
+                    file = None,
                     table_name = "readings")
     
     # init loader
     db_loader = loader.init()
-    
-    names_types = [("ID", "VARCHAR"), ("DATE", "TIMESTAMP"), ("ELEMENT", "VARCHAR"), 
-            ("DATA", "REAL"), ("M-FLAG", "CHAR"), ("Q-FLAG", "CHAR"), 
-            ("S-FLAG", "CHAR"), ("OBS-TIME", "CHAR")]
-    
-    db_loader.load_and_merge_on(chunksize=400000,
-                                names_types = names_types,
-                                filters=[("ELEMENT", "TMAX")],
-                                col_required = ["ID", "DATE", "DATA"],
-                                join_with="city_stations",
-                                join_key= "ID",
-                                chunk_suffix=year,
-                                header=None,
-                                parse_dates= ["DATE"],
-                                date_parser=(lambda x: datetime.datetime.strptime(x, "%Y%m%d")),
-                                error_bad_lines=False,
-                                encoding="utf-8")
-    logger.info(f"Data for {year} loaded")
+    published = db_loader.publish_partitions("DATE", indexes=[("ID", "DATE")], track_dates="DATE", 
+                                            partitions=[f"readings_y{year}" for year in readings_years()])
+    logger.info(f"Published {', '.join(published) or 'nothing'}")
 
-def create_germany_medians() -> None:
+def create_germany_medians(incremental:bool=False) -> None:
     """create_germany_medians
     
     This funciton is responsible to create an aggregated table from the 
     readings table, this has median temprature of germany against each date.
+    
+    With incremental the medians are only recomputed for the dates the 
+    readings loads touched since the last run and upserted, the first run 
+    builds the whole table.
     """
     logger.info("Creating Germany median data from readings")
     connection_string = LOADER_CONNECTION_STRING
     
     # define transformer
-    transform = Transformer(destination_type="rdbms", connection_string=connection_string)
+    transform = Transformer(destination_type=LOADER_DESTINATION, connection_string=connection_string)
     
     # init transformer
     rdms_trasform = transform.init()
-
-    rdms_trasform.run_transform("""CREATE TABLE IF NOT EXISTS germany_medians AS 
-                                (SELECT readings."DATE", PERCENTILE_CONT(0.5) 
-                                WITHIN GROUP(ORDER BY readings."DATA") as median_data
+    
+    if incremental:
+        rdms_trasform.refresh_aggregate(target_table="germany_medians",
+                                        source_table="readings",
+                                        key_column="DATE",
+                                        aggregates=f"""{rdms_trasform.median('readings."DATA"')} 
+                                        as median_data""")
+        logger.info("Germany medians refreshed")
+        return
+    
+    rdms_trasform.run_transform(f"""CREATE TABLE IF NOT EXISTS germany_medians AS 
+                                SELECT readings."DATE", {rdms_trasform.median('readings."DATA"')} as median_data
                                 from readings 
-                                GROUP BY readings."DATE");
+                                GROUP BY readings."DATE";
                                 """)
     logger.info("Germany medians created")
 
@@ -193,31 +333,29 @@ def get_city_interval(city:str, date:str) -> None:
     logger.info(f"Creating {city} rank table for {date}.")
     connection_string = LOADER_CONNECTION_STRING
     table_name_date = date.replace("-","")
-    transform = Transformer(destination_type="rdbms", connection_string=connection_string)
+    transform = Transformer(destination_type=LOADER_DESTINATION, connection_string=connection_string)
     rdms_trasform = transform.init()
     
-    rdms_trasform.run_transform(
+    rdms_trasform.run_transforms([
             f"""
-                CREATE TEMP TABLE IF NOT EXISTS city_median_agg AS (
+                CREATE TEMP TABLE IF NOT EXISTS city_median_agg AS 
                     WITH cte AS 
                         (SELECT germany_medians."DATE", intermediate.name, 
                         CAST(intermediate.median_data >= (germany_medians.median_data + 30) AS INTEGER) AS median_greater_germany 
                         FROM germany_medians JOIN (
-                                SELECT filter_readings."DATE", city_stations."name", PERCENTILE_CONT(0.5) 
-                                WITHIN GROUP(ORDER BY filter_readings."DATA") as median_data
+                                SELECT filter_readings."DATE", city_stations."name", 
+                                {rdms_trasform.median('filter_readings."DATA"')} as median_data
                                 FROM city_stations JOIN
-                                (SELECT * FROM readings WHERE readings."DATE" BETWEEN ('{date} 00:00:00'::TIMESTAMP - 									INTERVAL '1 year') 
+                                (SELECT * FROM readings WHERE readings."DATE" 
+                                BETWEEN {rdms_trasform.timestamp(date + ' 00:00:00', years_before=1)} 
                                 and ('{date} 00:00:00')) as filter_readings
                                 ON filter_readings."ID" = city_stations."ID"
                                 GROUP BY filter_readings."DATE", city_stations."name") as intermediate 
                         ON germany_medians."DATE" = intermediate."DATE")
                     SELECT cte."name", SUM(cte.median_greater_germany) AS hotness 
                     FROM cte
-                    GROUP BY cte."name"
-                );
-            """)
-    
-    rdms_trasform.run_transform(
+                    GROUP BY cte."name";
+            """,
             f"""
                 CREATE TABLE city_rank_{table_name_date} as
                     WITH cte AS 
@@ -230,7 +368,116 @@ def get_city_interval(city:str, date:str) -> None:
                         ELSE  floor(cte.percentile * 10)
                         END as percentile_id
                     from cte;
-            """)
+            """,
+            """DROP TABLE IF EXISTS city_median_agg"""])
+    logger.info("Rank Table created")
+
+def create_city_daily_medians(rebuild:bool=False) -> None:
+    """create_city_daily_medians
+    
+    Maintains the median temprature of every city against each date,
+    from readings joined to city_stations and keyed by (DATE, name). Only
+    the dates the readings loads touched since its last refresh are 
+    recomputed, the first run or rebuild builds the whole table. The 
+    loader maintains the same table when it aggregates medians while 
+    loading.
+    """
+    logger.info("Refreshing city daily median data from readings")
+    rdms_trasform = Transformer(destination_type=LOADER_DESTINATION, 
+                                connection_string=LOADER_CONNECTION_STRING).init()
+    if rebuild:
+        rdms_trasform.run_transform("""DROP TABLE IF EXISTS city_daily_medians""")
     
-    rdms_trasform.run_transform("""DROP TABLE IF EXISTS city_median_agg""")
-    logger.info("Rank Table created")
\ No newline at end of file
+    rdms_trasform.refresh_aggregate(target_table="city_daily_medians",
+                                    source_table="readings",
+                                    key_column="DATE",
+                                    aggregates=f"""{rdms_trasform.median('readings."DATA"')} 
+                                    as median_data""",
+                                    group_columns=['city_stations."name"'],
+                                    joins='JOIN city_stations ON readings."ID" = city_stations."ID"')
+    logger.info("City daily medians refreshed")
+
+def get_city_intervals(start_date:str, end_date:str, 
+                    cities:Optional[List[str]]=None, 
+                    rebuild_medians:bool=False) -> None:
+    """get_city_intervals
+    
+    Batch version of get_city_interval, ranks the cities by hotness for
+    every date from start_date to end_date into the single city_ranks 
+    table keyed by date. The hotness of a date (the days of the past year
+    a city was 30 above the Germany median) is a sliding one year RANGE
+    window over city_daily_medians, refreshed for the touched dates. With 
+    cities only their rows are kept, ranked against all cities. Needs
+    Postgres (generate_series and RANGE windows over intervals).
+    """
+    logger.info(f"Creating city rank table from {start_date} to {end_date}.")
+    create_city_daily_medians(rebuild=rebuild_medians)
+    rdms_trasform = Transformer(destination_type=LOADER_DESTINATION, 
+                                connection_string=LOADER_CONNECTION_STRING).init()
+    
+    city_filter = ""
+    if cities:
+        city_list = ", ".join(["'" + city.replace("'", "''") + "'" for city in cities])
+        city_filter = f"""AND "name" IN ({city_list})"""
+    
+    # replaced in one transaction
+    rdms_trasform.run_transforms([
+            """
+                CREATE TABLE IF NOT EXISTS city_ranks 
+                    ("DATE" TIMESTAMP, "name" TEXT, "hotness" BIGINT, 
+                    "percentile" DOUBLE PRECISION, "percentile_id" DOUBLE PRECISION);
+            """,
+            f"""
+                DELETE FROM city_ranks 
+                WHERE "DATE" BETWEEN '{start_date}'::TIMESTAMP AND '{end_date}'::TIMESTAMP {city_filter};
+            """,
+            f"""
+                INSERT INTO city_ranks
+                WITH daily AS 
+                    (SELECT city_daily_medians."DATE", city_daily_medians."name", 
+                    CAST(city_daily_medians.median_data >= (germany_medians.median_data + 30) AS INTEGER) AS hot,
+                    1 AS observed, 0 AS anchor
+                    FROM city_daily_medians JOIN germany_medians 
+                    ON city_daily_medians."DATE" = germany_medians."DATE"
+                    WHERE city_daily_medians."DATE" BETWEEN ('{start_date}'::TIMESTAMP - INTERVAL '1 year') 
+                    AND '{end_date}'::TIMESTAMP),
+                anchors AS 
+                    (SELECT dates."DATE", names."name", 0 AS hot, 0 AS observed, 1 AS anchor
+                    FROM generate_series('{start_date}'::TIMESTAMP, '{end_date}'::TIMESTAMP, 
+                                        INTERVAL '1 day') AS dates("DATE")
+                    CROSS JOIN (SELECT DISTINCT "name" FROM daily) AS names),
+                rolling AS 
+                    (SELECT "DATE", "name", anchor, 
+                    SUM(hot) OVER one_year AS hotness, 
+                    SUM(observed) OVER one_year AS observed_days
+                    FROM (SELECT * FROM daily UNION ALL SELECT * FROM anchors) AS days
+                    WINDOW one_year AS (PARTITION BY "name" ORDER BY "DATE" 
+                                        RANGE BETWEEN INTERVAL '1 year' PRECEDING AND CURRENT ROW)),
+                ranked AS 
+                    (SELECT "DATE", "name", hotness, 
+                    PERCENT_RANK() OVER (PARTITION BY "DATE" ORDER BY hotness) AS percentile
+                    FROM rolling
+                    WHERE anchor = 1 AND observed_days > 0)
+                SELECT "DATE", "name", hotness, percentile,
+                CASE
+                    WHEN floor(percentile * 10) = 10 THEN 9
+                    ELSE floor(percentile * 10)
+                    END AS percentile_id
+                FROM ranked
+                WHERE TRUE {city_filter};
+            """])
+    logger.info("Rank table created")
+
+def create_daily_medians_from_staging(years:List[int]) -> None:
+    """create_daily_medians_from_staging
+    
+    Rebuilds germany_medians and city_daily_medians for the stations in
+    city_stations from the columnar copies of the downloaded by_year files,
+    without re-parsing the csv or reading the readings table.
+    """
+    logger.info(f"Creating daily medians from the columnar copies of {years}")
+    sources = [f"tmp/{_readings_url(year).rsplit('/')[-1]}" for year in years]
+    columnar_transform = Transformer(destination_type="columnar", 
+                                    connection_string=LOADER_CONNECTION_STRING).init()
+    columnar_transform.run_transform(sources=sources, filters=[("ELEMENT", "TMAX")])
+    logger.info("Daily medians created")
\ No newline at end of file
@@ -1,13 +1,24 @@
 from weather_pipeline.utils.app_logger import _get_logger
-from weather_pipeline.transform.operator.rdbms import rdbmsOperator
+from weather_pipeline.utils.drivers import import_driver
+
+# destination_type -> operator class, imported on init()
+OPERATORS = {
+    "rdbms": "weather_pipeline.transform.operator.rdbms:rdbmsOperator",
+    "sqlite": "weather_pipeline.transform.operator.sqlite:sqliteOperator",
+    "geo": "weather_pipeline.transform.operator.geo:geoOperator",
+    "columnar": "weather_pipeline.transform.operator.columnar:columnarOperator",
+}
 
 class Transformer:
     def __init__(self, destination_type, **kwargs):
         self.logger = _get_logger(name=__name__)
-        if destination_type == "rdbms":
-            self.driver = rdbmsOperator(**kwargs)
-        else:
+        if destination_type not in OPERATORS:
             raise NotImplementedError
+        self.destination_type = destination_type
+        self.kwargs = kwargs
+        self.driver = None
     
     def init(self):
+        if self.driver is None:
+            self.driver = import_driver(OPERATORS[self.destination_type])(**self.kwargs)
         return self.driver
\ No newline at end of file
@@ -1,5 +1,6 @@
 import abc
 from weather_pipeline.utils.app_logger import _get_logger
+from weather_pipeline.utils.metrics import stageMetrics
 
 
 class BaseOperator(metaclass=abc.ABCMeta):
@@ -13,9 +14,13 @@ class BaseOperator(metaclass=abc.ABCMeta):
         run_transform:
             An abstract class which gives a single intraction with 
             the engine required to carry out transformation.
+    
+    self.metrics times the transform spans and counts the rows of every
+    operation decorated with metrics.traced.
     """
     def __init__(self, _name=__name__):
         self.logger = _get_logger(name=_name)
+        self.metrics = stageMetrics(component=_name, logger=self.logger)
     
     @abc.abstractmethod
     def run_transform(self):
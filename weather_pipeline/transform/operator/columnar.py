@@ -0,0 +1,73 @@
+from pathlib import Path
+from typing import List, Optional, Tuple
+import pandas as pd
+from .base import BaseOperator
+from weather_pipeline.ingestion.load.destination.columnar import HEADER, columnar_path, columnarStore
+from weather_pipeline.ingestion.load.destination.medians import dailyMedians
+from weather_pipeline.utils.engines import get_engine
+from weather_pipeline.utils.metrics import traced
+
+
+class columnarOperator(BaseOperator):
+    """columnarOperator
+    
+    Deriver from BaseOperator, rebuilds the daily median tables from the
+    memory-mapped columnar copies of the source files instead of the
+    readings table, filters and the station set are applied on the raw
+    column arrays.
+    
+    Methods:
+    ----------
+    run_transform(sources, filters, join_with, join_key, ...):
+        Scans the columnar copies of sources for the stations of join_with
+        and replaces the overall and per group daily median tables.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(_name=__name__)
+        self.connection_string = kwargs.get("connection_string")
+        self.__validator()
+        self.engine = get_engine(self.connection_string)
+    
+    def __validator(self):
+        assert self.connection_string is not None, "The rdbms connection is not provided."
+    
+    def _store(self, source) -> columnarStore:
+        if (Path(source) / HEADER).exists():
+            return columnarStore(source)
+        return columnarStore(columnar_path(source))
+    
+    @traced
+    def run_transform(self, 
+                    sources:List[str], 
+                    filters:Optional[List[Tuple[str, object]]]=None, 
+                    join_with:str="city_stations", 
+                    join_key:str="ID", 
+                    group_column:str="name", 
+                    value_column:str="DATA", 
+                    date_column:str="DATE", 
+                    target_tables:Tuple[str, str]=("germany_medians", "city_daily_medians"), 
+                    chunksize:int=5000000) -> None:
+        self.metrics.labels["target"] = ",".join(target_tables)
+        key_groups = pd.read_sql(f'SELECT "{join_key}", "{group_column}" FROM {join_with}', 
+                                con=self.engine).set_index(join_key)[group_column]
+        keys = pd.Index(key_groups.index.dropna().unique())
+        medians = dailyMedians(date_column, value_column, join_key, key_groups)
+        
+        for source in sources:
+            store = self._store(source)
+            self.logger.info(f"Scanning {store.rows} rows of {store.path} for {len(keys)} {join_key} keys")
+            self.metrics.count("rows_in", store.rows)
+            frames = store.iter_frames(chunksize, [join_key, date_column, value_column], 
+                                    filters, join_key, keys)
+            for frame in self.metrics.timed(frames, "parse"):
+                self.metrics.count("chunks")
+                with self.metrics.span("transform"):
+                    medians.add(frame)
+        
+        with self.metrics.span("transform"):
+            frames = medians.frames()
+        with self.metrics.span("write"), self.engine.begin() as connection:
+            for table, frame in zip(target_tables, frames):
+                frame.to_sql(table, con=connection, if_exists="replace", index=False)
+                self.metrics.count("rows_out", len(frame))
+                self.logger.info(f"{len(frame)} rows written to {table}")
\ No newline at end of file
@@ -0,0 +1,123 @@
+import math
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from .base import BaseOperator
+from weather_pipeline.utils.engines import get_engine
+from weather_pipeline.utils.metrics import traced
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """haversine_km
+    Vectorized great circle distance in km between coordinates in degrees.
+    """
+    lat1, lon1, lat2, lon2 = [np.radians(np.asarray(value, dtype="float64"))
+                            for value in (lat1, lon1, lat2, lon2)]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def nearest_within(points:pd.DataFrame,
+                centers:pd.DataFrame,
+                radius_km:float,
+                point_coords:Tuple[str, str]=("LATITUDE", "LONGITUDE"),
+                center_coords:Tuple[str, str]=("lat", "lon"),
+                point_key:str="ID",
+                center_key:str="name") -> pd.DataFrame:
+    """nearest_within
+    Pairs every point with its nearest center within radius_km.
+    
+    Centers are bucketed into a lat/lon grid with cells of radius_km in
+    latitude, every point is only compared against the centers of the
+    neighbouring cells that can lie within the radius, using the true
+    haversine distance. Ties on distance go to the smaller center_key.
+    """
+    point_lat, point_lon = point_coords
+    center_lat, center_lon = center_coords
+    points = points.dropna(subset=[point_lat, point_lon])
+    centers = centers.dropna(subset=[center_lat, center_lon])
+    if points.empty or centers.empty:
+        return pd.DataFrame(columns=list(points.columns) + list(centers.columns) + ["distance_km"])
+    
+    cell = radius_km / KM_PER_DEGREE
+    # longitude cells to search either side, widest at the highest latitude
+    max_lat = min(np.abs(centers[center_lat].astype("float64")).max() + cell, 89.0)
+    lon_span = int(math.ceil(cell / math.cos(math.radians(max_lat)) / cell))
+    
+    center_cells = pd.DataFrame({
+        "_row": np.arange(len(centers)),
+        "_lat_cell": np.floor(centers[center_lat].to_numpy("float64") / cell).astype("int64"),
+        "_lon_cell": np.floor(centers[center_lon].to_numpy("float64") / cell).astype("int64"),
+    })
+    point_lat_cell = np.floor(points[point_lat].to_numpy("float64") / cell).astype("int64")
+    point_lon_cell = np.floor(points[point_lon].to_numpy("float64") / cell).astype("int64")
+    
+    candidates = []
+    for lat_offset in (-1, 0, 1):
+        for lon_offset in range(-lon_span, lon_span + 1):
+            shifted = pd.DataFrame({"_point": np.arange(len(points)),
+                                    "_lat_cell": point_lat_cell + lat_offset,
+                                    "_lon_cell": point_lon_cell + lon_offset})
+            candidates.append(shifted.merge(center_cells, on=["_lat_cell", "_lon_cell"])[["_point", "_row"]])
+    candidates = pd.concat(candidates, ignore_index=True)
+    
+    point_rows = points.iloc[candidates["_point"].to_numpy()].reset_index(drop=True)
+    center_rows = centers.iloc[candidates["_row"].to_numpy()].reset_index(drop=True)
+    pairs = pd.concat([point_rows, center_rows], axis=1)
+    pairs["distance_km"] = haversine_km(pairs[point_lat], pairs[point_lon],
+                                        pairs[center_lat], pairs[center_lon])
+    pairs = pairs[pairs["distance_km"] <= radius_km]
+    
+    return pairs.sort_values(["distance_km", center_key], kind="mergesort") \
+                .drop_duplicates(subset=[point_key], keep="first") \
+                .sort_values(point_key) \
+                .reset_index(drop=True)
+
+
+class geoOperator(BaseOperator):
+    """geoOperator
+    
+    Deriver from BaseOperator, matches the points of one table to the
+    nearest center of another table within a radius, in memory with a
+    grid index instead of a cross join in the database.
+    
+    Methods:
+    ----------
+    run_transform(points_table, centers_table, target_table, radius_km):
+        Reads both tables, pairs every point with its nearest center within
+        radius_km and writes the pairs with their distance to target_table.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(_name=__name__)
+        self.connection_string = kwargs.get("connection_string")
+        self.__validator()
+        self.engine = get_engine(self.connection_string)
+    
+    def __validator(self):
+        assert self.connection_string is not None, "The rdbms connection is not provided."
+    
+    @traced
+    def run_transform(self,
+                    points_table:str="stations",
+                    centers_table:str="cities",
+                    target_table:str="city_stations",
+                    radius_km:float=5.0,
+                    **kwargs) -> None:
+        self.metrics.labels["target"] = target_table
+        with self.metrics.span("read"):
+            points = pd.read_sql(f"SELECT * FROM {points_table}", con=self.engine)
+            centers = pd.read_sql(f"SELECT * FROM {centers_table}", con=self.engine)
+        self.metrics.count("rows_in", len(points) + len(centers))
+        self.logger.info(f"Matching {len(points)} {points_table} to {len(centers)} {centers_table}"\
+                        f" within {radius_km} km")
+        
+        with self.metrics.span("transform"):
+            pairs = nearest_within(points, centers, radius_km, **kwargs)
+        with self.metrics.span("write"):
+            pairs.to_sql(target_table, con=self.engine, if_exists="replace", index=False)
+        self.metrics.count("rows_out", len(pairs))
+        self.logger.info(f"{len(pairs)} rows written to {target_table}")
\ No newline at end of file
@@ -1,5 +1,14 @@
+import json
+import time
+from typing import List, Optional, Tuple
 from .base import BaseOperator
-from sqlalchemy import create_engine
+from weather_pipeline.config import TRANSFORM_PROFILE_PATH
+from weather_pipeline.utils.touched import EPOCH, TOUCHED_TABLE, ensure_touched_table, latest_touched, \
+                                            get_refresh_mark, set_refresh_mark
+from weather_pipeline.utils.engines import get_engine
+from weather_pipeline.utils.metrics import traced
+from weather_pipeline.utils.profiling import is_explainable, normalize, queryProfiler
+from sqlalchemy import text
 
 class rdbmsOperator(BaseOperator):
     """rdbmsOperator
@@ -12,14 +21,143 @@ class rdbmsOperator(BaseOperator):
     run_transform():
         This method is responsible to carry out 
         transformation process over database using SQLAlchemy exexute.
+    run_transforms(statements):
+        Runs several statements in order on one connection inside one
+        transaction, temp tables created by one are seen by the next and
+        nothing is applied if one fails.
+    refresh_aggregate(target_table, source_table, key_column, aggregates):
+        Maintains a table aggregated by a date column incrementally, only
+        the dates the loader recorded as touched are recomputed.
+    median(column), timestamp(value, years_before):
+        SQL of the median aggregate of a column and of a timestamp
+        literal, for task SQL to run on the Postgres and SQLite operators.
+    explain_analyze(connection, sql):
+        Runs sql under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and returns
+        its plan and rows.
+    
+    With profile_path (default TRANSFORM_PROFILE_PATH) every statement of
+    run_transform, run_transforms and refresh_aggregate is run through 
+    explain_analyze and its time, rows and plan are appended to 
+    profile_path, tagged with the calling task.
     """
-    def __init__(self, **kwargs):
-        super().__init__(_name=__name__)
+    def __init__(self, _name:str=__name__, **kwargs):
+        super().__init__(_name=_name)
         self.connection_string = kwargs.get("connection_string")
-        self.engine = create_engine(self.connection_string)
+        self.engine = get_engine(self.connection_string)
+        self.profile_path = kwargs.get("profile_path", TRANSFORM_PROFILE_PATH)
+        self.profiler = queryProfiler(self.profile_path, _name, self.engine.dialect.name, self.logger) \
+                        if self.profile_path else None
     
     def __validator(self):
         self.connection_string is not None, "The rdbms connection is not provided."
     
+    def median(self, column:str) -> str:
+        return f"PERCENTILE_CONT(0.5) WITHIN GROUP(ORDER BY {column})"
+    
+    def timestamp(self, value:str, years_before:int=0) -> str:
+        if years_before:
+            return f"('{value}'::TIMESTAMP - INTERVAL '{years_before} year')"
+        return f"'{value}'::TIMESTAMP"
+    
+    @staticmethod
+    def _run(connection, sql:str, params:dict):
+        # bound parameters need text(), plain statements run as they are
+        return connection.execute(text(sql), **params) if params else connection.execute(sql)
+    
+    def explain_analyze(self, connection, sql:str, **params) -> Tuple[Optional[dict], Optional[int]]:
+        """explain_analyze
+        EXPLAIN ANALYZE executes the statement, its plan holds the actual
+        rows of every node. Statements Postgres cannot explain are run
+        as they are, without a plan. params are bound to the statement.
+        """
+        if not is_explainable(sql):
+            return None, self._run(connection, sql, params).rowcount
+        plan = self._run(connection, f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {normalize(sql)}", params).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        # CREATE TABLE IF NOT EXISTS of an existing table is not planned
+        if not plan or "Plan" not in plan[0]:
+            return None, 0
+        top = plan[0]["Plan"]
+        # an INSERT, UPDATE or DELETE reports the rows of the scan feeding it
+        if top["Node Type"] == "ModifyTable" and top.get("Plans"):
+            top = top["Plans"][0]
+        return plan[0], top.get("Actual Rows")
+    
+    def _execute(self, connection, sql:str, operation:str, index:int=0, **params) -> int:
+        if self.profiler is None:
+            return self._run(connection, sql, params).rowcount
+        start = time.perf_counter()
+        plan, rows = self.explain_analyze(connection, sql, **params)
+        # DDL has no rowcount (-1)
+        rows = rows if rows is not None and rows >= 0 else None
+        self.profiler.emit(operation, index, sql, time.perf_counter() - start, rows, plan)
+        return rows if rows is not None else -1
+    
+    @traced
     def run_transform(self, sql:str):
-        self.engine.execute(sql)
\ No newline at end of file
+        with self.metrics.span("transform"):
+            if self.profiler is None:
+                rowcount = self.engine.execute(sql).rowcount
+            else:
+                # EXPLAIN is not autocommitted, the statement gets its own transaction
+                with self.engine.begin() as connection:
+                    rowcount = self._execute(connection, sql, "run_transform")
+        if rowcount >= 0:
+            self.metrics.count("rows_out", rowcount)
+    
+    @traced
+    def run_transforms(self, statements:List[str]) -> None:
+        with self.metrics.span("transform"), self.engine.begin() as connection:
+            for index, sql in enumerate(statements):
+                rowcount = self._execute(connection, sql, "run_transforms", index)
+                self.metrics.count("statements")
+                if rowcount >= 0:
+                    self.metrics.count("rows_out", rowcount)
+    
+    @traced
+    def refresh_aggregate(self, 
+                        target_table:str, 
+                        source_table:str, 
+                        key_column:str, 
+                        aggregates:str, 
+                        group_columns:Optional[List[str]]=None, 
+                        joins:str="") -> None:
+        """refresh_aggregate
+        Recomputes target_table, source_table grouped by key_column (and
+        the qualified group_columns, of the tables joins adds) with the
+        aggregates select list, for the dates of source_table recorded in
+        the touched dates table since the last refresh of target_table
+        only, and replaces those groups in one transaction. The first run,
+        or a table without a refresh mark, builds the whole table.
+        """
+        group = ", ".join([f'{source_table}."{key_column}"'] + (group_columns or []))
+        select = f"""SELECT {group}, {aggregates} FROM {source_table} {joins}"""
+        group_by = f"GROUP BY {group}"
+        touched = f"""SELECT "touched_date" FROM {TOUCHED_TABLE}
+                    WHERE "source" = :source AND "recorded_at" > :last AND "recorded_at" <= :mark"""
+        self.metrics.labels["target"] = target_table
+        with self.metrics.span("transform"), self.engine.begin() as connection:
+            ensure_touched_table(connection)
+            mark = latest_touched(connection, source_table)
+            last = get_refresh_mark(connection, target_table, source_table)
+            exists = self.engine.dialect.has_table(connection, target_table)
+            if not exists or last is None:
+                self.logger.info(f"Building {target_table} from all of {source_table}")
+                if exists:
+                    self._execute(connection, f"DROP TABLE {target_table}", "refresh_aggregate")
+                self._execute(connection, f"""CREATE TABLE {target_table} AS 
+                            {select} {group_by}""", "refresh_aggregate", 1)
+            elif mark is None or mark <= last:
+                self.logger.info(f"No new touched dates of {source_table}, {target_table} is up to date")
+                return
+            else:
+                bounds = dict(source=source_table, last=last, mark=mark)
+                self._execute(connection, f"""DELETE FROM {target_table} WHERE "{key_column}" IN ({touched})""", 
+                            "refresh_aggregate", 0, **bounds)
+                rowcount = self._execute(connection, f"""INSERT INTO {target_table} 
+                                        {select} WHERE {source_table}."{key_column}" IN ({touched})
+                                        {group_by}""", "refresh_aggregate", 1, **bounds)
+                if rowcount >= 0:
+                    self.metrics.count("rows_out", rowcount)
+                self.logger.info(f"Refreshed {rowcount} groups of {target_table}")
+            set_refresh_mark(connection, target_table, source_table, mark or EPOCH)
\ No newline at end of file
@@ -0,0 +1,33 @@
+from typing import List, Optional, Tuple
+from sqlalchemy.engine.url import make_url
+from weather_pipeline.utils.profiling import is_explainable, normalize
+from .rdbms import rdbmsOperator
+
+class sqliteOperator(rdbmsOperator):
+    """sqliteOperator
+    
+    Deriver from rdbmsOperator running the transforms on a SQLite file,
+    the dialect specific parts of the task SQL come from median() and
+    timestamp(). median() is the aggregate registered on every connection
+    by utils.sqlite.configure_connection. Profiled statements are planned
+    with EXPLAIN QUERY PLAN, which has no actual timings or rows, and then
+    run.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(_name=__name__, **kwargs)
+        assert make_url(self.connection_string).drivername.split("+")[0] == "sqlite", \
+            f"sqliteOperator needs a sqlite connection string, got {self.connection_string}"
+    
+    def median(self, column:str) -> str:
+        return f"median({column})"
+    
+    def timestamp(self, value:str, years_before:int=0) -> str:
+        if years_before:
+            return f"datetime('{value}', '-{years_before} years')"
+        return f"datetime('{value}')"
+    
+    def explain_analyze(self, connection, sql:str, **params) -> Tuple[Optional[List[list]], int]:
+        plan = None
+        if is_explainable(sql):
+            plan = [list(row) for row in self._run(connection, f"EXPLAIN QUERY PLAN {normalize(sql)}", params)]
+        return plan, self._run(connection, sql, params).rowcount
\ No newline at end of file
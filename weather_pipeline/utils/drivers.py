@@ -0,0 +1,22 @@
+import importlib
+from typing import Dict
+
+
+def import_driver(spec:str):
+    """import_driver
+    
+    Imports the driver class of a registry entry "package.module:className",
+    so a driver module and its dependencies (pandas, sqlalchemy, requests)
+    are only imported once a driver of that type is initialized.
+    """
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def register_driver(registry:Dict[str, str], driver_type:str, spec:str) -> None:
+    """register_driver
+    Adds or replaces the driver of driver_type in a factory registry,
+    e.g. register_driver(SOURCES, "ftp", "my_plugins.ftp:ftpSource").
+    """
+    assert ":" in spec, f"Driver spec {spec} is not of the form module:className"
+    registry[driver_type] = spec
\ No newline at end of file
@@ -0,0 +1,59 @@
+import os
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+from weather_pipeline.config import ENGINE_POOL_SIZE, ENGINE_MAX_OVERFLOW, \
+                ENGINE_POOL_RECYCLE, ENGINE_POOL_PRE_PING
+from weather_pipeline.utils.sqlite import configure_connection
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def _is_sqlite(connection_string:str) -> bool:
+    return make_url(connection_string).drivername.split("+")[0] == "sqlite"
+
+
+def engine_options(connection_string:str, **overrides) -> dict:
+    """engine_options
+    Pool settings of the engine of connection_string, from config unless
+    overridden. SQLite is not pooled by size, only pre-ping applies.
+    """
+    options = {"pool_pre_ping": ENGINE_POOL_PRE_PING}
+    if not _is_sqlite(connection_string):
+        options.update(pool_size=ENGINE_POOL_SIZE, 
+                    max_overflow=ENGINE_MAX_OVERFLOW, 
+                    pool_recycle=ENGINE_POOL_RECYCLE)
+    options.update(overrides)
+    return options
+
+
+def get_engine(connection_string:str, **overrides):
+    """get_engine
+    
+    Process-wide registry of SQLAlchemy engines keyed by connection string,
+    so every loader and operator of a run checks connections out of one
+    pool. A forked process (Airflow workers, process pools) gets its own
+    engine instead of sharing the parent's sockets. overrides are passed
+    to create_engine and are part of the key. Every SQLite connection is
+    set up by utils.sqlite.configure_connection.
+    """
+    key = (os.getpid(), connection_string, tuple(sorted(overrides.items())))
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            engine = create_engine(connection_string, **engine_options(connection_string, **overrides))
+            if _is_sqlite(connection_string):
+                event.listen(engine, "connect", configure_connection)
+            _ENGINES[key] = engine
+        return _ENGINES[key]
+
+
+def dispose_engines() -> None:
+    """dispose_engines
+    Closes the pooled connections of every engine of this process.
+    """
+    with _ENGINES_LOCK:
+        for key, engine in list(_ENGINES.items()):
+            if key[0] == os.getpid():
+                engine.dispose()
+                del _ENGINES[key]
\ No newline at end of file
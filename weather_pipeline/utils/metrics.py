@@ -0,0 +1,301 @@
+import datetime
+import fcntl
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from weather_pipeline.config import METRICS_JSONL_PATH, METRICS_PROMETHEUS_PATH
+
+PROMETHEUS_PREFIX = "weather_pipeline"
+
+_SINKS = []
+_SINKS_LOCK = threading.Lock()
+_DEFAULT_SINKS = None
+
+
+class jsonLinesSink:
+    """jsonLinesSink
+    
+    Appends every operation record as one JSON line to path, one write
+    per record so concurrent writers do not interleave lines.
+    """
+    def __init__(self, path:str) -> None:
+        self.path = path
+    
+    def emit(self, record:dict) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as fl:
+            fl.write(json.dumps(record, default=str) + "\n")
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class prometheusSink:
+    """prometheusSink
+    
+    Writes the latest record of every component, operation and target
+    to path in the Prometheus text format, for the node_exporter textfile
+    collector. Series written by other processes (other Airflow tasks)
+    are kept, the file is rewritten under a lock and replaced atomically.
+    """
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.latest = {}
+    
+    @staticmethod
+    def _labels(record:dict) -> Dict[str, str]:
+        return {"component": record["component"], "operation": record["operation"],
+                "target": record.get("target") or ""}
+    
+    @staticmethod
+    def _label_text(labels:Dict[str, str]) -> str:
+        return ",".join([f'{key}="{_label_value(value)}"' for key, value in labels.items()])
+    
+    def _samples(self) -> Dict[str, List[str]]:
+        samples = defaultdict(list)
+        for record in self.latest.values():
+            labels = self._labels(record)
+            values = [("operation_seconds", labels, record["seconds"]),
+                    ("operation_success", labels, int(record["status"] == "ok")),
+                    ("operation_timestamp_seconds", labels, record["finished_at_epoch"])]
+            for span, timing in record["spans"].items():
+                values.append(("span_seconds", dict(labels, span=span), timing["seconds"]))
+                values.append(("span_calls", dict(labels, span=span), timing["calls"]))
+            values += [(counter, labels, value) for counter, value in record["counters"].items()]
+            for name, sample_labels, value in values:
+                name = f"{PROMETHEUS_PREFIX}_{name}"
+                samples[name].append(f"{name}{{{self._label_text(sample_labels)}}} {value}")
+        return samples
+    
+    def emit(self, record:dict) -> None:
+        self.latest[(record["component"], record["operation"], record.get("target"))] = record
+        owned = tuple([self._label_text(self._labels(record)) for record in self.latest.values()])
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            samples = defaultdict(list)
+            if os.path.exists(self.path):
+                with open(self.path) as fl:
+                    for line in fl:
+                        if line.startswith("#") or "{" not in line:
+                            continue
+                        name, labels = line.rstrip("\n").split("{", 1)
+                        if not labels.startswith(owned):
+                            samples[name].append(line.rstrip("\n"))
+            for name, lines in self._samples().items():
+                samples[name] += lines
+            
+            text = []
+            for name in sorted(samples):
+                text.append(f"# TYPE {name} gauge")
+                text += samples[name]
+            with open(f"{self.path}.part", "w") as fl:
+                fl.write("\n".join(text) + "\n")
+            os.replace(f"{self.path}.part", self.path)
+
+
+class listSink:
+    """listSink
+    
+    Keeps the records in memory, used by collect().
+    """
+    def __init__(self) -> None:
+        self.records = []
+    
+    def emit(self, record:dict) -> None:
+        self.records.append(record)
+
+
+class xcomSink:
+    """xcomSink
+    
+    Collects the records of an Airflow task and pushes them to XCom
+    under key after each one, the last push holds all of them.
+    """
+    def __init__(self, task_instance, key:str="metrics") -> None:
+        self.task_instance = task_instance
+        self.key = key
+        self.records = []
+    
+    def emit(self, record:dict) -> None:
+        self.records.append(record)
+        self.task_instance.xcom_push(key=self.key, value=self.records)
+
+
+def _default_sinks() -> List:
+    global _DEFAULT_SINKS
+    if _DEFAULT_SINKS is None:
+        _DEFAULT_SINKS = []
+        if METRICS_JSONL_PATH:
+            _DEFAULT_SINKS.append(jsonLinesSink(METRICS_JSONL_PATH))
+        if METRICS_PROMETHEUS_PATH:
+            _DEFAULT_SINKS.append(prometheusSink(METRICS_PROMETHEUS_PATH))
+    return _DEFAULT_SINKS
+
+
+def add_sink(sink) -> None:
+    """add_sink
+    Registers a sink (an object with emit(record)) for the records of
+    every instrumented operation of the process.
+    """
+    with _SINKS_LOCK:
+        _SINKS.append(sink)
+
+
+def remove_sink(sink) -> None:
+    with _SINKS_LOCK:
+        if sink in _SINKS:
+            _SINKS.remove(sink)
+
+
+@contextmanager
+def collect() -> Iterator[List[dict]]:
+    """collect
+    Collects the records emitted inside the block into a list.
+    """
+    sink = listSink()
+    add_sink(sink)
+    try:
+        yield sink.records
+    finally:
+        remove_sink(sink)
+
+
+def emit(record:dict) -> None:
+    with _SINKS_LOCK:
+        sinks = _default_sinks() + list(_SINKS)
+        for sink in sinks:
+            sink.emit(record)
+
+
+class stageMetrics:
+    """stageMetrics
+    
+    Span timings and counters of one pipeline component, owned by the
+    base classes as self.metrics. Updating them is a dict update and a
+    perf_counter call, cheap enough for every chunk. Spans may nest, a
+    write inside publish is counted in both.
+    
+    Methods:
+    --------
+    span(name):
+        Context manager adding the wall time of the block to span name.
+    timed(iterable, name):
+        Iterates iterable, adding the time spent producing every item
+        (e.g. parsing a chunk) to span name.
+    count(name, value):
+        Adds value to counter name.
+    operation(name):
+        Context manager around a public operation, resets the metrics on
+        entry and emits one record with its total time, status, spans,
+        counters and labels on exit.
+    """
+    def __init__(self, component:str, logger=None) -> None:
+        self.component = component
+        self.logger = logger
+        self.labels = {}
+        self.reset()
+    
+    def reset(self) -> None:
+        self.spans = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+    
+    @contextmanager
+    def span(self, name:str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] += time.perf_counter() - start
+            self.calls[name] += 1
+    
+    def add_time(self, name:str, seconds:float) -> None:
+        self.spans[name] += seconds
+        self.calls[name] += 1
+    
+    def timed(self, iterable:Iterable, name:str) -> Iterator:
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.spans[name] += time.perf_counter() - start
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+    
+    def count(self, name:str, value:int=1) -> None:
+        self.counters[name] += value
+    
+    def record(self, operation:str, started:datetime.datetime, seconds:float,
+            status:str="ok", error:Optional[str]=None) -> dict:
+        finished = time.time()
+        return {"component": self.component,
+                "operation": operation,
+                "target": self.labels.get("target"),
+                "labels": dict(self.labels),
+                "started_at": started.isoformat(),
+                "finished_at_epoch": round(finished, 3),
+                "seconds": round(seconds, 6),
+                "status": status,
+                "error": error,
+                "spans": {name: {"seconds": round(self.spans[name], 6), "calls": self.calls[name]}
+                        for name in self.spans},
+                "counters": dict(self.counters)}
+    
+    @contextmanager
+    def operation(self, name:str) -> Iterator["stageMetrics"]:
+        self.reset()
+        started = datetime.datetime.utcnow()
+        start = time.perf_counter()
+        status, error = "ok", None
+        try:
+            yield self
+        except BaseException as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = self.record(name, started, time.perf_counter() - start, status, error)
+            if self.logger is not None:
+                spans = ", ".join([f"{span} {timing['seconds']:.2f}s" for span, timing in record["spans"].items()])
+                counters = ", ".join([f"{counter}={value}" for counter, value in record["counters"].items()])
+                target = f" {record['target']}" if record.get("target") else ""
+                self.logger.info(f"{name}{target} {status} in {record['seconds']:.2f}s"\
+                                f" [{spans}] [{counters}]")
+            try:
+                emit(record)
+            except Exception:
+                if self.logger is not None:
+                    self.logger.warning(f"Failed to emit metrics of {name}", exc_info=True)
+
+
+def traced(method):
+    """traced
+    Decorator running a method of a BaseSource, BaseDestination or
+    BaseOperator as one instrumented operation of self.metrics.
+    Nested traced calls are part of the outer operation.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self, "_traced_depth", 0):
+            return method(self, *args, **kwargs)
+        self._traced_depth = 1
+        try:
+            with self.metrics.operation(method.__name__):
+                return method(self, *args, **kwargs)
+        finally:
+            self._traced_depth = 0
+    return wrapper
\ No newline at end of file
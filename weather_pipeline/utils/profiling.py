@@ -0,0 +1,120 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import List, Optional
+from weather_pipeline.utils.metrics import jsonLinesSink
+
+TASKS_MODULE = "weather_pipeline.tasks"
+# statements EXPLAIN accepts, the others (DROP, ...) are only timed
+EXPLAINABLE = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH|VALUES"\
+                        r"|CREATE\s+(TEMP\s+|TEMPORARY\s+|UNLOGGED\s+)?TABLE\s.*?\sAS\s)", re.I | re.S)
+
+
+def is_explainable(sql:str) -> bool:
+    return EXPLAINABLE.match(sql) is not None
+
+
+def normalize(sql:str) -> str:
+    """normalize
+    sql on one line, whitespace collapsed and the trailing semicolon
+    dropped, so it can be prefixed with EXPLAIN.
+    """
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def fingerprint(sql:str) -> str:
+    """fingerprint
+    Short hash of sql with its string literals and numbers (dates, table
+    name suffixes) masked, the same statement run for another date or
+    year has the same fingerprint.
+    """
+    masked = re.sub(r"'[^']*'", "?", normalize(sql).lower())
+    masked = re.sub(r"\d+", "N", masked)
+    return hashlib.sha1(masked.encode()).hexdigest()[:12]
+
+
+def plan_shape(plan, dialect:str) -> Optional[str]:
+    """plan_shape
+    The plan without its costs, timings and row counts: the node types
+    and relations of a Postgres JSON plan or the details of a SQLite
+    query plan. Two runs of a statement with the same shape used the
+    same plan.
+    """
+    if not plan:
+        return None
+    if dialect != "postgresql":
+        return " | ".join([str(row[-1]) for row in plan])
+    
+    def node(step:dict) -> str:
+        relation = f" on {step['Relation Name']}" if "Relation Name" in step else ""
+        children = ", ".join([node(child) for child in step.get("Plans", [])])
+        return f"{step['Node Type']}{relation}" + (f"({children})" if children else "")
+    return node(plan["Plan"]) if "Plan" in plan else None
+
+
+def calling_task() -> Optional[str]:
+    """calling_task
+    The Airflow task id running the process, outside Airflow the name of
+    the weather_pipeline.tasks function on the call stack.
+    """
+    task = os.getenv("AIRFLOW_CTX_TASK_ID")
+    if task:
+        return task
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get("__name__") == TASKS_MODULE:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+
+class queryProfiler:
+    """queryProfiler
+    
+    Appends one JSON line per statement an operator ran to path: the
+    calling task, wall time, rows and plan of the statement, with the
+    fingerprint and plan shape benchmarks.compare_queries matches runs on.
+    
+    Methods:
+    --------
+    emit(operation, index, sql, seconds, rows, plan):
+        Writes the record of the index-th statement of operation.
+    """
+    def __init__(self, path:str, component:str, dialect:str, logger=None) -> None:
+        self.sink = jsonLinesSink(path)
+        self.component = component
+        self.dialect = dialect
+        self.logger = logger
+    
+    def emit(self, operation:str, index:int, sql:str, seconds:float,
+            rows:Optional[int], plan) -> dict:
+        record = {"task": calling_task(),
+                "run_id": os.getenv("AIRFLOW_CTX_DAG_RUN_ID"),
+                "component": self.component,
+                "operation": operation,
+                "index": index,
+                "dialect": self.dialect,
+                "fingerprint": fingerprint(sql),
+                "sql": normalize(sql),
+                "finished_at": datetime.datetime.utcnow().isoformat(),
+                "seconds": round(seconds, 6),
+                "rows": rows,
+                "shape": plan_shape(plan, self.dialect),
+                "plan": plan}
+        try:
+            self.sink.emit(record)
+        except Exception:
+            if self.logger is not None:
+                self.logger.warning(f"Failed to write the profile of {operation}", exc_info=True)
+        if self.logger is not None:
+            self.logger.info(f"{operation}[{index}] {record['fingerprint']} {seconds:.3f}s"\
+                            f" {rows if rows is not None else '?'} rows")
+        return record
+
+
+def read_profiles(path:str) -> List[dict]:
+    with open(path) as fl:
+        return [json.loads(line) for line in fl if line.strip()]
\ No newline at end of file
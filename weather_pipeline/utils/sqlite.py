@@ -0,0 +1,65 @@
+import math
+import statistics
+from contextlib import contextmanager
+from typing import Iterator
+from weather_pipeline.config import SQLITE_CACHE_SIZE_MB, SQLITE_BUSY_TIMEOUT_MS
+
+
+class medianAggregate:
+    """medianAggregate
+    
+    median(x) aggregate for SQLite, the same interpolated median as
+    Postgres PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY x), NULLs are
+    ignored and a group without values is NULL.
+    """
+    def __init__(self) -> None:
+        self.values = []
+    
+    def step(self, value) -> None:
+        if value is not None:
+            self.values.append(value)
+    
+    def finalize(self):
+        return float(statistics.median(self.values)) if self.values else None
+
+
+def _has_function(dbapi_connection, sql:str) -> bool:
+    try:
+        dbapi_connection.execute(sql)
+        return True
+    except Exception:
+        return False
+
+
+def configure_connection(dbapi_connection, connection_record=None) -> None:
+    """configure_connection
+    
+    SQLAlchemy "connect" listener of SQLite engines. Switches file
+    databases to WAL, readers no longer block the writer and commits only
+    sync at checkpoints with synchronous NORMAL, sizes the page cache,
+    keeps temp tables in memory, waits on locks held by parallel tasks
+    and registers median() and, when SQLite was built without math
+    functions, floor().
+    """
+    dbapi_connection.execute("PRAGMA journal_mode = WAL")
+    dbapi_connection.execute("PRAGMA synchronous = NORMAL")
+    dbapi_connection.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_MB * 1024}")
+    dbapi_connection.execute("PRAGMA temp_store = MEMORY")
+    dbapi_connection.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    dbapi_connection.create_aggregate("median", 1, medianAggregate)
+    if not _has_function(dbapi_connection, "SELECT floor(0.5)"):
+        dbapi_connection.create_function("floor", 1, lambda value: None if value is None else math.floor(value))
+
+
+@contextmanager
+def bulk_load(connection) -> Iterator[None]:
+    """bulk_load
+    Turns syncing off on the connection for the block, a crash during
+    a bulk load loses the load, which is re-run anyway, but never
+    corrupts the database in WAL mode.
+    """
+    connection.execute("PRAGMA synchronous = OFF")
+    try:
+        yield
+    finally:
+        connection.execute("PRAGMA synchronous = NORMAL")
\ No newline at end of file
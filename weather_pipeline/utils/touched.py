@@ -0,0 +1,76 @@
+import datetime
+from typing import Iterable, Optional
+import pandas as pd
+from sqlalchemy import text
+
+TOUCHED_TABLE = "ingest_touched_dates"
+# up to which recorded_at every aggregate has consumed the touched dates of its source
+REFRESH_MARKS_TABLE = "aggregate_refresh_marks"
+# mark of an aggregate built before anything was touched
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def ensure_touched_table(engine) -> None:
+    engine.execute(f"""CREATE TABLE IF NOT EXISTS {TOUCHED_TABLE}
+                    ("source" VARCHAR, "touched_date" TIMESTAMP, "recorded_at" TIMESTAMP)""")
+    engine.execute(f"""CREATE TABLE IF NOT EXISTS {REFRESH_MARKS_TABLE}
+                    ("target" VARCHAR, "source" VARCHAR, "mark" TIMESTAMP)""")
+
+
+def record_touched(connection, source:str, dates:Iterable) -> None:
+    """record_touched
+    Records the dates of source whose rows were inserted or replaced,
+    for aggregates downstream to recompute only those.
+    """
+    recorded_at = datetime.datetime.utcnow()
+    rows = [{"source": source, "touched_date": pd.Timestamp(date).to_pydatetime(), 
+            "recorded_at": recorded_at} for date in sorted(set(dates))]
+    if not rows:
+        return
+    connection.execute(text(f"""INSERT INTO {TOUCHED_TABLE} ("source", "touched_date", "recorded_at")
+                                VALUES (:source, :touched_date, :recorded_at)"""), rows)
+
+
+def record_touched_from(connection, source:str, table:str, column:str, where:str="", **params) -> None:
+    """record_touched_from
+    Records the distinct dates of column in table, e.g. of rows about to 
+    be deleted, within the transaction that changes them.
+    """
+    connection.execute(text(f"""INSERT INTO {TOUCHED_TABLE} ("source", "touched_date", "recorded_at")
+                                SELECT DISTINCT :source, "{column}", :recorded_at FROM {table} {where}"""),
+                    source=source, recorded_at=datetime.datetime.utcnow(), **params)
+
+
+def latest_touched(connection, source:str) -> Optional[datetime.datetime]:
+    recorded_at = connection.execute(text(f"""SELECT MAX("recorded_at") FROM {TOUCHED_TABLE}
+                                        WHERE "source" = :source"""), source=source).scalar()
+    return pd.Timestamp(recorded_at).to_pydatetime() if recorded_at is not None else None
+
+
+def get_refresh_mark(connection, target:str, source:str) -> Optional[datetime.datetime]:
+    """get_refresh_mark
+    recorded_at up to which target consumed the touched dates of source,
+    None before its first refresh.
+    """
+    mark = connection.execute(text(f"""SELECT MAX("mark") FROM {REFRESH_MARKS_TABLE}
+                                    WHERE "target" = :target AND "source" = :source"""),
+                            target=target, source=source).scalar()
+    return pd.Timestamp(mark).to_pydatetime() if mark is not None else None
+
+
+def set_refresh_mark(connection, target:str, source:str, mark:datetime.datetime) -> None:
+    """set_refresh_mark
+    Moves the mark of target, then drops the touched dates of source that
+    every aggregate of it has consumed. An aggregate without a mark yet
+    is rebuilt whole on its first refresh and does not hold them back.
+    """
+    connection.execute(text(f"""DELETE FROM {REFRESH_MARKS_TABLE} 
+                            WHERE "target" = :target AND "source" = :source"""), 
+                    target=target, source=source)
+    connection.execute(text(f"""INSERT INTO {REFRESH_MARKS_TABLE} ("target", "source", "mark")
+                            VALUES (:target, :source, :mark)"""), 
+                    target=target, source=source, mark=mark)
+    connection.execute(text(f"""DELETE FROM {TOUCHED_TABLE} WHERE "source" = :source 
+                            AND "recorded_at" <= (SELECT MIN("mark") FROM {REFRESH_MARKS_TABLE} 
+                                                WHERE "source" = :source)"""), 
+                    source=source)
\ No newline at end of file